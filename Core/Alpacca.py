@@ -1,15 +1,31 @@
+import asyncio
 import math
+import threading
 import typing
-from typing import List, Iterator, Any
+from concurrent.futures import Future
+from typing import List, Iterator, Any, AsyncIterator, Callable
 
 import ollama
 import requests
 from ollama import *
 from requests import request, RequestException
 
+from Core.ClientPool import ClientPool
+from Core.HealthMonitor import get_health_monitor, TRANSPORT_ERRORS
+from Core.HistoryStore import HistoryStore, history_store_location, migrate_json_history
+from Core.HistoryPolicy import HistoryPolicy, HistorySegment, exchange_string, history_policy_from_dict, \
+    HISTORY_HEADER, MESSAGE_SEPARATOR
+from Core.HostPool import HostPool
 from Core.Logger import Logger
-from Core.OllamaHelper import check_ollama_server, get_all_models
+from Core.Metrics import GenerationMetrics, MetricsTracker, generation_metrics_from_dict
+from Core.ModelRegistry import get_model_registry
+from Core.ModelResidency import get_residency
+from Core.OllamaHelper import check_ollama_server
 from Core.Priority import Priority
+from Core.PromptTemplate import PromptTemplate, RAG, PREVIOUS_EXCHANGE, USER_PROMPT
+from Core.ResponseCache import ResponseCache, is_deterministic, cache_key
+from Core.Scheduler import get_scheduler, JobPriority
+from Core.ThinkParser import ThinkParser
 from Utils.FileLoader import load_from_file, load_json, save_json
 
 
@@ -32,9 +48,12 @@ VALID_PARAMETERS = [
      "description": "A lower value makes the model more conservative in it's answers."},
     {"name": "top_p", "type": float, "min": 0, "max": 1, "default": 0.9,
      "description": "A lower value makes the model more conservative in it's answers."},
+    {"name": "seed", "type": int, "min": 0, "max": math.inf, "default": 0,
+     "description": "A fixed random seed, the same prompt then always generates the same response."},
 ]
 
 SAVE_VERSION = 0.2
+HISTORY_TAIL = 128 # Most recent exchanges read when a history is opened, older ones are read from the store when needed
 
 def separate_thoughts(string: str) -> dict[str, str]:
     """
@@ -42,52 +61,42 @@ def separate_thoughts(string: str) -> dict[str, str]:
     :param string: The string to separate
     :return: A dictionary with the response and the think content
     """
-    if string.find("</think>") != -1:
-        thoughts = string.split("</think>")
-        return {
-            "response": thoughts[0].replace("<think>", "").replace("</think>", "").strip(),
-            "think": thoughts[1]
-        }
-    else:
-        return {
-            "response": string,
-            "think": ""
-        }
+    parser = ThinkParser()
+    parser.feed(string)
+    parser.close()
+    return {
+        "response": parser.get_answer(),
+        "think": parser.get_thoughts()
+    }
 
 class ChatExchange:
     user: str
     thoughts: str
     answer: str
+    metrics: GenerationMetrics | None # How the answer was generated, None for older histories
 
-    def __init__(self, user: str, thoughts: str, answer: str):
+    def __init__(self, user: str, thoughts: str, answer: str, metrics: GenerationMetrics = None):
         self.user = user
         self.thoughts = thoughts
         self.answer = answer
+        self.metrics = metrics
 
     def dict(self) -> dict:
-        return {
+        d = {
             "user": self.user,
             "thoughts": self.thoughts,
             "answer": self.answer
         }
+        if self.metrics is not None:
+            d["metrics"] = self.metrics.dict()
+        return d
 
 def chat_exchange_from_dict(d: dict) -> ChatExchange:
-    return ChatExchange(d["user"], d["thoughts"], d["answer"])
+    metrics = generation_metrics_from_dict(d["metrics"]) if d.get("metrics") else None
+    return ChatExchange(d["user"], d["thoughts"], d["answer"], metrics)
 
 def history_string(history: List[ChatExchange]) -> str:
-    full = "Chat history:\n"
-    is_first = True
-    for d in history:
-        if is_first:
-            is_first = False
-            partial = ""
-        else:
-            partial = f" --Next Message-- \n"
-        partial += f"user prompted: '{d.user}'\n"
-        partial += f"you thought: '{d.thoughts}'\n"
-        partial += f"you answered: '{d.answer}'\n"
-        full += partial
-    return full
+    return HISTORY_HEADER + MESSAGE_SEPARATOR.join(exchange_string(d) for d in history)
 
 class RemoteException(Exception):
     def __init__(self, message: str):
@@ -99,26 +108,55 @@ class RemoteException(Exception):
 class Alpacca:
     _history: List[ChatExchange] # History of messages and responses between the user and the model
     _history_location: str # The location of the history file
-    _context: [[int]] = [] # The context of the conversation
+    _history_store: HistoryStore | None = None # Appends the exchanges to the history file as they complete
+    _history_base: int = 0 # Older exchanges that are still only in the history store, _history starts after them
+    _context: List[int] | None = None # The token context returned by the last generation
+    _context_key: tuple | None = None # Model, options and system prompt the context was generated with
+    _context_turns: int = 0 # Number of history exchanges the context covers
+    _reuse_context: bool = False # If the token context should be fed back instead of rebuilding the prompt
+    _history_policy: HistoryPolicy | None = None # Keeps the history within a token budget if set
+    _history_segment: HistorySegment # The rendered exchanges of the history
+    _system_template: PromptTemplate | None = None # The system prompt compiled into segments
+    _response_cache: ResponseCache | None = None # Replays deterministic generations if set
     _remote: str = None
     _use_remote: bool = False # If the model is remote
+    _host_pool: HostPool | None = None # Routes every generation to the best of several hosts if set
+    _preferred_host: str | None = None # The host the pool selected for the next generation
+    _last_metrics: GenerationMetrics | None = None # Metrics of the last finished generation
+    _keep_alive: str | float | None = None # How long the server keeps the model loaded if set by this Alpacca
     _options: dict = {}
 
-    def __init__(self, model: str, previous_history: [ChatExchange] = None, system: str = None, history_location: str = None, identifier: str = None, host: str = None, options: dict = None, **kwargs):
+    def __init__(self, model: str, previous_history: [ChatExchange] = None, system: str = None, history_location: str = None, identifier: str = None, host: str = None, options: dict = None, reuse_context: bool = False, history_policy: HistoryPolicy = None, response_cache: ResponseCache = None, hosts: List[str] = None, keep_alive: str | float = None, **kwargs):
         self._history = previous_history
         self._history_location = history_location
         self.identifier = identifier
-
-        self._client = Client()
-        if host is not None:
-            self._client = Client(host=host)
+        self._options = {}
+        self._reuse_context = reuse_context
+        self._history_policy = history_policy
+        self._history_segment = HistorySegment()
+        self._history_lock = threading.Lock()
+        self._response_cache = response_cache
+
+        self._client = ClientPool.get_client()
+        if hosts:
+            self._host_pool = HostPool(([host] if host is not None else []) + list(hosts))
+            self._remote = self._host_pool.get_hosts()[0]
+            self._use_remote = self._remote is not None
+            self._client = ClientPool.get_client(self._remote)
+            if not self._host_pool.candidates(model):
+                raise RemoteException(f"No host of {self._host_pool.get_hosts()} is reachable and has the model '{model}'!")
+        elif host is not None:
+            self._client = ClientPool.get_client(host)
             self._remote = host
             self._use_remote = True
             if not self.check_connection():
                 raise RemoteException(f"Connection failed for remote: {host}! Please check the connection and try again.")
 
-        assert model in get_all_models(self._remote), f"Model '{model}' not found in the list of available models!"
+        if self._host_pool is None:
+            assert get_model_registry().has_model(model, self._remote), f"Model '{model}' not found in the list of available models!"
         self._model = model
+        if keep_alive is not None:
+            self.set_keep_alive(keep_alive)
 
         if options is not None:
             self._options.update(options)
@@ -127,17 +165,16 @@ class Alpacca:
             self.set_option(key, value)
 
         if system is not None:
-            self._system_prompt_location = system
-            self._system_prompt = load_from_file(system)
-            self._use_system = True
+            self.set_system_prompt(system)
         else:
             self._use_system = False
 
-        if history_location or previous_history:
-            try:
-                self._history = [chat_exchange_from_dict(d) for d in load_json(history_location, create=True)]
-            except FileNotFoundError:
-                self._history = []
+        if history_location:
+            self._open_history(history_location)
+            if self._history_policy is not None:
+                self._history_policy.load_summary(history_location)
+        elif previous_history:
+            self._history = list(previous_history)
             self._use_history = True
         else:
             self._use_history = False
@@ -152,37 +189,128 @@ class Alpacca:
         """
         return check_ollama_server(self._remote)
 
-    def generate(self, prompt) -> ChatResponse:
+    def generate(self, prompt) -> GenerateResponse:
         """
         Generate a response from the model based on the prompt, system prompt and provided history
         :param prompt: The prompt to generate a response from
         :return: The response from the model
         """
         Logger.log(f"Generating Response Response using Alpacca model: {self._model}", Priority.NORMAL)
+        self._ensure_host()
         user_question = prompt
-        prompt = self._make_prompt(prompt)
-        Logger.log(f"Prompt: {prompt}", Priority.DEBUG)
-        response: ChatResponse = self._client.generate(model=self._model, options=self._options, prompt=prompt)
-        self._context.append(response)
-        print(response.context)
+        prompt, context = self._prepare_prompt(prompt)
+        key = self._cache_key(prompt, context)
+        entry = self._response_cache.get(key) if key is not None else None
+        tracker = MetricsTracker(self._model, self._remote, self._set_last_metrics)
+        if entry is not None:
+            Logger.log("Replaying cached response", Priority.LOW)
+            response = GenerateResponse(model=self._model, response="".join(entry["chunks"]), done=True,
+                                        context=entry["context"])
+            self._last_metrics = None
+        else:
+            if self._host_pool is not None:
+                response = self._host_pool.generate_once(self._model, preferred=self._take_preferred_host(),
+                                                         options=self._options, prompt=prompt, context=context,
+                                                         keep_alive=self._get_keep_alive())
+                tracker.host = self._host_pool.last_host
+            else:
+                try:
+                    response: GenerateResponse = self._client.generate(model=self._model, options=self._options,
+                                                                       prompt=prompt, context=context,
+                                                                       keep_alive=self._get_keep_alive())
+                except TRANSPORT_ERRORS:
+                    get_health_monitor().report_failure(self._remote)
+                    raise
+                get_health_monitor().report_success(self._remote)
+            tracker.observe(response)
+            if key is not None:
+                self._response_cache.put(key, self._model, [response.response], response.context)
 
         lama_response = separate_thoughts(response["response"])
-        print(lama_response)
-        if self._use_history: self._history.append(ChatExchange(user_question, lama_response["think"], lama_response["response"]))
+        if self._use_history:
+            self._append_exchange(ChatExchange(user_question, lama_response["think"], lama_response["response"],
+                                               self._last_metrics))
+        self._capture_context(response.context, self.get_history_length())
         return response
 
+    def _open_history(self, history_location: str) -> None:
+        """
+        Open the append-only store of a history, older whole-file json histories are migrated into it.
+        Only the last HISTORY_TAIL exchanges are read through the index of the store
+        :param history_location: The location of the history file
+        """
+        if self._history_store is not None:
+            self._history_store.close()
+        store = HistoryStore(history_store_location(history_location))
+        migrate_json_history(history_location, store)
+        records, partial = store.load(last=HISTORY_TAIL)
+        self._history = [chat_exchange_from_dict(d) for d in records]
+        self._history_base = len(store) - len(records)
+        self._history_store = store
+        self._history_location = history_location
+        self._use_history = True
+        if partial is not None: # The app stopped while a response was streamed, keep what was received
+            Logger.log(f"Recovering an interrupted response from {store.get_location()}", Priority.HIGH)
+            self._append_exchange(chat_exchange_from_dict(partial))
+
+    def _load_older_history(self) -> None:
+        """
+        Read the exchanges that were left in the store when the history was opened, once the whole history is used
+        """
+        with self._history_lock:
+            if self._history_base == 0:
+                return
+            Logger.log(f"Loading {self._history_base} older exchanges from {self._history_store.get_location()}",
+                       Priority.LOW)
+            older = self._history_store.load_range(0, self._history_base)
+            self._history[:0] = [chat_exchange_from_dict(d) for d in older]
+            self._history_base = 0
+
+    def _append_exchange(self, exchange: ChatExchange) -> None:
+        self._history.append(exchange)
+        if self._history_store is not None:
+            self._history_store.append(exchange.dict())
+        self._maintain_history()
+
+    def save_partial(self, user: str, response: str) -> None:
+        """
+        Save the response that is being streamed, so it is recovered if the app stops before it is complete
+        :param user: The user's input prompt
+        :param response: The response received so far, including the thoughts
+        """
+        if self._history_store is not None:
+            parts = separate_thoughts(response)
+            self._history_store.write_partial(ChatExchange(user, parts["think"], parts["response"]).dict())
+
     def save_history(self) -> None:
         """
-        Save the history to a file
+        Save the history to a file, exchanges are appended as they complete so this only flushes them to the disk
         """
         if self._use_history:
             Logger.log(f"Alpacca: Saving history to: {self._history_location}", Priority.NORMAL)
-            save_json([h.dict() for h in self._history], self._history_location)
+            if self._history_store is not None:
+                self._history_store.sync()
+            if self._history_policy is not None:
+                self._history_policy.save_summary(self._history_location)
             Logger.log("History saved", Priority.NORMAL)
         else:
             Logger.log("History is not enabled", Priority.CRITICAL)
             raise Exception("History is not enabled")
 
+    async def save_history_async(self) -> None:
+        """
+        Save the history to a file without blocking the event loop
+        """
+        if not self._use_history:
+            Logger.log("History is not enabled", Priority.CRITICAL)
+            raise Exception("History is not enabled")
+        Logger.log(f"Alpacca: Saving history to: {self._history_location}", Priority.NORMAL)
+        if self._history_store is not None:
+            await asyncio.to_thread(self._history_store.sync)
+        if self._history_policy is not None:
+            await asyncio.to_thread(self._history_policy.save_summary, self._history_location)
+        Logger.log("History saved", Priority.NORMAL)
+
     def save_alpacca_settings(self, location: str):
         """
         Save the settings of the model to a file
@@ -204,7 +332,12 @@ class Alpacca:
             "system": self._system_prompt_location if self._use_system else "Disabled",
             "history": self._history_location if self._use_history else "Disabled",
             "identifier": self.identifier,
-            "remote": self._remote if self._use_remote else "Disabled"
+            "remote": self._remote if self._use_remote else "Disabled",
+            "hosts": self._host_pool.get_hosts() if self._host_pool is not None else "Disabled",
+            "reuse_context": self._reuse_context,
+            "history_policy": self._history_policy.settings_to_dict() if self._history_policy is not None else "Disabled",
+            "response_cache": self._response_cache.get_directory() if self._response_cache is not None else "Disabled",
+            "keep_alive": self._keep_alive if self._keep_alive is not None else "Disabled"
         }
 
     def get_options(self) -> dict:
@@ -269,20 +402,45 @@ class Alpacca:
         """
         self._system_prompt_location = prompt_file_location
         self._system_prompt = load_from_file(prompt_file_location)
+        self._system_template = PromptTemplate(self._system_prompt)
         self._use_system = True
 
-    async def generate_async(self, prompt):
+    async def generate_async(self, prompt, rag_context: list[str] = None) -> AsyncIterator[GenerateResponse]:
         """
-        Currently broken smh
-        Generate an async response from the model based on the prompt, system prompt and provided history
+        Generate an async streamed response from the model based on the prompt, system prompt and provided history.
+        Uses the async client of the configured host shared by all sessions in the running event loop
         :param prompt: The prompt to generate a response from
-        :return: Coroutine that generates the response from the model
+        :param rag_context: The context gathered using RAG
+        :return: An async iterator over the parts of the response
         """
         Logger.log(f"Generating asynchronous Response using Alpacca model: {self._model}", Priority.NORMAL)
-        prompt = self._make_prompt(prompt)
-        Logger.log(f"Prompt: {prompt}", Priority.DEBUG)
-        iterator = await ollama.AsyncClient().generate(model=self._model, options=self._options, prompt=prompt, stream=True)
-        return iterator
+        # Health probes, reading older history and the response cache block, so they run outside the event loop
+        await asyncio.to_thread(self._ensure_host)
+        prompt, context = await asyncio.to_thread(self._prepare_prompt, prompt, rag_context)
+        turns_after = self.get_history_length() + 1
+        key = self._cache_key(prompt, context)
+        entry = await asyncio.to_thread(self._response_cache.get, key) if key is not None else None
+        if entry is not None:
+            Logger.log("Replaying cached response", Priority.LOW)
+            self._last_metrics = None
+            for part in self._track_context(ResponseCache.replay(entry), turns_after):
+                yield part
+            return
+
+        host = self._remote
+        if self._host_pool is not None:
+            host = self._take_preferred_host() or await asyncio.to_thread(self._host_pool.select, self._model)
+        client = ClientPool.get_async_client(host)
+        tracker = MetricsTracker(self._model, host, self._set_last_metrics)
+        iterator = tracker.track_async(await client.generate(model=self._model, options=self._options, prompt=prompt,
+                                                             context=context, stream=True,
+                                                             keep_alive=self._get_keep_alive()))
+        if key is not None:
+            iterator = self._response_cache.record_async(key, iterator)
+        async for part in iterator:
+            if part.done:
+                self._capture_context(part.context, turns_after)
+            yield part
 
     def generate_iterable(self, prompt, rag_context: list[str] = None):
         """
@@ -292,30 +450,240 @@ class Alpacca:
         :return: An iterable that generates the response from the model
         """
         Logger.log(f"Generating iterable Response using Alpacca model: {self._model}", Priority.NORMAL)
-        prompt = self._make_prompt(prompt, rag_context=rag_context)
-        Logger.log(f"Prompt: {prompt}", Priority.DEBUG)
-        iterator:  GenerateResponse | Iterator[GenerateResponse] = self._client.generate(model=self._model, options=self._options, prompt=prompt, stream=True)
-        return iterator
+        self._ensure_host()
+        prompt, context = self._prepare_prompt(prompt, rag_context)
+        key = self._cache_key(prompt, context)
+        entry = self._response_cache.get(key) if key is not None else None
+        if entry is not None:
+            Logger.log("Replaying cached response", Priority.LOW)
+            self._last_metrics = None
+            iterator = ResponseCache.replay(entry)
+        else:
+            tracker = MetricsTracker(self._model, self._remote, self._set_last_metrics)
+            if self._host_pool is not None:
+                iterator = self._host_pool.generate(self._model, preferred=self._take_preferred_host(), options=self._options,
+                                                    prompt=prompt, context=context, keep_alive=self._get_keep_alive())
+                tracker.host = self._host_pool.last_host
+            else:
+                iterator:  GenerateResponse | Iterator[GenerateResponse] = self._client.generate(model=self._model, options=self._options, prompt=prompt,
+                                                                                                 context=context, stream=True,
+                                                                                                 keep_alive=self._get_keep_alive())
+            iterator = tracker.track(iterator)
+            if key is not None:
+                iterator = self._response_cache.record(key, iterator)
+        # The caller appends the exchange with add_history once the stream is consumed
+        return self._track_context(iterator, self.get_history_length() + 1)
+
+    def _set_last_metrics(self, metrics: GenerationMetrics) -> None:
+        self._last_metrics = metrics
+        get_residency().touch(self._model, metrics.host)
+
+    def _get_keep_alive(self) -> str | float | None:
+        return get_residency().get_keep_alive(self._model)
+
+    def set_keep_alive(self, keep_alive: str | float | None) -> None:
+        """
+        Set how long the server keeps the model loaded after a generation, shared by all sessions of the model
+        :param keep_alive: A duration like "10m", seconds, a negative value to keep it forever or None for the default
+        """
+        self._keep_alive = keep_alive
+        get_residency().set_keep_alive(self._model, keep_alive)
+
+    def preload(self) -> Future | None:
+        """
+        Queue loading the model on the host of the next generation, so the first prompt does not wait for the load.
+        Skipped if the model is loaded already or loading it would evict a model another session is using
+        :return: The future of the queued preload or None if it was skipped
+        """
+        session = self.identifier or self._model
+        if self._host_pool is not None: # Selecting a host may probe the pool, so it is left to the background job
+            return get_residency().preload(self._model, self._remote, session=session,
+                                           select=lambda: self._host_pool.select(self._model))
+        return get_residency().preload(self._model, self._remote, session=session)
+
+    def get_last_metrics(self) -> GenerationMetrics | None:
+        """
+        Get the metrics of the last finished generation
+        :return: The metrics or None if there was no generation or the response was replayed from the cache
+        """
+        return self._last_metrics
+
+    def _cache_key(self, prompt: str, context: List[int] | None) -> str | None:
+        """
+        :param prompt: The final prompt that is sent
+        :param context: The token context the prompt is sent with
+        :return: The key of the generation in the response cache or None if it can not be cached
+        """
+        if self._response_cache is None or not is_deterministic(self._options):
+            return None
+        return cache_key(self._model, self._options, prompt, context)
+
+    def set_response_cache(self, cache: ResponseCache | None) -> None:
+        """
+        Set the cache that replays deterministic generations (temperature 0 or a fixed seed)
+        :param cache: The cache to use or None to always generate
+        """
+        self._response_cache = cache
+
+    def _prepare_prompt(self, prompt: str, rag_context: list[str] = None) -> tuple[str, List[int] | None]:
+        """
+        Make the prompt for the next generation, only the new turn is used while the token context is valid
+        :param prompt: The user prompt
+        :param rag_context: The context gathered using RAG
+        :return: The prompt to send and the token context to send it with
+        """
+        if self._can_reuse_context():
+            prompt, context = self._make_turn_prompt(prompt, rag_context=rag_context), self._context
+        else:
+            prompt, context = self._make_prompt(prompt, rag_context=rag_context), None
+        Logger.log("Prompt: %s", Priority.DEBUG, prompt)
+        return prompt, context
+
+    def _track_context(self, iterator: Iterator[GenerateResponse], turns_after: int) -> Iterator[GenerateResponse]:
+        """
+        Pass through a streamed response and keep the token context of the final part
+        :param iterator: The streamed response from the client
+        :param turns_after: The number of history exchanges once the streamed exchange was added
+        :return: The same parts as the iterator
+        """
+        try:
+            for part in iterator:
+                if part.done:
+                    self._capture_context(part.context, turns_after)
+                    if self._host_pool is None:
+                        get_health_monitor().report_success(self._remote)
+                yield part
+        except TRANSPORT_ERRORS:
+            if self._host_pool is None:
+                get_health_monitor().report_failure(self._remote)
+            raise
+
+    def _ensure_host(self) -> None:
+        """
+        Fail fast if the cached state of the health monitor says the host is down, a host pool fails over instead
+        """
+        if self._host_pool is None and self._use_remote and not get_health_monitor().is_up(self._remote):
+            Logger.log(f"Remote {self._remote} is down, not generating", Priority.HIGH)
+            raise RemoteException(f"Remote {self._remote} is not reachable! Please check the connection and try again.")
+
+    def _context_fingerprint(self) -> tuple:
+        """
+        :return: Everything that has to stay the same for a token context to remain valid
+        """
+        return self._model, tuple(sorted(self._options.items())), self._use_system and self._system_prompt or None
+
+    def _capture_context(self, context: List[int] | None, turns: int) -> None:
+        """
+        Keep the token context of a finished generation for the next turn
+        :param context: The token context returned by the server
+        :param turns: The number of history exchanges the context covers
+        """
+        if not self._reuse_context or not self._use_history or not context:
+            self._context = None
+            return
+        self._context = list(context)
+        self._context_key = self._context_fingerprint()
+        self._context_turns = turns
+
+    def _can_reuse_context(self) -> bool:
+        """
+        Check if the token context of the last generation can be fed into the next one.
+        The context is invalid after a model, option or system prompt change, when the history was edited or when it
+        outgrew the token budget of the history policy
+        :return: True if only the new turn has to be sent
+        """
+        if not self._reuse_context or not self._use_history or self._context is None:
+            return False
+        over_budget = self._history_policy is not None and len(self._context) > self._history_policy.token_budget
+        edited = self._context_turns != self.get_history_length()
+        if over_budget or edited or self._context_key != self._context_fingerprint():
+            Logger.log("Token context invalidated, rebuilding the full prompt", Priority.LOW)
+            self.invalidate_context()
+            return False
+        return True
+
+    def invalidate_context(self) -> None:
+        """
+        Drop the token context so the next generation rebuilds the full prompt
+        """
+        self._context = None
+        self._context_key = None
+        self._context_turns = 0
+
+    def set_reuse_context(self, reuse: bool) -> None:
+        """
+        Enable or disable feeding the token context of the last response into the next generation
+        :param reuse: True to only send the new turn while the context is valid
+        """
+        self._reuse_context = reuse
+        if not reuse:
+            self.invalidate_context()
+
+    def _make_turn_prompt(self, prompt: str, rag_context: list[str] = None) -> str:
+        """
+        Make the prompt for a turn that continues a token context, the history and system prompt are already part of it
+        :param prompt: The user prompt
+        :param rag_context: The context gathered using RAG
+        :return: The prompt containing only the new turn
+        """
+        if rag_context is not None:
+            Logger.log("RAG Context: %s", Priority.NORMAL, rag_context)
+            return f"Context: {' '.join(rag_context)}\n\n{prompt}"
+        return prompt
+
+    def set_history_policy(self, policy: HistoryPolicy | None) -> None:
+        """
+        Set the policy that keeps the history within a token budget
+        :param policy: The policy to use or None to always send the full history
+        """
+        self._history_policy = policy
+        if policy is not None and self._use_history and self._history_location is not None:
+            policy.load_summary(self._history_location)
+
+    def get_history_policy(self) -> HistoryPolicy | None:
+        """
+        :return: The policy that keeps the history within a token budget or None
+        """
+        return self._history_policy
+
+    def _maintain_history(self) -> None:
+        """
+        Let the history policy fold exchanges that left the window into its summary
+        """
+        if self._history_policy is not None:
+            if self._history_policy.summary_model is not None: # The summarized turns count from the start
+                self._load_older_history()
+            self._history_policy.maintain(self._history, self._client, session=self.identifier, host=self._remote)
+
+    def _history_parts(self) -> List[str]:
+        """
+        :return: The parts of the history segment of the prompt, rendered exchanges are reused between turns
+        """
+        if not self._use_history:
+            return []
+        if self._history_policy is None or self._history_policy.recent_turns > len(self._history):
+            self._load_older_history()
+        self._history_segment.sync(self._history)
+        if self._history_policy is not None:
+            return self._history_policy.parts(self._history, self._history_segment)
+        return self._history_segment.parts()
 
     def _make_prompt(self, prompt: str, rag_context: list[str] = None) -> str:
-        context = self._use_history and history_string(self._history) or ""
-        system_prompt = self._use_system and self._system_prompt or None
-        if system_prompt and "%RAG%" in system_prompt:
+        if not self._use_system:
+            return prompt
+
+        values: dict[str, str | List[str]] = {USER_PROMPT: prompt}
+        if RAG in self._system_template:
             if rag_context is not None:
-                Logger.log(f"RAG Context: {rag_context}", Priority.NORMAL)
-                system_prompt = system_prompt.replace("%RAG%", " ".join(rag_context))
+                Logger.log("RAG Context: %s", Priority.NORMAL, rag_context)
+                values[RAG] = " ".join(rag_context)
             else:
                 Logger.log("RAG Context is empty", Priority.CRITICAL)
 
-        if system_prompt and "%RPreviousExchange%" in system_prompt:
-            system_prompt = system_prompt.replace("%RPreviousExchange%", context)
+        if PREVIOUS_EXCHANGE in self._system_template:
+            values[PREVIOUS_EXCHANGE] = self._history_parts()
 
-        if system_prompt and "%UserPrompt%" in system_prompt:
-            system_prompt = system_prompt.replace("%UserPrompt%", prompt)
-
-        if not self._use_system:
-            return prompt
-        return system_prompt
+        return self._system_template.render(values)
 
     def get_system_prompt_now(self, rag_context: list[str] = None, prompt: str = "") -> str:
         """
@@ -326,27 +694,39 @@ class Alpacca:
         """
         return self._make_prompt(prompt, rag_context)
 
-    def add_history(self, user: str, thoughts: str, answer: str):
+    def add_history(self, user: str, thoughts: str, answer: str, metrics: GenerationMetrics = None):
         """
         Add a chat exchange to the history
         :param user: The user's input prompt
         :param thoughts: The thoughts of the model
         :param answer: The answer of the model
+        :param metrics: The metrics of the generation of the answer
         """
         if self._use_history:
-            self._history.append(ChatExchange(user, thoughts, answer))
+            self._append_exchange(ChatExchange(user, thoughts, answer, metrics))
         else:
             Logger.log("History is not enabled", Priority.CRITICAL)
             raise Exception("History is not enabled")
 
+    async def add_history_async(self, user: str, thoughts: str, answer: str, metrics: GenerationMetrics = None):
+        """
+        Add a chat exchange to the history from a coroutine, the append to the history store runs outside the event loop
+        :param user: The user's input prompt
+        :param thoughts: The thoughts of the model
+        :param answer: The answer of the model
+        :param metrics: The metrics of the generation of the answer
+        """
+        await asyncio.to_thread(self.add_history, user, thoughts, answer, metrics)
+
     def enable_load_history(self, history_location) -> bool:
         """
         Enable loading history from a file
         :param history_location: The location of the history file
         :return: True if history was loaded
         """
-        self._history = [chat_exchange_from_dict(d) for d in load_json(history_location, create=True)]
-        self._use_history = True
+        self._open_history(history_location)
+        self._history_segment.invalidate()
+        self.invalidate_context()
         return True
 
     def get_client(self) -> Client:
@@ -356,6 +736,55 @@ class Alpacca:
         """
         return self._client
 
+    def get_host(self) -> str | None:
+        """
+        Get the host the Alpacca generates on, with a host pool the currently best host
+        :return: The remote host or None for the local server
+        """
+        if self._host_pool is not None:
+            return self._host_pool.select(self._model)
+        return self._remote
+
+    def schedule(self, job: Callable[[], Any], priority: JobPriority = JobPriority.INTERACTIVE) -> Future:
+        """
+        Queue a job of the session, typically consuming a generation, on the generation scheduler of its host.
+        With a host pool the host is selected in a background thread, as that may probe the hosts, and the job's
+        generation is pinned to the selected host
+        :param job: The job to run
+        :param priority: The priority class of the job
+        :return: The future of the job, it fails with NoHostAvailable if no host of the pool is healthy
+        """
+        session = self.identifier or self._model
+        if self._host_pool is None:
+            return get_scheduler().submit(session, self._remote, job, priority)
+
+        future = Future()
+        def pinned(host: str | None) -> Any:
+            self._preferred_host = host
+            return job()
+        def select() -> None:
+            try:
+                host = self._host_pool.select(self._model)
+                queued = get_scheduler().submit(session, host, lambda: pinned(host), priority)
+            except Exception as e:
+                Logger.log(f"No host for the job of {session}: {e}", Priority.HIGH)
+                future.set_exception(e)
+                return
+            queued.add_done_callback(lambda done: future.set_exception(done.exception()) if done.exception()
+                                     else future.set_result(done.result()))
+        threading.Thread(target=select, daemon=True, name=f"select-{session}").start()
+        return future
+
+    def _take_preferred_host(self) -> str | None:
+        host, self._preferred_host = self._preferred_host, None
+        return host
+
+    def get_host_pool(self) -> HostPool | None:
+        """
+        :return: The hosts the Alpacca routes its generations to or None if it is bound to a single host
+        """
+        return self._host_pool
+
     def get_model(self) -> str:
         """
         Get the model of the Alpacca
@@ -365,25 +794,75 @@ class Alpacca:
 
     def get_history(self) -> List[ChatExchange]:
         """
-        Get the history of the Alpacca
+        Get the history of the Alpacca, the older exchanges are read from the history store if they were not yet
         :return: The history of the Alpacca
         """
+        if self._use_history:
+            self._load_older_history()
         return self._history
 
+    def get_history_length(self) -> int:
+        """
+        :return: The number of exchanges in the history, without reading the older ones
+        """
+        return self._history_base + len(self._history or []) if self._use_history else 0
+
+    def get_history_page(self, start: int, stop: int) -> List[ChatExchange]:
+        """
+        Get a slice of the history, used to show long histories page by page.
+        Older exchanges that are not in memory are read from the history store without keeping them
+        :param start: The index of the first exchange
+        :param stop: The index after the last exchange
+        :return: The exchanges from start to stop
+        """
+        if not self._use_history:
+            return []
+        with self._history_lock:
+            base = self._history_base
+            older = []
+            if start < base:
+                older = [chat_exchange_from_dict(d) for d in self._history_store.load_range(start, min(stop, base))]
+            return older + self._history[max(start - base, 0):max(stop - base, 0)]
+
 def load_alpacca_from_json(location:str) -> Alpacca:
     """
     Load an Alpacca model from a JSON file
     :param location: The location of the JSON file
     :return: The Alpacca model
     """
+    return alpacca_from_settings(read_alpacca_settings(location))
+
+def read_alpacca_settings(location: str) -> dict:
+    """
+    Read the settings of an Alpacca without connecting to a host or loading its history
+    :param location: The location of the JSON file
+    :return: The settings as saved by settings_to_dict
+    """
     data = load_json(location)
     if data["version"] != SAVE_VERSION:
         Logger.log(f"Version mismatch! Expected {SAVE_VERSION} but got {data['version']}", Priority.CRITICAL)
         raise ValueError(f"Version mismatch! Expected {SAVE_VERSION} but got {data['version']}")
+    return data
+
+def alpacca_from_settings(data: dict) -> Alpacca:
+    """
+    Create an Alpacca from its settings, connects to its hosts and loads its history
+    :param data: The settings as saved by settings_to_dict
+    :return: The Alpacca model
+    """
     system = data["system"] if data["system"] != "Disabled" else None
     history = data["history"] if data["history"] != "Disabled" else None
     options = data["options"] if data["options"] != "Disabled" else None
     identifier = data["identifier"] if data["identifier"] else None
     remote = data["remote"] if data["remote"] != "Disabled" else None
+    policy = data.get("history_policy", "Disabled")
+    policy = history_policy_from_dict(policy) if policy != "Disabled" else None
+    cache = data.get("response_cache", "Disabled")
+    cache = ResponseCache(cache) if cache != "Disabled" else None
+    hosts = data.get("hosts", "Disabled")
+    hosts = hosts if hosts != "Disabled" else None
+    keep_alive = data.get("keep_alive", "Disabled")
+    keep_alive = keep_alive if keep_alive != "Disabled" else None
     return Alpacca(data["model"], system=system, history_location=history, identifier=identifier,
-                   host=remote, options=options)
+                   host=remote, options=options, reuse_context=data.get("reuse_context", False), history_policy=policy,
+                   response_cache=cache, hosts=hosts, keep_alive=keep_alive)
@@ -0,0 +1,76 @@
+from collections import OrderedDict
+from typing import Callable, Generic, List, TypeVar
+
+T = TypeVar("T")
+
+PAGE_SIZE = 50 # Exchanges per page of a chat
+CACHE_PAGES = 16 # Converted pages that are kept after they scrolled out of the chat
+
+
+class ChatPages(Generic[T]):
+    """
+    Splits a long chat history into fixed pages that are only converted to messages once they are shown.
+    Pages start at multiples of the page size, so they stay the same while the history grows at its end.
+    Complete pages are kept in a least recently used cache, the last page is converted again as it still grows.
+    """
+    page_size: int
+    _cache: OrderedDict[int, List[T]]
+
+    def __init__(self, load: Callable[[int, int], list], convert: Callable[[object], T], page_size: int = PAGE_SIZE,
+                 cache_pages: int = CACHE_PAGES):
+        """
+        :param load: Returns the exchanges from start to stop of the history
+        :param convert: Converts an exchange to the message that is shown
+        :param page_size: Exchanges per page
+        :param cache_pages: Converted pages to keep
+        """
+        self._load = load
+        self._convert = convert
+        self.page_size = page_size
+        self._cache_pages = cache_pages
+        self._cache = OrderedDict()
+
+    def page(self, index: int) -> List[T]:
+        """
+        :param index: The index of the page
+        :return: The messages of the page
+        """
+        messages = self._cache.get(index)
+        if messages is not None:
+            self._cache.move_to_end(index)
+            return messages
+        start = index * self.page_size
+        messages = [self._convert(exchange) for exchange in self._load(start, start + self.page_size)]
+        if len(messages) == self.page_size:
+            self._cache[index] = messages
+            if len(self._cache) > self._cache_pages:
+                self._cache.popitem(last=False)
+        return messages
+
+    def window_start(self, total: int) -> int:
+        """
+        :param total: The number of exchanges in the history
+        :return: The first exchange that is shown when the chat is opened, at least one page is shown
+        """
+        return max(total - self.page_size, 0) // self.page_size * self.page_size
+
+    def window(self, total: int) -> tuple[int, List[T]]:
+        """
+        :param total: The number of exchanges in the history
+        :return: The first exchange that is shown and the messages from it to the end of the history
+        """
+        start = self.window_start(total)
+        messages = []
+        for index in range(start // self.page_size, (total + self.page_size - 1) // self.page_size):
+            messages.extend(self.page(index))
+        return start, messages
+
+    def older(self, first: int) -> List[T]:
+        """
+        :param first: The first exchange that is shown, at the start of a page
+        :return: The messages of the page before it, empty at the start of the history
+        """
+        return self.page(first // self.page_size - 1) if first > 0 else []
+
+    def clear(self) -> None:
+        self._cache.clear()
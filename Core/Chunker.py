@@ -0,0 +1,137 @@
+import re
+from functools import lru_cache
+from math import ceil
+from typing import Callable, Iterable, Iterator
+
+BLOCK_SIZE = 1 << 20 # Characters read from a file at once
+MAX_WORD = 1 << 16 # Characters after which a word without whitespace is cut, so a binary blob cannot fill the memory
+CACHED_WORD = 32 # Characters up to which the token estimate of a word is cached
+
+# How a word ends, a chunk prefers to end after a paragraph and then after a sentence
+NONE = 0
+SENTENCE = 1
+PARAGRAPH = 2
+
+_WORD = re.compile(r"\S+")
+_PIECE = re.compile(r"[^\W\d_]+|\d{1,3}|[^\w\s]|_") # Letters, groups of up to three digits and single symbols
+_SENTENCE_END = re.compile(r"[.!?][\"')\]]*$")
+_SENTENCE_CLOSE = frozenset(".!?\"')]") # The characters a sentence end can end with
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+# A word as its text, its estimated token count and how it ends
+Word = tuple[str, int, int]
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the tokens a BPE tokenizer splits a text into: every symbol and every group of up to three digits is a
+    token and letters are merged into tokens of about five characters
+    :param text: The text to estimate
+    :return: The estimated number of tokens, at least 1 for a non-empty text
+    """
+    return _estimate_cached(text) if len(text) <= CACHED_WORD else _estimate(text)
+
+
+@lru_cache(maxsize=1 << 16) # Most words of a text repeat, long ones rarely do and would pin a lot of memory
+def _estimate_cached(text: str) -> int:
+    return _estimate(text)
+
+
+def _estimate(text: str) -> int:
+    tokens = 0
+    for piece in _PIECE.findall(text):
+        tokens += ceil(len(piece) / 5) if piece[0].isalpha() else 1
+    return tokens
+
+
+def read_blocks(file_path: str, block_size: int = BLOCK_SIZE) -> Iterator[str]:
+    """
+    Read a text file block by block, a character split across two blocks is decoded with the second
+    :param file_path: The path of the file
+    :param block_size: The number of characters of a block
+    :return: The blocks of the file
+    """
+    with open(file_path, "r", encoding="utf-8", errors="replace") as file:
+        while block := file.read(block_size):
+            yield block
+
+
+def split_words(blocks: Iterable[str], count: Callable[[str], int] = estimate_tokens) -> Iterator[Word]:
+    """
+    Tokenize blocks of a text once, words split across two blocks are joined
+    :param blocks: The text in blocks of any size
+    :param count: Counts the tokens of a word
+    :return: The words with their token counts and how they end
+    """
+    pending: str | None = None # The previous word, its ending is only known once the following whitespace is read
+    carry = ""
+    for block in blocks:
+        text = carry + block
+        position = 0
+        for match in _WORD.finditer(text):
+            if match.end() == len(text) and match.end() - match.start() < MAX_WORD:
+                break # The word may continue in the next block
+            if pending is not None:
+                yield _word(pending, text[position:match.start()], count)
+            pending = match.group()
+            position = match.end()
+        carry = text[position:]
+    for match in _WORD.finditer(carry):
+        if pending is not None:
+            yield _word(pending, carry[:match.start()], count)
+        pending = match.group()
+    if pending is not None:
+        yield pending, count(pending), PARAGRAPH
+
+
+def _word(text: str, gap: str, count: Callable[[str], int]) -> Word:
+    if gap != " " and _PARAGRAPH_BREAK.search(gap):
+        return text, count(text), PARAGRAPH
+    return text, count(text), SENTENCE if text[-1] in _SENTENCE_CLOSE and _SENTENCE_END.search(text) else NONE
+
+
+def chunk_words(words: Iterable[Word], size: int, overlap: int = 0, boundaries: bool = False) -> Iterator[str]:
+    """
+    Join words into chunks of at most size tokens in a single pass, a word longer than size is a chunk of its own
+    :param words: The words of the text
+    :param size: The maximum number of tokens of a chunk
+    :param overlap: The number of tokens two consecutive chunks share at most
+    :param boundaries: End chunks after a paragraph or sentence if one is in the second half of the chunk
+    :return: The chunks in the order of the text
+    """
+    assert 0 <= overlap < size, "The overlap must be smaller than the chunk size"
+    window: list[Word] = []
+    tokens = 0
+    fresh = 0 # Index of the first word in the window that is not part of a yielded chunk
+    for word in words:
+        while window and tokens + word[1] > size:
+            if fresh >= len(window): # Only the overlap of the previous chunk is left
+                tokens -= window.pop(0)[1]
+                fresh = len(window)
+                continue
+            cut = _cut(window, fresh, size) if boundaries else len(window)
+            yield " ".join(text for text, _, _ in window[:cut])
+            keep, kept = cut, 0
+            while keep > 0 and kept + window[keep - 1][1] <= overlap:
+                keep -= 1
+                kept += window[keep][1]
+            tokens -= sum(word_tokens for _, word_tokens, _ in window[:keep])
+            window = window[keep:]
+            fresh = cut - keep
+        window.append(word)
+        tokens += word[1]
+    if fresh < len(window):
+        yield " ".join(text for text, _, _ in window)
+
+
+def _cut(window: list[Word], fresh: int, size: int) -> int:
+    """
+    :return: The number of words of the next chunk, after the last paragraph or else sentence in its second half
+    """
+    cuts = {NONE: len(window), SENTENCE: None, PARAGRAPH: None}
+    tokens = 0
+    for i, (_, word_tokens, ending) in enumerate(window):
+        tokens += word_tokens
+        if i >= fresh and ending != NONE and tokens * 2 >= size:
+            cuts[ending] = i + 1
+    return cuts[PARAGRAPH] or cuts[SENTENCE] or cuts[NONE]
@@ -0,0 +1,56 @@
+import asyncio
+import threading
+from weakref import WeakKeyDictionary
+
+from ollama import Client, AsyncClient
+
+from Core.Logger import Logger
+from Core.Priority import Priority
+
+
+class ClientPool(object):
+    """
+    Shares one ollama client per host so that all sessions talking to a host reuse its connection pool.
+    Async clients are bound to the event loop they were created in, so they are pooled per host and loop.
+    """
+    _clients: dict[str | None, Client] = {}
+    _async_clients: WeakKeyDictionary[asyncio.AbstractEventLoop, dict[str | None, AsyncClient]] = WeakKeyDictionary()
+    _lock: threading.Lock = threading.Lock()
+
+    @staticmethod
+    def get_client(host: str = None) -> Client:
+        """
+        Get the client for a host
+        :param host: The host to connect to or None for the local server
+        :return: The shared client of the host
+        """
+        with ClientPool._lock:
+            if host not in ClientPool._clients:
+                Logger.log(f"Creating client for host: {host or 'local'}", Priority.LOW)
+                ClientPool._clients[host] = Client(host=host)
+            return ClientPool._clients[host]
+
+    @staticmethod
+    def get_async_client(host: str = None) -> AsyncClient:
+        """
+        Get the async client for a host in the running event loop
+        :param host: The host to connect to or None for the local server
+        :return: The shared async client of the host
+        """
+        loop = asyncio.get_running_loop()
+        with ClientPool._lock:
+            clients = ClientPool._async_clients.setdefault(loop, {}) # Dropped with the loop once it is collected
+            if host not in clients:
+                Logger.log(f"Creating async client for host: {host or 'local'}", Priority.LOW)
+                clients[host] = AsyncClient(host=host)
+            return clients[host]
+
+    @staticmethod
+    async def close_async_clients() -> None:
+        """
+        Close the async clients of the running event loop, call before the loop shuts down
+        """
+        with ClientPool._lock:
+            clients = ClientPool._async_clients.pop(asyncio.get_running_loop(), {})
+        for client in clients.values():
+            await client.close()
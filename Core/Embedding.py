@@ -1,38 +1,56 @@
-from math import ceil
-from typing import Any
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import chain
+from typing import Any, TYPE_CHECKING, Iterable, Iterator
 
-import chromadb
-import ollama
-from chromadb import Settings
-from chromadb.types import Collection
 from ollama import Client, EmbedResponse
-from pypdf import PdfReader
 
+from Core.Chunker import chunk_words, read_blocks, split_words
+from Core.ClientPool import ClientPool
+from Core.LazyImport import lazy_import
 from Core.Logger import Logger
-from Core.OllamaHelper import check_ollama_server, get_all_models
+from Core.ModelRegistry import get_model_registry
+from Core.OllamaHelper import check_ollama_server
 from Core.Priority import Priority
 from Utils.FileLoader import save_json, load_json
 
+if TYPE_CHECKING:
+    from chromadb.types import Collection
+
+chromadb = lazy_import("chromadb") # The vector database stack is only imported once an Embedding is created
+pypdf = lazy_import("pypdf")
+
+BATCH_SIZE = 64 # Chunks that are embedded with one request and written with one database call
+BATCH_CHARACTERS = 64_000 # Characters of all chunks of a batch, a longer chunk is sent on its own
+
 
 class Embedding:
     # A class to handle embedding models basing on the ollama API library
     _model: str
     _client: Client
-    _collection: Collection
+    _collection: "Collection"
     _embedding_length: int
     _collection_name: str
+    _remote: str | None
+    batch_size: int
+    batch_characters: int
 
-    def __init__(self, model: str, db_path: str | None = None, embedding_length: int = 512, collection_name: str = "embeddings", remote: str = None):
+    def __init__(self, model: str, db_path: str | None = None, embedding_length: int = 512, collection_name: str = "embeddings", remote: str = None,
+                 batch_size: int = BATCH_SIZE, batch_characters: int = BATCH_CHARACTERS):
         assert embedding_length > 0, "The embedding length must be greater than 0"
+        assert batch_size > 0, "The batch size must be greater than 0"
         self._embedding_length = embedding_length
+        self.batch_size = batch_size
+        self.batch_characters = batch_characters
 
-        self._client = Client()
+        self._remote = remote
+        self._client = ClientPool.get_client()
         if remote is not None:
             if not check_ollama_server(remote):
                 raise ValueError("The ollama server is not running on the remote host")
-            self._client = Client(remote=remote)
+            self._client = ClientPool.get_client(remote)
 
-        assert model in get_all_models(host=remote), f"Model {model} not found in the ollama API"
+        if not get_model_registry().has_model(model, remote):
+            raise ValueError(f"Model {model} not found in the ollama API")
         self._model = model
 
         self._collection_name = collection_name
@@ -41,7 +59,7 @@ class Embedding:
 
         if db_path is not None:
             Logger.log(f"ChromaDB Persistent at location {db_path}", priority=Priority.NORMAL)
-            self.db_client = chromadb.Client(Settings(persist_directory=db_path))
+            self.db_client = chromadb.Client(chromadb.Settings(persist_directory=db_path))
         else:
             Logger.log(f"ChromaDB In-Memory because db_path is: {db_path}", priority=Priority.NORMAL)
             self.db_client = chromadb.Client()
@@ -58,11 +76,6 @@ class Embedding:
 
         Logger.log(f"{success and 'Loaded' or 'Created'} Collection: [{self._collection_name}]", priority=Priority.HIGH)
 
-        if not any((model in m["model"]) for m in self._client.list().models):
-            for m in self._client.list().models:
-                print(m["model"], model, model in m["model"])
-            raise ValueError(f"Model {model} not found in the ollama API")
-
         Logger.log("Embedder loaded", priority=Priority.NORMAL)
 
     def embed(self, text: str) -> EmbedResponse:
@@ -73,6 +86,21 @@ class Embedding:
         """
         return self._client.embed(self._model, text)["embeddings"]
 
+    def embed_batch(self, texts: list[str]) -> list[list[float]]:
+        """
+        Embed several texts with a single request
+        :param texts: The texts to embed
+        :return: The embeddings in the order of the texts
+        """
+        return self._client.embed(self._model, texts)["embeddings"]
+
+    def get_dimension(self) -> int | None:
+        """
+        Get the length of the vectors the model embeds into
+        :return: The embedding dimension or None if the server does not report it
+        """
+        return get_model_registry().show(self._model, self._remote).get("embedding_length")
+
     def __len__(self) -> int:
         return self._collection.count()
 
@@ -85,44 +113,102 @@ class Embedding:
         """
         self._collection.add(ids=[str(len(self))], embeddings=embedding, documents=[text], metadatas=[{"source": source}])
 
-    def embed_file(self, file_path: str, overlap: int = 0):
+    def embed_file(self, file_path: str, overlap: int = 0, boundaries: bool = False):
         """
         Embed a file using the model and store the embedding in the database
+        The file is read and chunked block by block, so its size does not matter
         :param file_path: The file path to embed
         :param overlap: The number of tokens to overlap between chunks adds 2overlap tokens to each chunk
+        :param boundaries: End chunks after paragraphs or sentences where possible
         """
-        with open(file_path, "rb") as file:
-            Logger.log(f"Embedding content of file: {file_path}", priority=Priority.NORMAL)
-            content = file.read().decode("utf-8")
-            self._embed_long(content, file_path, token_count=self._embedding_length, overlap=overlap)
+        Logger.log(f"Embedding content of file: {file_path}", priority=Priority.NORMAL)
+        self.add_chunks(self._chunk(read_blocks(file_path), token_count=self._embedding_length, overlap=overlap,
+                                    boundaries=boundaries), file_path)
 
     def _embed_long(self, content: str, source_str: str, token_count: int = 512, overlap: int = 0, auto_balance: bool = True):
         """
-        Embed a long content by splitting it into chunks and embedding each chunk
+        Embed a long content by splitting it into chunks and embedding the chunks in batches
         Saves the embeddings in the database
         :param content: The content to embed
         :param source_str: The path to the file containing the content to add to the metadata
         :param token_count: The number of tokens to embed with each chunk
         :param overlap: The number of tokens to overlap between chunks adds 2overlap tokens to each chunk
         """
+        self.add_chunks(self._chunk([content], token_count, overlap, auto_balance), source_str)
 
-        if auto_balance and overlap > 0:
-            token_count -= 2 * overlap
-
-        chunks: list[str] = []
-
-        current_position = 0
-        for i in range(ceil(len(content.split()) / token_count)):  # Split the file into chunks of 512 words + 1
-            chunk = " ".join(content.split()[max(current_position - overlap, 0):min(current_position + token_count + overlap, len(content.split()))])  # Split the file into chunks of 512 words starting from the current position
-            chunks.append(chunk)
-            current_position += token_count  # Move the current position to the next 512 words
-
-        for i, chunk in enumerate(chunks):  # Iterate over each 512 word chunk
-            embedding = self.embed(chunk)  # Embed the chunk
-            # The embedding is stored in the database with the id of the chunk and the path to the document for
-            # future reference and manual lookup
-            self._collection: Collection
-            self._collection.add(ids=[str(i)], embeddings=embedding, documents=chunk, metadatas=[{"source": source_str}])
+    @staticmethod
+    def _chunk(blocks: Iterable[str], token_count: int = 512, overlap: int = 0, auto_balance: bool = True,
+               boundaries: bool = False) -> Iterator[str]:
+        """
+        Split a text into chunks of estimated tokens in a single pass, consecutive chunks share 2overlap tokens
+        :param blocks: The text in blocks of any size
+        :param auto_balance: If the overlap is part of the token_count instead of added to it
+        :return: The chunks in the order of the text
+        """
+        size = token_count if auto_balance else token_count + 2 * overlap
+        return chunk_words(split_words(blocks), size, overlap=min(2 * overlap, size - 1), boundaries=boundaries)
+
+    def _batches(self, chunks: Iterable[str]) -> Iterator[list[str]]:
+        batch: list[str] = []
+        characters = 0
+        for chunk in chunks:
+            if batch and (len(batch) >= self.batch_size or characters + len(chunk) > self.batch_characters):
+                yield batch
+                batch, characters = [], 0
+            batch.append(chunk)
+            characters += len(chunk)
+        if batch:
+            yield batch
+
+    def _embed_splitting(self, batch: list[str]) -> list[list[float] | None]:
+        """
+        Embed a batch, a failed batch is retried as two halves until only the failing chunks are left
+        :return: The embeddings of the batch, None for every chunk that could not be embedded
+        """
+        try:
+            return self.embed_batch(batch)
+        except Exception as e:
+            if len(batch) == 1:
+                Logger.log(f"Failed to embed chunk of {len(batch[0])} characters: {e}", Priority.HIGH)
+                return [None]
+            Logger.log(f"Failed to embed batch of {len(batch)} chunks, retrying as halves: {e}", Priority.NORMAL)
+            half = len(batch) // 2
+            return self._embed_splitting(batch[:half]) + self._embed_splitting(batch[half:])
+
+    def add_chunks(self, chunks: Iterable[str], source: str = "None") -> int:
+        """
+        Embed chunks in batches and store them in the database with one write per batch.
+        The next batch is embedded while the previous one is written and the following one is chunked
+        :param chunks: The texts to embed, only the current batches are kept in memory
+        :param source: The source of the texts to add to the metadata
+        :return: The number of chunks that were stored, chunks that fail to embed on their own are skipped
+        """
+        next_id = len(self) # Ids continue after the stored chunks, so files and pages never overwrite each other
+        stored = total = 0
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="embed") as executor:
+            pending: tuple[list[str], Future] | None = None
+            for batch in self._batches(chunks):
+                embedding = executor.submit(self._embed_splitting, batch)
+                total += len(batch)
+                if pending is not None:
+                    written = self._write_batch(*pending, next_id, source)
+                    next_id, stored = next_id + written, stored + written
+                pending = (batch, embedding)
+            if pending is not None:
+                stored += self._write_batch(*pending, next_id, source)
+        Logger.log(f"Stored {stored} of {total} chunks of {source}", Priority.NORMAL)
+        return stored
+
+    def _write_batch(self, batch: list[str], embedding: Future, first_id: int, source: str) -> int:
+        embedded = [(chunk, vector) for chunk, vector in zip(batch, embedding.result()) if vector is not None]
+        if not embedded:
+            return 0
+        # The chunks are stored with their ids and the path to the document for future reference and manual lookup
+        self._collection.add(ids=[str(first_id + i) for i in range(len(embedded))],
+                             embeddings=[vector for _, vector in embedded],
+                             documents=[chunk for chunk, _ in embedded],
+                             metadatas=[{"source": source}] * len(embedded))
+        return len(embedded)
 
     def embed_pdf(self, pdf_path: str, overlap: int = 0):
         """
@@ -132,11 +218,14 @@ class Embedding:
         :param pdf_path: The path to the pdf file
         """
         # Use the pypdf library to extract the text from the pdf
-        reader = PdfReader(pdf_path)
+        reader = pypdf.PdfReader(pdf_path)
         Logger.log(f"Embedding content of pdf: {pdf_path}", priority=Priority.NORMAL)
-        for page in reader.pages:
-            Logger.log(f"Page: {page} / {reader.pages}", priority=Priority.NORMAL)
-            self._embed_long(content=page.extract_text(), source_str=pdf_path, token_count=self._embedding_length, overlap=overlap)
+        def pages() -> Iterator[Iterator[str]]:
+            for number, page in enumerate(reader.pages, start=1):
+                Logger.log(f"Page: {number} / {len(reader.pages)}", priority=Priority.NORMAL)
+                yield self._chunk([page.extract_text()], token_count=self._embedding_length, overlap=overlap)
+        # Pages are extracted as the batches need them, batches span pages so short pages do not make small batches
+        self.add_chunks(chain.from_iterable(pages()), pdf_path)
 
     # noinspection SpellCheckingInspection
     def query_by_embedding(self, embedding: list[float], number_of_results: int = 1) -> dict:
@@ -0,0 +1,207 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable
+
+import httpx
+import requests
+from ollama._client import _parse_host
+
+from Core.Logger import Logger
+from Core.Priority import Priority
+
+TRANSPORT_ERRORS = (ConnectionError, httpx.TransportError) # The host could not be reached or dropped the connection
+PROBE_TIMEOUT = (2.0, 3.0) # Connect and read timeout in seconds
+FRESH_FOR = 10.0 # Seconds a probe result is trusted without probing again
+BACKOFF_BASE = 2.0 # Seconds the circuit stays open after the first failure
+BACKOFF_MAX = 300.0
+
+
+def host_url(host: str | None) -> str:
+    """
+    :param host: The host as written in the settings, with or without a scheme, or None for the local server
+    :return: The base url of the host, the local server is read from OLLAMA_HOST the same way the ollama client does
+    """
+    if not host:
+        return _parse_host(os.getenv("OLLAMA_HOST"))
+    return host if "://" in host else f"http://{host}"
+
+
+class HostState:
+    up: bool | None # None until the first probe
+    checked_at: float
+    failures: int # Consecutive failures
+    open_until: float # The circuit is open and no probes are sent until then
+    latency: float | None # Seconds the last successful probe took
+
+    def __init__(self):
+        self.up = None
+        self.checked_at = 0.0
+        self.failures = 0
+        self.open_until = 0.0
+        self.latency = None
+
+    def dict(self) -> dict:
+        return {
+            "up": self.up,
+            "failures": self.failures,
+            "open_for": max(self.open_until - time.monotonic(), 0.0),
+            "latency": self.latency
+        }
+
+
+class HealthMonitor:
+    """
+    Keeps the up/down state of every ollama host.
+    Probes reuse a keep-alive session per host and can run in parallel for all hosts. After a failure a per-host
+    circuit breaker stops probing for an exponentially growing backoff, so a dead host answers False immediately
+    instead of blocking for the full timeout.
+    """
+    _states: dict[str | None, HostState]
+    _sessions: dict[str | None, requests.Session]
+
+    def __init__(self):
+        self._states = {}
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._probe_locks: dict[str | None, threading.Lock] = {}
+        self._monitor: threading.Thread | None = None
+        self._stop = threading.Event()
+
+    def _state(self, host: str | None) -> HostState:
+        with self._lock:
+            if host not in self._states:
+                self._states[host] = HostState()
+                self._sessions[host] = requests.Session()
+                self._probe_locks[host] = threading.Lock()
+            return self._states[host]
+
+    def probe(self, host: str | None) -> bool:
+        """
+        Ask a host if ollama is running, ignoring the cached state but respecting an open circuit
+        :param host: The host or None for the local server
+        :return: True if the server is running
+        """
+        state = self._state(host)
+        if time.monotonic() < state.open_until:
+            return False
+        with self._probe_locks[host]: # Concurrent callers share one probe
+            if time.monotonic() - state.checked_at < 0.1:
+                return bool(state.up)
+            started = time.monotonic()
+            try:
+                response = self._sessions[host].get(host_url(host), timeout=PROBE_TIMEOUT)
+                up = response.text.strip().upper() == "OLLAMA IS RUNNING"
+            except requests.RequestException as e:
+                Logger.log(f"Probing {host or 'local'} failed: {e}", Priority.LOW)
+                up = False
+            if up:
+                self.report_success(host, time.monotonic() - started)
+            else:
+                self.report_failure(host)
+            return up
+
+    def report_success(self, host: str | None, latency: float = None) -> None:
+        """
+        Mark a host as up, also used by generations that reached the host
+        :param host: The host or None for the local server
+        :param latency: The seconds the request took
+        """
+        state = self._state(host)
+        with self._lock:
+            if state.up is False:
+                Logger.log(f"Host {host or 'local'} is up again", Priority.NORMAL)
+            state.up = True
+            state.failures = 0
+            state.open_until = 0.0
+            state.checked_at = time.monotonic()
+            if latency is not None:
+                state.latency = latency
+
+    def report_failure(self, host: str | None) -> None:
+        """
+        Mark a host as down and open its circuit, also used by generations that could not reach the host
+        :param host: The host or None for the local server
+        """
+        state = self._state(host)
+        with self._lock:
+            state.up = False
+            state.failures += 1
+            state.checked_at = time.monotonic()
+            backoff = min(BACKOFF_BASE * 2 ** (state.failures - 1), BACKOFF_MAX)
+            state.open_until = state.checked_at + backoff
+        Logger.log(f"Host {host or 'local'} is down, next probe in {backoff}s", Priority.HIGH)
+
+    def is_fresh(self, host: str | None) -> bool:
+        """
+        :param host: The host or None for the local server
+        :return: True if is_up answers from the cached state without probing the host
+        """
+        state = self._state(host)
+        now = time.monotonic()
+        return now < state.open_until or (state.up is not None and now - state.checked_at < FRESH_FOR)
+
+    def is_up(self, host: str | None) -> bool:
+        """
+        Get the cached state of a host, it is only probed if the state is unknown or outdated
+        :param host: The host or None for the local server
+        :return: True if the server is running
+        """
+        state = self._state(host)
+        if time.monotonic() < state.open_until:
+            return False
+        if state.up is not None and time.monotonic() - state.checked_at < FRESH_FOR:
+            return state.up
+        return self.probe(host)
+
+    def probe_all(self, hosts: Iterable[str | None]) -> dict[str | None, bool]:
+        """
+        Probe several hosts in parallel
+        :param hosts: The hosts to probe
+        :return: The state of every host
+        """
+        hosts = list(dict.fromkeys(hosts))
+        if not hosts:
+            return {}
+        with ThreadPoolExecutor(max_workers=len(hosts)) as executor:
+            return dict(zip(hosts, executor.map(self.probe, hosts)))
+
+    def start(self, interval: float = FRESH_FOR / 2) -> None:
+        """
+        Keep probing every known host in a background thread so lookups never have to wait
+        :param interval: Seconds between the probing rounds
+        """
+        if self._monitor is not None and self._monitor.is_alive():
+            return
+        self._stop.clear()
+        self._monitor = threading.Thread(target=self._run, args=(interval,), daemon=True, name="health-monitor")
+        self._monitor.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            with self._lock:
+                hosts = list(self._states)
+            self.probe_all(hosts)
+
+    def states(self) -> dict[str, dict]:
+        """
+        :return: The state of every known host
+        """
+        with self._lock:
+            return {host or "local": state.dict() for host, state in self._states.items()}
+
+
+_monitor: HealthMonitor | None = None
+
+def get_health_monitor() -> HealthMonitor:
+    """
+    :return: The health monitor shared by all sessions
+    """
+    global _monitor
+    if _monitor is None:
+        _monitor = HealthMonitor()
+    return _monitor
@@ -0,0 +1,272 @@
+import os
+import threading
+from concurrent.futures import Future
+from math import ceil
+from typing import List, TYPE_CHECKING
+
+from Core.Logger import Logger
+from Core.Priority import Priority
+from Core.Scheduler import get_scheduler, JobPriority
+from Utils.FileLoader import load_json, save_json
+
+if TYPE_CHECKING:
+    from ollama import Client
+    from Core.Alpacca import ChatExchange
+
+CHARS_PER_TOKEN = 4 # Rough average for the tokenizers of the usual ollama models
+HISTORY_HEADER = "Chat history:\n"
+MESSAGE_SEPARATOR = " --Next Message-- \n"
+
+SUMMARY_PROMPT = """You maintain a running summary of a conversation between a user and an AI assistant.
+Keep every fact, decision and open question that may be needed later, drop pleasantries. Answer with the summary only.
+
+Current summary:
+%Summary%
+
+New exchanges:
+%Exchanges%"""
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens a text will take up in the model's context
+    :param text: The text to estimate
+    :return: The estimated number of tokens
+    """
+    return ceil(len(text) / CHARS_PER_TOKEN)
+
+def exchange_string(exchange: "ChatExchange", thoughts_limit: int | None = None) -> str:
+    """
+    Render a single chat exchange the way it is shown to the model
+    :param exchange: The exchange to render
+    :param thoughts_limit: Maximum number of characters of the thoughts to keep, None keeps all and 0 drops them
+    :return: The rendered exchange
+    """
+    partial = f"user prompted: '{exchange.user}'\n"
+    thoughts = exchange.thoughts
+    if thoughts_limit is not None and len(thoughts) > thoughts_limit:
+        thoughts = thoughts[:thoughts_limit] + "..." if thoughts_limit > 0 else None
+    if thoughts is not None: # Empty thoughts are still rendered, like every history before the policy
+        partial += f"you thought: '{thoughts}'\n"
+    partial += f"you answered: '{exchange.answer}'\n"
+    return partial
+
+class HistorySegment:
+    """
+    Caches the rendered exchanges of a history so that appending an exchange only renders the new one
+    """
+    _exchanges: List["ChatExchange"]
+    _full: List[str]
+    _reduced: dict[tuple[int, int], str]
+
+    def __init__(self):
+        self._exchanges = []
+        self._full = []
+        self._reduced = {}
+
+    def invalidate(self) -> None:
+        """
+        Drop all rendered exchanges, needed after an exchange was edited in place
+        """
+        self._exchanges = []
+        self._full = []
+        self._reduced = {}
+
+    def sync(self, history: List["ChatExchange"]) -> None:
+        """
+        Render the exchanges that were appended since the last call
+        :param history: The full history
+        """
+        cached = len(self._exchanges)
+        if cached > len(history) or (cached and history[cached - 1] is not self._exchanges[-1]):
+            self.invalidate()
+        for exchange in history[len(self._exchanges):]:
+            self._exchanges.append(exchange)
+            self._full.append(exchange_string(exchange))
+
+    def exchange(self, index: int, thoughts_limit: int | None = None) -> str:
+        """
+        :param index: The index of the exchange in the history
+        :param thoughts_limit: Maximum number of characters of the thoughts to keep, None keeps all
+        :return: The rendered exchange
+        """
+        if thoughts_limit is None or len(self._exchanges[index].thoughts) <= thoughts_limit:
+            return self._full[index]
+        key = (index, thoughts_limit)
+        if key not in self._reduced:
+            self._reduced[key] = exchange_string(self._exchanges[index], thoughts_limit)
+        return self._reduced[key]
+
+    def parts(self, start: int = 0) -> List[str]:
+        """
+        :param start: The first exchange to include
+        :return: The parts of the history string, without joining them
+        """
+        parts = [HISTORY_HEADER]
+        for i in range(start, len(self._full)):
+            if i != start:
+                parts.append(MESSAGE_SEPARATOR)
+            parts.append(self._full[i])
+        return parts
+
+def summary_location(history_location: str) -> str:
+    """
+    :param history_location: The location of the history file
+    :return: The location of the summary file stored next to the history
+    """
+    return os.path.splitext(history_location)[0] + ".summary.json"
+
+
+class HistoryPolicy:
+    """
+    Keeps the history part of the prompt under a token budget.
+    Only the most recent turns are sent, older turns lose their thoughts and evicted turns are folded into a
+    rolling summary that is generated in the background by a (cheaper) summary model.
+    """
+    token_budget: int
+    recent_turns: int
+    full_thoughts_turns: int
+    thoughts_limit: int
+    summary_model: str | None
+    summary: str = ""
+    summarized_turns: int = 0 # Number of exchanges from the start of the history folded into the summary
+
+    def __init__(self, token_budget: int = 2048, recent_turns: int = 8, full_thoughts_turns: int = 1,
+                 thoughts_limit: int = 0, summary_model: str = None):
+        assert token_budget > 0, "The token budget must be greater than 0"
+        assert recent_turns > 0, "At least one recent turn has to be kept"
+        self.token_budget = token_budget
+        self.recent_turns = recent_turns
+        self.full_thoughts_turns = full_thoughts_turns
+        self.thoughts_limit = thoughts_limit
+        self.summary_model = summary_model
+        self.summary = ""
+        self.summarized_turns = 0
+        self._lock = threading.Lock()
+        self._pending: Future | None = None
+
+    def window_start(self, history: List["ChatExchange"], segment: HistorySegment = None) -> int:
+        """
+        Find the first exchange that is still sent verbatim
+        :param history: The full history
+        :param segment: The rendered exchanges of the history, rendered on the fly if None
+        :return: The index of the first exchange inside the window
+        """
+        segment = segment or self._segment(history)
+        budget = self.token_budget - estimate_tokens(self.summary)
+        start = len(history)
+        lowest = max(len(history) - self.recent_turns, 0)
+        while start > lowest:
+            cost = estimate_tokens(self._render_exchange(history, segment, start - 1))
+            if cost > budget and start != len(history): # The latest exchange is always kept
+                break
+            budget -= cost
+            start -= 1
+        return start
+
+    @staticmethod
+    def _segment(history: List["ChatExchange"]) -> HistorySegment:
+        segment = HistorySegment()
+        segment.sync(history)
+        return segment
+
+    def _render_exchange(self, history: List["ChatExchange"], segment: HistorySegment, index: int) -> str:
+        full_thoughts = index >= len(history) - self.full_thoughts_turns
+        return segment.exchange(index, None if full_thoughts else self.thoughts_limit)
+
+    def parts(self, history: List["ChatExchange"], segment: HistorySegment) -> List[str]:
+        """
+        Render the history for the prompt, staying within the token budget
+        :param history: The full history
+        :param segment: The rendered exchanges of the history, synced with the history
+        :return: The parts of the summary followed by the exchanges inside the window
+        """
+        start = self.window_start(history, segment)
+        with self._lock:
+            summary = self.summary
+        parts = [HISTORY_HEADER]
+        if summary:
+            parts.append(f"Summary of the earlier conversation: '{summary}'\n")
+        for i in range(start, len(history)):
+            if i != start:
+                parts.append(MESSAGE_SEPARATOR)
+            parts.append(self._render_exchange(history, segment, i))
+        return parts
+
+    def render(self, history: List["ChatExchange"]) -> str:
+        """
+        Render the history for the prompt, staying within the token budget
+        :param history: The full history
+        :return: The summary followed by the exchanges inside the window
+        """
+        return "".join(self.parts(history, self._segment(history)))
+
+    def maintain(self, history: List["ChatExchange"], client: "Client", session: str = None, host: str = None) -> None:
+        """
+        Fold exchanges that left the window into the summary, as a background job of the generation scheduler
+        :param history: The full history
+        :param client: The client to run the summary model on
+        :param session: The session the history belongs to
+        :param host: The host of the client or None for the local server
+        """
+        if self.summary_model is None or (self._pending is not None and not self._pending.done()):
+            return
+        start = self.window_start(history)
+        if start <= self.summarized_turns:
+            return
+        evicted = history[self.summarized_turns:start]
+        self._pending = get_scheduler().submit(f"{session}-summary", host, lambda: self._summarize(evicted, start, client),
+                                               JobPriority.BACKGROUND)
+
+    def _summarize(self, evicted: List["ChatExchange"], summarized_turns: int, client: "Client") -> None:
+        Logger.log(f"Summarizing {len(evicted)} evicted exchanges using: {self.summary_model}", Priority.LOW)
+        exchanges = MESSAGE_SEPARATOR.join(exchange_string(e, 0) for e in evicted)
+        with self._lock:
+            summary = self.summary
+        prompt = SUMMARY_PROMPT.replace("%Summary%", summary or "None").replace("%Exchanges%", exchanges)
+        try:
+            response = client.generate(model=self.summary_model, prompt=prompt, options={"temperature": 0.2})
+        except Exception as e:
+            Logger.log(f"Summarizing failed: {e}", Priority.HIGH)
+            return
+        with self._lock:
+            self.summary = response["response"].split("</think>")[-1].strip()
+            self.summarized_turns = summarized_turns
+        Logger.log(f"Summary now covers {summarized_turns} exchanges", Priority.LOW)
+
+    def load_summary(self, history_location: str) -> None:
+        """
+        Load the summary stored next to a history file
+        :param history_location: The location of the history file
+        """
+        location = summary_location(history_location)
+        if not os.path.isfile(location):
+            return
+        data = load_json(location)
+        with self._lock:
+            self.summary = data.get("summary", "")
+            self.summarized_turns = data.get("turns", 0)
+
+    def save_summary(self, history_location: str) -> None:
+        """
+        Save the summary next to a history file
+        :param history_location: The location of the history file
+        """
+        with self._lock:
+            data = {"summary": self.summary, "turns": self.summarized_turns}
+        save_json(data, summary_location(history_location))
+
+    def settings_to_dict(self) -> dict:
+        """
+        :return: The settings of the policy as a dictionary
+        """
+        return {
+            "token_budget": self.token_budget,
+            "recent_turns": self.recent_turns,
+            "full_thoughts_turns": self.full_thoughts_turns,
+            "thoughts_limit": self.thoughts_limit,
+            "summary_model": self.summary_model
+        }
+
+def history_policy_from_dict(d: dict) -> HistoryPolicy:
+    return HistoryPolicy(**d)
@@ -0,0 +1,296 @@
+import json
+import os
+import struct
+import threading
+import time
+from typing import List
+
+from Core.Logger import Logger
+from Core.Priority import Priority
+
+SYNC_INTERVAL = 1.0 # Seconds an appended record may wait before it is fsynced
+SYNC_EVERY = 32 # Appended records that are fsynced together at most
+COMPACT_MIN = 64 # Superseded partial records that trigger a compaction once they outnumber the exchanges
+PARTIAL = "partial" # Key marking the snapshot of a response that is still being generated
+_OFFSET = struct.Struct("<Q")
+
+
+def history_store_location(history_location: str) -> str:
+    """
+    :param history_location: The history location as saved in the settings, usually a .json file
+    :return: The location of the append-only store of the history
+    """
+    root, extension = os.path.splitext(history_location)
+    return history_location if extension == ".jsonl" else root + ".jsonl"
+
+
+class HistoryStore:
+    """
+    An append-only JSON lines file of chat exchanges with a tail index.
+    Every exchange is one line written as soon as it completes and fsynced in batches, so saving costs O(1) instead
+    of rewriting the whole history and a crash loses at most the last second. Snapshots of a response that is still
+    streaming are appended as partial records, the last one is recovered if the app dies before the exchange is
+    complete. The index file holds the byte offset of every exchange, so the last N exchanges load without parsing
+    the whole file. Superseded partial records are dropped by rewriting the file once they pile up.
+    """
+    _location: str
+    _count: int # Number of exchanges in the store
+    _garbage: int # Partial records that are superseded or will be once the exchange completes
+    _unsynced: int # Records written since the last fsync
+
+    def __init__(self, location: str, sync_interval: float = SYNC_INTERVAL, sync_every: int = SYNC_EVERY):
+        self._location = location
+        self._index_location = location + ".idx"
+        self._sync_interval = sync_interval
+        self._sync_every = sync_every
+        self._lock = threading.RLock()
+        self._timer: threading.Timer | None = None
+        self._unsynced = 0
+        self._garbage = 0
+        os.makedirs(os.path.dirname(location) or ".", exist_ok=True)
+        self._recover()
+        self._open()
+
+    def _open(self) -> None:
+        self._file = open(self._location, "ab")
+        self._index = open(self._index_location, "ab")
+
+    def _recover(self) -> None:
+        """
+        Drop a torn last line and bring the index up to date with the file, only the tail is read
+        """
+        if not os.path.exists(self._location):
+            open(self._location, "wb").close()
+        with open(self._location, "rb+") as file:
+            size = file.seek(0, os.SEEK_END)
+            if size:
+                file.seek(max(size - 1, 0))
+                if file.read(1) != b"\n": # The app died while writing the last line
+                    end = self._last_line_end(file, size)
+                    Logger.log(f"Dropping a torn record of {size - end} bytes from {self._location}", Priority.HIGH)
+                    file.truncate(end)
+                    size = end
+
+        offsets = self._read_offsets()
+        if offsets and (offsets[-1] >= size or not self._is_line_start(offsets[-1])):
+            Logger.log(f"Rebuilding the index of {self._location}", Priority.HIGH)
+            offsets = []
+        start = offsets[-1] if offsets else 0
+        with open(self._location, "rb") as file:
+            file.seek(start)
+            position = start
+            for line in file:
+                if position > start or not offsets:
+                    if not json.loads(line).get(PARTIAL):
+                        offsets.append(position)
+                    else:
+                        self._garbage += 1
+                position += len(line)
+        with open(self._index_location, "wb") as index:
+            index.write(b"".join(_OFFSET.pack(offset) for offset in offsets))
+        self._count = len(offsets)
+
+    @staticmethod
+    def _last_line_end(file, size: int) -> int:
+        position = size
+        while position > 0:
+            step = min(4096, position)
+            file.seek(position - step)
+            chunk = file.read(step)
+            newline = chunk.rfind(b"\n")
+            if newline >= 0:
+                return position - step + newline + 1
+            position -= step
+        return 0
+
+    def _is_line_start(self, offset: int) -> bool:
+        if offset == 0:
+            return True
+        with open(self._location, "rb") as file:
+            file.seek(offset - 1)
+            return file.read(1) == b"\n"
+
+    def _read_offsets(self, last: int = None) -> List[int]:
+        if not os.path.exists(self._index_location):
+            return []
+        with open(self._index_location, "rb") as index:
+            entries = index.seek(0, os.SEEK_END) // _OFFSET.size
+            first = max(entries - last, 0) if last is not None else 0
+            index.seek(first * _OFFSET.size)
+            data = index.read((entries - first) * _OFFSET.size)
+        return [offset for (offset,) in _OFFSET.iter_unpack(data)]
+
+    def __len__(self) -> int:
+        return self._count
+
+    def get_location(self) -> str:
+        return self._location
+
+    def append(self, record: dict) -> None:
+        """
+        Append a completed exchange
+        :param record: The exchange as a dictionary
+        """
+        with self._lock:
+            offset = self._file.tell()
+            self._write(record)
+            self._index.write(_OFFSET.pack(offset))
+            self._index.flush()
+            self._count += 1
+            if self._garbage >= max(COMPACT_MIN, self._count):
+                self.compact()
+
+    def write_partial(self, record: dict) -> None:
+        """
+        Append a snapshot of the exchange that is being generated, replaced by the next snapshot or exchange
+        :param record: The exchange so far as a dictionary
+        """
+        with self._lock:
+            self._write({**record, PARTIAL: True})
+            self._garbage += 1
+
+    def _write(self, record: dict) -> None:
+        self._file.write(json.dumps(record, ensure_ascii=False).encode() + b"\n")
+        self._file.flush() # Survives a crash of the app, the fsync makes it survive a crash of the system
+        self._unsynced += 1
+        if self._unsynced >= self._sync_every:
+            self.sync()
+        elif self._timer is None:
+            self._timer = threading.Timer(self._sync_interval, self.sync)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def sync(self) -> None:
+        """
+        Flush all appended records to the disk
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._unsynced and not self._file.closed:
+                os.fsync(self._file.fileno())
+                os.fsync(self._index.fileno())
+                self._unsynced = 0
+
+    def load(self, last: int = None) -> tuple[List[dict], dict | None]:
+        """
+        Read the exchanges, only the tail of the file is parsed if just the last ones are needed
+        :param last: The number of most recent exchanges to load or None for all
+        :return: The exchanges and the partial exchange that was being generated after the last one, if any
+        """
+        with self._lock:
+            self._file.flush()
+            start = 0
+            if last is not None:
+                offsets = self._read_offsets(last)
+                start = offsets[0] if offsets else self._file.tell()
+            records, partial = [], None
+            with open(self._location, "rb") as file:
+                file.seek(start)
+                for line in file:
+                    record = json.loads(line)
+                    if record.pop(PARTIAL, False):
+                        partial = record
+                    else:
+                        records.append(record)
+                        partial = None
+            return records, partial
+
+    def load_range(self, start: int, stop: int) -> List[dict]:
+        """
+        Read a slice of the exchanges using the index
+        :param start: The index of the first exchange
+        :param stop: The index after the last exchange
+        :return: The exchanges start to stop
+        """
+        start, stop = max(start, 0), min(stop, self._count)
+        if start >= stop:
+            return []
+        with self._lock:
+            self._file.flush()
+            offsets = self._read_offsets(self._count - start)
+            records = []
+            with open(self._location, "rb") as file:
+                file.seek(offsets[0])
+                for line in file:
+                    record = json.loads(line)
+                    if not record.get(PARTIAL):
+                        records.append(record)
+                        if len(records) == stop - start:
+                            break
+            return records
+
+    def compact(self) -> None:
+        """
+        Rewrite the file without the superseded partial records
+        """
+        with self._lock:
+            started = time.monotonic()
+            records, _ = self.load()
+            self._file.close()
+            self._index.close()
+            temporary = self._location + ".tmp"
+            offsets = []
+            with open(temporary, "wb") as file:
+                for record in records:
+                    offsets.append(file.tell())
+                    file.write(json.dumps(record, ensure_ascii=False).encode() + b"\n")
+                file.flush()
+                os.fsync(file.fileno())
+            with open(self._index_location + ".tmp", "wb") as index:
+                index.write(b"".join(_OFFSET.pack(offset) for offset in offsets))
+                index.flush()
+                os.fsync(index.fileno())
+            os.replace(temporary, self._location)
+            os.replace(self._index_location + ".tmp", self._index_location)
+            self._count = len(records)
+            self._garbage = 0
+            self._unsynced = 0
+            self._open()
+            Logger.log(f"Compacted {self._location} in {time.monotonic() - started:.3f}s", Priority.LOW)
+
+    def close(self) -> None:
+        with self._lock:
+            self.sync()
+            self._file.close()
+            self._index.close()
+
+
+def load_history_file(location: str) -> List[dict]:
+    """
+    Read the exchanges of a history in either format, without opening it for writing
+    :param location: A legacy .json history or a .jsonl store
+    :return: The exchanges as dictionaries
+    """
+    if not location.endswith(".jsonl"):
+        with open(location) as file:
+            return json.load(file) or []
+    exchanges = []
+    with open(location, "rb") as file:
+        for line in file:
+            if line.endswith(b"\n"): # A torn last line is ignored
+                record = json.loads(line)
+                if not record.get(PARTIAL):
+                    exchanges.append(record)
+    return exchanges
+
+
+def migrate_json_history(history_location: str, store: HistoryStore) -> bool:
+    """
+    Move a history saved in the old whole-file json format into an empty store.
+    The old file is kept next to it with a .bak suffix
+    :param history_location: The location of the old json history
+    :param store: The store to append the exchanges to
+    :return: True if a history was migrated
+    """
+    if len(store) > 0 or history_location == store.get_location() or not os.path.isfile(history_location):
+        return False
+    with open(history_location) as file:
+        exchanges = json.load(file) or [] # Older versions saved an empty history as {}
+    for exchange in exchanges:
+        store.append(exchange)
+    store.sync()
+    os.replace(history_location, history_location + ".bak")
+    Logger.log(f"Migrated {len(exchanges)} exchanges from {history_location} to {store.get_location()}", Priority.NORMAL)
+    return True
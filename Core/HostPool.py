@@ -0,0 +1,172 @@
+import threading
+import time
+from typing import Iterator, List
+
+from ollama import GenerateResponse, ResponseError
+
+from Core.ClientPool import ClientPool
+from Core.HealthMonitor import get_health_monitor, TRANSPORT_ERRORS
+from Core.Logger import Logger
+from Core.ModelRegistry import get_model_registry
+from Core.Priority import Priority
+from Core.Scheduler import get_scheduler
+
+SMOOTHING = 0.3 # Weight of the newest generation in the moving averages
+
+
+class HostStats:
+    tokens_per_second: float | None # Moving average of the decode speed
+    first_token: float | None # Moving average of the seconds until the first token
+    in_flight: int # Generations of this pool currently streaming from the host
+
+    def __init__(self):
+        self.tokens_per_second = None
+        self.first_token = None
+        self.in_flight = 0
+
+    def record(self, first_token: float, tokens_per_second: float | None) -> None:
+        self.first_token = first_token if self.first_token is None else \
+            SMOOTHING * first_token + (1 - SMOOTHING) * self.first_token
+        if tokens_per_second is not None:
+            self.tokens_per_second = tokens_per_second if self.tokens_per_second is None else \
+                SMOOTHING * tokens_per_second + (1 - SMOOTHING) * self.tokens_per_second
+
+
+class NoHostAvailable(ConnectionError):
+    pass
+
+
+class HostPool:
+    """
+    The ollama hosts one session may generate on.
+    Every generation goes to the least loaded healthy host that has the model, with the recent time to first token
+    and decode speed breaking ties. If a host fails before the first token the next host is tried.
+    """
+    _hosts: List[str | None]
+    _stats: dict[str | None, HostStats]
+    last_host: str | None # The host the last generation went to
+
+    def __init__(self, hosts: List[str | None]):
+        assert len(hosts) > 0, "A host pool needs at least one host"
+        self._hosts = list(dict.fromkeys(hosts))
+        self._stats = {host: HostStats() for host in self._hosts}
+        self._lock = threading.Lock()
+        self.last_host = None
+
+    def get_hosts(self) -> List[str | None]:
+        return list(self._hosts)
+
+    def _score(self, host: str | None) -> tuple:
+        stats = self._stats[host]
+        scheduler = get_scheduler()
+        load = (scheduler.running(host) + scheduler.queued(host) + stats.in_flight) / scheduler.get_limit(host)
+        return (load, stats.first_token if stats.first_token is not None else 0.0,
+                -(stats.tokens_per_second or 0.0))
+
+    def candidates(self, model: str) -> List[str | None]:
+        """
+        Get the healthy hosts that have the model, best first
+        :param model: The model to generate with
+        :return: The hosts in the order they should be tried
+        """
+        monitor = get_health_monitor()
+        registry = get_model_registry()
+        stale = [host for host in self._hosts if not monitor.is_fresh(host)]
+        if len(stale) > 1: # Probed in parallel, so one slow host does not delay the others
+            monitor.probe_all(stale)
+        healthy = []
+        for host in self._hosts:
+            try:
+                if monitor.is_up(host) and registry.has_model(model, host):
+                    healthy.append(host)
+            except Exception as e:
+                Logger.log(f"Skipping host {host or 'local'}: {e}", Priority.LOW)
+        return sorted(healthy, key=self._score)
+
+    def select(self, model: str) -> str | None:
+        """
+        :param model: The model to generate with
+        :return: The best host for the next generation
+        """
+        candidates = self.candidates(model)
+        if not candidates:
+            raise NoHostAvailable(f"No healthy host of {self._hosts} has the model {model}")
+        return candidates[0]
+
+    def _ordered(self, model: str, preferred: str | None) -> List[str | None]:
+        candidates = self.candidates(model)
+        if preferred in candidates: # The generation was already scheduled for this host
+            candidates.remove(preferred)
+            candidates.insert(0, preferred)
+        return candidates
+
+    def generate(self, model: str, preferred: str = None, **kwargs) -> Iterator[GenerateResponse]:
+        """
+        Stream a generation from the best host, failing over to the next one before the first token
+        :param model: The model to generate with
+        :param preferred: The host to try first if it is healthy, typically the one returned by select
+        :param kwargs: The arguments for Client.generate
+        :return: The parts of the response
+        """
+        for host in self._ordered(model, preferred):
+            started = time.monotonic()
+            iterator = ClientPool.get_client(host).generate(model=model, stream=True, **kwargs)
+            try:
+                first = next(iterator)
+            except StopIteration:
+                return iter([])
+            except (*TRANSPORT_ERRORS, ResponseError) as e:
+                Logger.log(f"Host {host or 'local'} failed before the first token, failing over: {e}", Priority.HIGH)
+                if not isinstance(e, ResponseError):
+                    get_health_monitor().report_failure(host)
+                continue
+            self.last_host = host
+            return self._follow(host, started, first, iterator)
+        raise NoHostAvailable(f"No host of {self._hosts} could generate with the model {model}")
+
+    def _follow(self, host: str | None, started: float, first: GenerateResponse,
+                iterator: Iterator[GenerateResponse]) -> Iterator[GenerateResponse]:
+        stats = self._stats[host]
+        first_token = time.monotonic() - started
+        with self._lock:
+            stats.in_flight += 1
+        try:
+            yield first
+            for part in iterator:
+                if part.done:
+                    speed = part.eval_count / (part.eval_duration / 1e9) if part.eval_count and part.eval_duration else None
+                    with self._lock:
+                        stats.record(first_token, speed)
+                yield part
+        except TRANSPORT_ERRORS:
+            get_health_monitor().report_failure(host) # The connection dropped mid-stream, too late to fail over
+            raise
+        finally:
+            with self._lock:
+                stats.in_flight -= 1
+
+    def generate_once(self, model: str, preferred: str = None, **kwargs) -> GenerateResponse:
+        """
+        Generate a complete response on the best host, failing over to the next one on errors
+        :param model: The model to generate with
+        :param preferred: The host to try first if it is healthy
+        :param kwargs: The arguments for Client.generate
+        :return: The response
+        """
+        for host in self._ordered(model, preferred):
+            try:
+                response = ClientPool.get_client(host).generate(model=model, **kwargs)
+                self.last_host = host
+                return response
+            except (*TRANSPORT_ERRORS, ResponseError) as e:
+                Logger.log(f"Host {host or 'local'} failed, failing over: {e}", Priority.HIGH)
+                if not isinstance(e, ResponseError):
+                    get_health_monitor().report_failure(host)
+        raise NoHostAvailable(f"No host of {self._hosts} could generate with the model {model}")
+
+    def stats(self) -> dict[str, dict]:
+        """
+        :return: The moving averages and streaming generations of every host
+        """
+        with self._lock:
+            return {host or "local": dict(vars(stats)) for host, stats in self._stats.items()}
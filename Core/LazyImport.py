@@ -0,0 +1,56 @@
+import importlib
+import sys
+import threading
+import types
+
+_lock = threading.Lock()
+
+
+class LazyModule(types.ModuleType):
+    """
+    Stands in for a module that is only imported on the first attribute access.
+    Used for heavy optional dependencies (the vector database, pdf parsing, plotting) so importing a module that
+    only sometimes needs them stays cheap.
+    """
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__["_module"] = None
+
+    def _load(self) -> types.ModuleType:
+        module = self.__dict__["_module"]
+        if module is None:
+            with _lock:
+                module = self.__dict__["_module"]
+                if module is None:
+                    module = importlib.import_module(self.__name__)
+                    self.__dict__.update(module.__dict__) # Later lookups no longer go through __getattr__
+                    self.__dict__["_module"] = module
+        return module
+
+    def __getattr__(self, attribute: str):
+        return getattr(self._load(), attribute)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = "imported" if self.__dict__["_module"] is not None else "not imported yet"
+        return f"<lazy module '{self.__name__}' ({state})>"
+
+
+def lazy_import(name: str) -> types.ModuleType:
+    """
+    Get a module that is imported on first use
+    :param name: The full name of the module, like chromadb or Core.MemGraph
+    :return: The module if it is imported already, a lazy stand-in otherwise
+    """
+    module = sys.modules.get(name)
+    return module if module is not None else LazyModule(name)
+
+
+def is_imported(name: str) -> bool:
+    """
+    :param name: The full name of the module
+    :return: True if the module was really imported, not just requested lazily
+    """
+    return name in sys.modules
@@ -0,0 +1,176 @@
+import glob
+import gzip
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+from typing import Iterator
+
+from Core.Priority import Priority
+
+MAX_BYTES = 10 * 1024 * 1024 # Size after which the log file is rotated
+MAX_AGE = 24 * 60 * 60 # Seconds after which the log file is rotated
+BACKUPS = 10 # Rotated files that are kept
+_ROTATED = "%Y%m%d-%H%M%S"
+
+
+class LogSink:
+    """
+    Appends every log as one JSON line to <directory>/<name>.jsonl, written by the background writer of the Logger.
+    The file is rotated once it grows past max_bytes or gets older than max_age, rotated files are named after the
+    time of the rotation, optionally gzipped and only the newest backups are kept.
+    """
+    def __init__(self, directory: str, name: str = "alpacca", max_bytes: int = MAX_BYTES, max_age: float = MAX_AGE,
+                 backups: int = BACKUPS, compress: bool = True):
+        self.directory = directory
+        self.name = name
+        self.location = os.path.join(directory, f"{name}.jsonl")
+        self._max_bytes = max_bytes
+        self._max_age = max_age
+        self._backups = backups
+        self._compress = compress
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._open()
+
+    def _open(self) -> None:
+        self._file = open(self.location, "ab")
+        self._size = self._file.tell()
+        self._opened_at = self._started_at() if self._size else time.time()
+        if self._size and not self._ends_with_newline(): # The app died while writing the last log
+            self._file.write(b"\n")
+            self._size += 1
+
+    def _started_at(self) -> float:
+        """
+        :return: When the existing log file was started, the time of its first log
+        """
+        try:
+            with open(self.location, "rb") as file:
+                return datetime.fromisoformat(json.loads(file.readline())["timestamp"]).timestamp()
+        except (ValueError, KeyError):
+            return os.path.getmtime(self.location)
+
+    def _ends_with_newline(self) -> bool:
+        with open(self.location, "rb") as file:
+            file.seek(-1, os.SEEK_END)
+            return file.read(1) == b"\n"
+
+    def write(self, log) -> None:
+        """
+        :param log: The log to append
+        """
+        line = (json.dumps(log.jsonable(), ensure_ascii=False) + "\n").encode() # Sized in bytes, not characters
+        with self._lock:
+            if self._size and (self._size + len(line) > self._max_bytes or time.time() - self._opened_at > self._max_age):
+                self._rotate()
+            self._file.write(line)
+            self._size += len(line)
+
+    def flush(self) -> None:
+        with self._lock:
+            self._file.flush()
+
+    def _rotate(self) -> None:
+        self._file.close()
+        rotated = os.path.join(self.directory, f"{self.name}-{datetime.now().strftime(_ROTATED)}.jsonl")
+        suffix = 1
+        while os.path.exists(rotated) or os.path.exists(rotated + ".gz"): # Several rotations within a second
+            rotated = os.path.join(self.directory, f"{self.name}-{datetime.now().strftime(_ROTATED)}-{suffix}.jsonl")
+            suffix += 1
+        os.replace(self.location, rotated)
+        self._open()
+        if self._compress:
+            threading.Thread(target=self._gzip, args=(rotated,), daemon=True, name="log-compress").start()
+        self._prune()
+
+    def _gzip(self, location: str) -> None:
+        with open(location, "rb") as source, gzip.open(location + ".gz.tmp", "wb") as target:
+            shutil.copyfileobj(source, target)
+        os.replace(location + ".gz.tmp", location + ".gz")
+        os.remove(location)
+
+    def _prune(self) -> None:
+        for location in rotated_logs(self.directory, self.name)[:-self._backups or None]:
+            try:
+                os.remove(location)
+            except FileNotFoundError: # Still being compressed
+                pass
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+def rotated_logs(directory: str, name: str = "alpacca") -> list[str]:
+    """
+    :return: The rotated log files, oldest first
+    """
+    locations = glob.glob(os.path.join(directory, f"{name}-*.jsonl")) + \
+                glob.glob(os.path.join(directory, f"{name}-*.jsonl.gz"))
+    return sorted(locations, key=lambda location: _rotation_key(location, name))
+
+
+def _rotation_key(location: str, name: str) -> tuple[str, int]:
+    parts = os.path.basename(location).split(".")[0][len(name) + 1:].split("-") # Date, time and the optional suffix
+    suffix = parts[2] if len(parts) > 2 else "0"
+    return "-".join(parts[:2]), int(suffix) if suffix.isdigit() else 0
+
+
+def _rotated_at(location: str, name: str) -> datetime | None:
+    try:
+        return datetime.strptime(_rotation_key(location, name)[0], _ROTATED)
+    except ValueError:
+        return None
+
+
+def query_logs(directory: str, name: str = "alpacca", sender: str = None, priority: Priority = None,
+               start: datetime = None, end: datetime = None) -> Iterator[dict]:
+    """
+    Stream the logs of a sink that match all given filters, oldest first. Files are read line by line and rotated
+    files that ended before start are skipped without opening them
+    :param directory: The directory of the sink
+    :param name: The name of the sink
+    :param sender: Only logs of this sender
+    :param priority: Only logs of at least this priority
+    :param start: Only logs at or after this time
+    :param end: Only logs before this time
+    :return: The matching logs as dictionaries
+    """
+    locations = rotated_logs(directory, name)
+    current = os.path.join(directory, f"{name}.jsonl")
+    if os.path.exists(current):
+        locations.append(current)
+    previous_end: datetime | None = None
+    for location in locations:
+        rotated_at = _rotated_at(location, name) if location != current else None
+        if start is not None and rotated_at is not None and rotated_at < start:
+            previous_end = rotated_at
+            continue
+        if end is not None and previous_end is not None and previous_end >= end:
+            return # Every later file only holds later logs
+        previous_end = rotated_at
+        try:
+            file = gzip.open(location, "rt", encoding="utf-8") if location.endswith(".gz") else \
+                open(location, encoding="utf-8")
+        except FileNotFoundError: # Compressed or pruned meanwhile
+            continue
+        with file:
+            for line in file:
+                if not line.endswith("\n"):
+                    continue # Still being written
+                try:
+                    record = json.loads(line)
+                except ValueError: # Torn by a crash and continued by the next run
+                    continue
+                if sender is not None and record["sender"] != sender:
+                    continue
+                if priority is not None and Priority[record["priority"]].value < priority.value:
+                    continue
+                if start is not None or end is not None:
+                    timestamp = datetime.fromisoformat(record["timestamp"])
+                    if (start is not None and timestamp < start) or (end is not None and timestamp >= end):
+                        continue
+                yield record
@@ -1,5 +1,10 @@
-import inspect
+import atexit
 import json
+import os
+import queue
+import sys
+import threading
+from collections import deque
 from datetime import datetime
 from typing import List
 
@@ -7,35 +12,70 @@ from Core.Priority import Priority
 import Core
 from Core import Colors
 
+MAX_LOGS = 10_000 # Logs kept in memory, the oldest are dropped first
+MAX_PENDING = 10_000 # Logs waiting for the writer, further logs are not printed until it caught up
+_format_lock = threading.Lock() # The writer thread and readers of the logs may format a message at the same time
+
+
+def _level_from_env() -> Priority:
+    name = os.environ.get("ALPACCA_LOG_LEVEL", "LOW").upper()
+    return Priority[name] if name in Priority.__members__ else Priority.LOW
+
+
 class Log:
-    message: str
     timestamp: datetime.now()
     priority: Priority = Priority.DEBUG
     sender: str = "NA"
 
-    def __init__(self, message: str, priority: Priority = Priority.DEBUG, sender: str = "NA"):
-        self.message = message
+    def __init__(self, message: str, priority: Priority = Priority.DEBUG, sender: str = "NA", args: tuple = ()):
+        self._message = message
+        self._args = args
         self.timestamp = datetime.now()
         self.priority = priority
         self.sender = sender
 
+    @property
+    def message(self) -> str:
+        """
+        The message, formatted with its arguments once on first access
+        """
+        if self._args:
+            with _format_lock:
+                if self._args: # Not formatted by another thread in the meantime
+                    try:
+                        message = self._message % self._args
+                    except (TypeError, ValueError):
+                        message = f"{self._message} {self._args}"
+                    self._message = message
+                    self._args = ()
+        return self._message
+
     def __str__(self):
         return f"{Colors.light_gray}[{self.timestamp.strftime('%H:%M:%S')}: {self.sender}]:{Colors.reset} {Core.Priority.get_color(self.priority)}{self.message}{Colors.reset}"
 
     def jsonable(self) -> dict:
         return {
             "message": self.message,
-            "timestamp": self.timestamp,
-            "priority": self.priority,
+            "timestamp": self.timestamp.isoformat(),
+            "priority": self.priority.name,
             "sender": self.sender
         }
 
 class Logger(object):
     """
-    A simple logging system with different priority levels and the ability to save logs to a file as well as beautiful colors
+    A simple logging system with different priority levels and the ability to save logs to a file as well as beautiful colors.
+    Logs below the level are dropped before anything is formatted, the rest is kept in a bounded buffer and printed
+    by a background thread, so logging never waits for the terminal. The same thread streams every log to the
+    added sinks, e.g. a rotating LogSink, so long-running deployments keep their logs without growing in memory.
     """
     initialized: bool = False
-    logs: List[Log] = []
+    level: Priority = _level_from_env()
+    logs: deque[Log] = deque(maxlen=MAX_LOGS)
+    _output: queue.Queue = queue.Queue(maxsize=MAX_PENDING)
+    dropped: int = 0 # Logs that were kept but never printed or written to the sinks, because the writer fell behind
+    _writer: threading.Thread | None = None
+    _writer_lock = threading.Lock()
+    sinks: list = []
 
     def __init__(self):
         if Logger.initialized:
@@ -45,44 +85,125 @@ class Logger(object):
         print("Logger initialized")
 
     @staticmethod
-    def log( message: str, priority: Priority = Priority.DEBUG):
+    def log(message: str, priority: Priority = Priority.DEBUG, *args):
         """
         Log a message
-        :param message: The message to log
+        :param message: The message to log, formatted with % and args only if the log is kept
         :param priority: The priority of the message
+        :param args: The arguments of the message, so nothing is formatted for a filtered log
         """
-        caller = inspect.stack()[1][3]
-        sender = caller if caller != "<module>" else "NA"
-        log = Log(message, priority, sender=sender)
+        if priority.value < Logger.level.value:
+            return
+        caller = sys._getframe(1).f_code.co_name
+        log = Log(message, priority, sender=caller if caller != "<module>" else "NA", args=args)
         Logger.logs.append(log)
-        print(log)
+        if Logger._writer is None:
+            Logger._start_writer()
+        try:
+            Logger._output.put_nowait(log)
+        except queue.Full: # Never block the caller on a slow terminal or sink
+            with Logger._writer_lock:
+                Logger.dropped += 1
+
+    @staticmethod
+    def is_enabled(priority: Priority) -> bool:
+        """
+        :param priority: The priority of a log
+        :return: True if logs of the priority are kept, to skip building expensive messages otherwise
+        """
+        return priority.value >= Logger.level.value
+
+    @staticmethod
+    def set_level(priority: Priority):
+        """
+        Set the lowest priority that is logged, the default can be set with the ALPACCA_LOG_LEVEL environment variable
+        :param priority: The lowest priority that is logged
+        """
+        Logger.level = priority
+
+    @staticmethod
+    def add_sink(sink):
+        """
+        Stream every following log to a sink
+        :param sink: An object with write(log) and flush(), e.g. a LogSink
+        """
+        Logger.sinks.append(sink)
+
+    @staticmethod
+    def remove_sink(sink):
+        """
+        Stop streaming logs to a sink, after every pending log has been written to it
+        :param sink: A sink that was added
+        """
+        Logger.flush()
+        Logger.sinks.remove(sink)
+
+    @staticmethod
+    def _start_writer():
+        with Logger._writer_lock:
+            if Logger._writer is None:
+                Logger._writer = threading.Thread(target=Logger._write, daemon=True, name="logger")
+                Logger._writer.start()
+                atexit.register(Logger.flush)
+
+    @staticmethod
+    def _write():
+        reported = 0
+        while True:
+            log = Logger._output.get()
+            try:
+                print(log)
+            except Exception: # A closed stdout must not stop the logging
+                pass
+            try:
+                for sink in Logger.sinks:
+                    sink.write(log)
+                if Logger._output.empty(): # Flush once per burst instead of once per log
+                    for sink in Logger.sinks:
+                        sink.flush()
+                    if Logger.dropped != reported:
+                        print(f"Dropped {Logger.dropped - reported} logs, the writer could not keep up", file=sys.stderr)
+                        reported = Logger.dropped
+            except Exception as e: # A full disk must not stop the logging either
+                print(f"Failed to write log to sink: {e}", file=sys.stderr)
+            finally:
+                Logger._output.task_done()
+
+    @staticmethod
+    def flush():
+        """
+        Wait until every log is printed and written to the sinks
+        """
+        if Logger._writer is not None:
+            Logger._output.join()
 
     @staticmethod
     def get_logs() -> List[Log]:
         """
-        :return: A list of all logs
+        :return: A list of the kept logs, the oldest are dropped after MAX_LOGS
         """
-        return Logger.logs
+        return list(Logger.logs)
 
     @staticmethod
     def clear_logs():
         """
         Clear all logs
         """
-        Logger.logs = []
+        Logger.logs.clear()
 
     @staticmethod
     def save_logs(file_path: str) -> bool:
         """
-        Save logs to a file
+        Save the kept logs to a file, one JSON object per line
         :param file_path: The path to save the logs to
         :return: True if the logs were saved successfully, False otherwise
         :rtype: bool
         :raises: Exception
         """
         try:
-            with open(file_path, "w") as file:
-                json.dump([log.jsonable() for log in Logger.logs], file)
+            with open(file_path, "w", encoding="utf-8") as file:
+                for log in Logger.get_logs():
+                    file.write(json.dumps(log.jsonable(), ensure_ascii=False) + "\n")
             Logger.log(f"Logs saved to {file_path}", Priority.NORMAL)
             return True
         except Exception as e:
@@ -93,4 +214,4 @@ class Logger(object):
 
 
 def get_logger() -> Logger:
-    return Logger()
\ No newline at end of file
+    return Logger()
@@ -1,42 +1,62 @@
 import textual_plot
 from textual.app import ComposeResult
+from textual.containers import Vertical
 from textual_plot import PlotWidget
 
+from Core.Telemetry import Telemetry, get_telemetry
 
-class Memgraph(PlotWidget):
-    memory: dict
-    swap: dict
+WINDOW = 300.0 # Seconds of telemetry that are shown
 
-    def __init__(self):
-        self.memory = {"x": [], "y": []}
-        self.swap = {"x": [], "y": []}
+
+class Memgraph(Vertical):
+    """
+    Plots the memory and swap usage and, below it, the CPU load and the token rate of the last WINDOW seconds.
+    The samples are taken by the telemetry in the background, a redraw only reads the shown window.
+    """
+    telemetry: Telemetry
+    window: float
+
+    def __init__(self, telemetry: Telemetry = None, window: float = WINDOW):
+        self.telemetry = telemetry if telemetry is not None else get_telemetry()
+        self.window = window
         super().__init__()
 
     def compose(self) -> ComposeResult:
-        yield PlotWidget(allow_pan_and_zoom=False)
+        yield PlotWidget(allow_pan_and_zoom=False, id="memory-plot")
+        yield PlotWidget(allow_pan_and_zoom=False, id="load-plot")
 
     def on_mount(self) -> None:
-        plot = self.query_one(PlotWidget)
-        plot.set_xlabel("")
-        plot.set_ylabel("GB")
-        plot.set_xticks([])
-        #self.set_yticks([])
-        plot.set_yticks([0, 2, 4, 6, 8, 10, 12, 14, 16])
-        self.set_ylimits(ymin=0.0, ymax=16.0)
+        memory = self.query_one("#memory-plot", PlotWidget)
+        memory.set_ylabel("GB")
+        load = self.query_one("#load-plot", PlotWidget)
+        load.set_ylabel("% | tok/s")
+        for plot in (memory, load):
+            plot.set_xlabel("")
+            plot.set_xticks([])
+            plot.set_xlimits(xmin=-self.window, xmax=0.0)
+            plot.show_legend()
 
     def allow_focus(self) -> bool:
         return False
 
-    def plot_data(self, data, line_style):
-        x = data["x"]
-        y = data["y"]
-        plot = self.query_one(PlotWidget)
-        plot.plot(x=x, y=y, line_style=line_style,hires_mode=textual_plot.HiResMode.BRAILLE)
-
-    def append_data_point(self, time, mem_y, swap_y):
-        self.memory["x"].append(time)
-        self.memory["y"].append(mem_y)
-        self.swap["x"].append(time)
-        self.swap["y"].append(swap_y)
-        #self.plot_data(self.memory, "bright_yellow")
-        #self.plot_data(self.swap, "bright_red")
\ No newline at end of file
+    def redraw(self) -> None:
+        """
+        Plot the latest window of the telemetry
+        """
+        memory = self.query_one("#memory-plot", PlotWidget)
+        memory.clear()
+        self._plot(memory, "memory", "bright_yellow", "RAM")
+        self._plot(memory, "swap", "bright_red", "Swap")
+        memory.set_ylimits(ymin=0.0, ymax=max(self.telemetry.memory_total, 1.0))
+
+        load = self.query_one("#load-plot", PlotWidget)
+        load.clear()
+        self._plot(load, "cpu", "bright_cyan", "CPU %")
+        peak = self._plot(load, "tokens", "bright_green", "Tokens/s")
+        load.set_ylimits(ymin=0.0, ymax=max(100.0, peak))
+
+    def _plot(self, plot: PlotWidget, name: str, line_style: str, label: str) -> float:
+        x, y = self.telemetry.window(name, self.window)
+        if x:
+            plot.plot(x=x, y=y, line_style=line_style, hires_mode=textual_plot.HiResMode.BRAILLE, label=label)
+        return max(y, default=0.0)
@@ -0,0 +1,251 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from math import ceil
+from typing import Iterator, AsyncIterator, Callable
+
+from ollama import GenerateResponse
+
+from Core.Logger import Logger
+from Core.Priority import Priority
+from Core.Telemetry import get_telemetry
+
+HISTOGRAM_SAMPLES = 1024 # Number of recent generations the percentiles are computed over
+QUANTILES = (0.5, 0.95, 0.99)
+NANOSECONDS = 1e9
+
+
+class GenerationMetrics:
+    """
+    Timings and token counts of one generation, from the client side (time to first token, total) and from the
+    final response of the server (load, prefill and decode)
+    """
+    model: str
+    host: str | None
+    started_at: float # Unix timestamp the request was sent at
+    first_token: float | None # Seconds until the first token arrived
+    total: float # Seconds until the response was complete
+    load_duration: float # Seconds the server spent loading the model
+    prompt_eval_count: int
+    prompt_eval_duration: float
+    eval_count: int
+    eval_duration: float
+
+    def __init__(self, model: str, host: str | None, started_at: float, first_token: float | None, total: float,
+                 load_duration: float = 0.0, prompt_eval_count: int = 0, prompt_eval_duration: float = 0.0,
+                 eval_count: int = 0, eval_duration: float = 0.0):
+        self.model = model
+        self.host = host
+        self.started_at = started_at
+        self.first_token = first_token
+        self.total = total
+        self.load_duration = load_duration
+        self.prompt_eval_count = prompt_eval_count
+        self.prompt_eval_duration = prompt_eval_duration
+        self.eval_count = eval_count
+        self.eval_duration = eval_duration
+
+    def prefill_speed(self) -> float | None:
+        """
+        :return: Prompt tokens evaluated per second or None if unknown
+        """
+        return self.prompt_eval_count / self.prompt_eval_duration if self.prompt_eval_duration else None
+
+    def decode_speed(self) -> float | None:
+        """
+        :return: Tokens generated per second or None if unknown
+        """
+        return self.eval_count / self.eval_duration if self.eval_duration else None
+
+    def __str__(self):
+        first_token = f"{self.first_token:.2f}s" if self.first_token is not None else "-"
+        prefill = f"{self.prefill_speed():.1f}" if self.prefill_speed() is not None else "-"
+        decode = f"{self.decode_speed():.1f}" if self.decode_speed() is not None else "-"
+        return (f"first token after: {first_token}, load: {self.load_duration:.2f}s, "
+                f"prefill: {self.prompt_eval_count} tokens at {prefill} tokens/s, "
+                f"decode: {self.eval_count} tokens at {decode} tokens/s, total: {self.total:.2f}s")
+
+    def dict(self) -> dict:
+        return {
+            "model": self.model,
+            "host": self.host,
+            "started_at": self.started_at,
+            "first_token": self.first_token,
+            "total": self.total,
+            "load_duration": self.load_duration,
+            "prompt_eval_count": self.prompt_eval_count,
+            "prompt_eval_duration": self.prompt_eval_duration,
+            "eval_count": self.eval_count,
+            "eval_duration": self.eval_duration
+        }
+
+def generation_metrics_from_dict(d: dict) -> GenerationMetrics:
+    return GenerationMetrics(**d)
+
+
+def nearest_rank(ordered: list[float], q: float) -> float:
+    """
+    :param ordered: The samples in ascending order, at least one
+    :param q: The quantile between 0 and 1
+    :return: The smallest sample that at least the fraction q of the samples is less than or equal to
+    """
+    return ordered[max(ceil(q * len(ordered)) - 1, 0)]
+
+
+class RollingHistogram:
+    """
+    Keeps the most recent samples of a value to report its percentiles
+    """
+    _samples: deque[float]
+    count: int # Number of samples ever added
+
+    def __init__(self, size: int = HISTOGRAM_SAMPLES):
+        self._samples = deque(maxlen=size)
+        self.count = 0
+
+    def add(self, value: float) -> None:
+        self._samples.append(value)
+        self.count += 1
+
+    def quantiles(self) -> dict[float, float]:
+        """
+        :return: The value at each of the QUANTILES over the recent samples, nearest rank
+        """
+        ordered = sorted(self._samples)
+        if not ordered:
+            return {}
+        return {q: nearest_rank(ordered, q) for q in QUANTILES}
+
+
+# Exported metric name to the value it takes from a generation
+EXPORTED: dict[str, Callable[[GenerationMetrics], float | None]] = {
+    "first_token_seconds": lambda m: m.first_token,
+    "total_seconds": lambda m: m.total,
+    "load_seconds": lambda m: m.load_duration,
+    "prompt_tokens": lambda m: m.prompt_eval_count,
+    "completion_tokens": lambda m: m.eval_count,
+    "prefill_tokens_per_second": GenerationMetrics.prefill_speed,
+    "decode_tokens_per_second": GenerationMetrics.decode_speed,
+}
+
+
+class MetricsRegistry:
+    """
+    Rolling histograms of every exported metric per model and host
+    """
+    _histograms: dict[tuple[str, str], dict[str, RollingHistogram]]
+
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def record(self, metrics: GenerationMetrics) -> None:
+        key = (metrics.model, metrics.host or "local")
+        with self._lock:
+            histograms = self._histograms.setdefault(key, {name: RollingHistogram() for name in EXPORTED})
+            for name, value in EXPORTED.items():
+                value = value(metrics)
+                if value is not None:
+                    histograms[name].add(value)
+
+    def snapshot(self) -> list[dict]:
+        """
+        :return: The percentiles of every metric per model and host
+        """
+        with self._lock:
+            return [{
+                "model": model,
+                "host": host,
+                "metrics": {name: {"count": h.count, **{f"p{int(q * 100)}": v for q, v in h.quantiles().items()}}
+                            for name, h in histograms.items()}
+            } for (model, host), histograms in self._histograms.items()]
+
+    def prometheus(self) -> str:
+        """
+        :return: The percentiles in the Prometheus text format, one summary per metric
+        """
+        lines = []
+        with self._lock:
+            for name in EXPORTED:
+                lines.append(f"# TYPE alpacca_{name} summary")
+                for (model, host), histograms in self._histograms.items():
+                    labels = f'model="{model}",host="{host}"'
+                    for q, value in histograms[name].quantiles().items():
+                        lines.append(f'alpacca_{name}{{{labels},quantile="{q}"}} {value}')
+                    lines.append(f"alpacca_{name}_count{{{labels}}} {histograms[name].count}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, location: str) -> None:
+        """
+        Write the snapshot as <location>.json and <location>.prom
+        :param location: The path of the snapshot files without an extension
+        """
+        os.makedirs(os.path.dirname(location) or ".", exist_ok=True)
+        with open(f"{location}.json", "w") as file:
+            json.dump({"exported_at": time.time(), "series": self.snapshot()}, file, indent=4)
+        with open(f"{location}.prom", "w") as file:
+            file.write(self.prometheus())
+        Logger.log(f"Metrics exported to {location}", Priority.LOW)
+
+
+class MetricsTracker:
+    """
+    Measures one streamed generation while passing its parts through
+    """
+    host: str | None # May be set once known, a host pool only decides on it when the stream starts
+    metrics: GenerationMetrics | None
+
+    def __init__(self, model: str, host: str | None, on_done: Callable[[GenerationMetrics], None] = None):
+        self._model = model
+        self.host = host
+        self._on_done = on_done
+        self._started_at = time.time()
+        self._started = time.monotonic()
+        self._first_token: float | None = None
+        self._streamed = 0 # Parts with a response, one token each
+        self.metrics = None
+
+    def observe(self, part: GenerateResponse) -> None:
+        if self._first_token is None and part.response:
+            self._first_token = time.monotonic() - self._started
+        if not part.done:
+            if part.response:
+                self._streamed += 1
+                get_telemetry().add_tokens()
+            return
+        if not self._streamed: # Not streamed, all tokens arrive at once
+            get_telemetry().add_tokens(part.eval_count or 0)
+        self.metrics = GenerationMetrics(
+            self._model, self.host, self._started_at, self._first_token, time.monotonic() - self._started,
+            load_duration=(part.load_duration or 0) / NANOSECONDS,
+            prompt_eval_count=part.prompt_eval_count or 0,
+            prompt_eval_duration=(part.prompt_eval_duration or 0) / NANOSECONDS,
+            eval_count=part.eval_count or 0,
+            eval_duration=(part.eval_duration or 0) / NANOSECONDS)
+        get_metrics().record(self.metrics)
+        if self._on_done is not None:
+            self._on_done(self.metrics)
+
+    def track(self, iterator: Iterator[GenerateResponse]) -> Iterator[GenerateResponse]:
+        for part in iterator:
+            self.observe(part)
+            yield part
+
+    async def track_async(self, iterator: AsyncIterator[GenerateResponse]) -> AsyncIterator[GenerateResponse]:
+        async for part in iterator:
+            self.observe(part)
+            yield part
+
+
+_metrics: MetricsRegistry | None = None
+
+def get_metrics() -> MetricsRegistry:
+    """
+    :return: The metrics registry shared by all sessions
+    """
+    global _metrics
+    if _metrics is None:
+        _metrics = MetricsRegistry()
+    return _metrics
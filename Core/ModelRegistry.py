@@ -0,0 +1,137 @@
+import threading
+import time
+from typing import Any
+
+from Core.ClientPool import ClientPool
+from Core.Logger import Logger
+from Core.Priority import Priority
+
+DEFAULT_TTL = 60.0 # Seconds a listing is served without refreshing it
+
+
+class _Listing:
+    value: Any
+    fetched_at: float
+    refreshing: bool
+
+    def __init__(self, value: Any):
+        self.value = value
+        self.fetched_at = time.monotonic()
+        self.refreshing = False
+
+
+class ModelRegistry:
+    """
+    Caches the models of every host (/api/tags) and their metadata (/api/show) with a TTL.
+    Stale entries are served while a background refresh fetches the new ones, so only the very first lookup of a
+    host waits for the server.
+    """
+    _ttl: float
+    _models: dict[str | None, _Listing]
+    _details: dict[tuple[str | None, str], _Listing]
+
+    def __init__(self, ttl: float = DEFAULT_TTL):
+        self._ttl = ttl
+        self._models = {}
+        self._details = {}
+        self._lock = threading.Lock()
+        self._fetch_locks: dict[Any, threading.Lock] = {}
+
+    def _fetch_lock(self, key: Any) -> threading.Lock:
+        with self._lock:
+            return self._fetch_locks.setdefault(key, threading.Lock())
+
+    def _get(self, cache: dict, key: Any, fetch) -> Any:
+        """
+        Get a cached value, fetching it if missing and refreshing it in the background if stale
+        :param cache: The cache the value is stored in
+        :param key: The key of the value
+        :param fetch: Fetches the value from the server
+        :return: The cached or fetched value
+        """
+        listing = cache.get(key)
+        if listing is None:
+            with self._fetch_lock(key): # Concurrent first lookups share one request
+                listing = cache.get(key)
+                if listing is None:
+                    listing = _Listing(fetch())
+                    cache[key] = listing
+            return listing.value
+
+        with self._lock:
+            stale = time.monotonic() - listing.fetched_at > self._ttl and not listing.refreshing
+            if stale:
+                listing.refreshing = True
+        if stale:
+            threading.Thread(target=self._refresh, args=(cache, key, fetch, listing), daemon=True).start()
+        return listing.value
+
+    @staticmethod
+    def _refresh(cache: dict, key: Any, fetch, listing: _Listing) -> None:
+        try:
+            cache[key] = _Listing(fetch())
+        except Exception as e:
+            Logger.log(f"Refreshing {key} failed, keeping the stale entry: {e}", Priority.HIGH)
+            listing.refreshing = False
+
+    def list_models(self, host: str = None) -> list[str]:
+        """
+        Get the models of a host
+        :param host: The host or None for the local server
+        :return: The names of the models available on the host
+        """
+        def fetch() -> list[str]:
+            Logger.log(f"Listing models of: {host or 'local'}", Priority.LOW)
+            return [m["model"] for m in ClientPool.get_client(host).list().models]
+        return self._get(self._models, host, fetch)
+
+    def has_model(self, model: str, host: str = None) -> bool:
+        """
+        :param model: The name of the model, without a tag the latest tag is assumed
+        :param host: The host or None for the local server
+        :return: True if the host has the model
+        """
+        models = self.list_models(host)
+        return model in models or f"{model}:latest" in models
+
+    def show(self, model: str, host: str = None) -> dict:
+        """
+        Get the metadata of a model
+        :param model: The name of the model
+        :param host: The host or None for the local server
+        :return: The metadata with the context length and embedding length of the model if known
+        """
+        def fetch() -> dict:
+            Logger.log(f"Fetching details of {model} from: {host or 'local'}", Priority.LOW)
+            response = ClientPool.get_client(host).show(model)
+            info = response.modelinfo or {}
+            details = {"family": response.details.family if response.details else None}
+            for key, value in info.items():
+                if key.endswith(".context_length"):
+                    details["context_length"] = value
+                elif key.endswith(".embedding_length"):
+                    details["embedding_length"] = value
+            return details
+        return self._get(self._details, (host, model), fetch)
+
+    def invalidate(self, host: str = None) -> None:
+        """
+        Drop the cached models and metadata of a host, needed after pulling or deleting a model
+        :param host: The host or None for the local server
+        """
+        with self._lock:
+            self._models.pop(host, None)
+            for key in [key for key in self._details if key[0] == host]:
+                del self._details[key]
+
+
+_registry: ModelRegistry | None = None
+
+def get_model_registry() -> ModelRegistry:
+    """
+    :return: The model registry shared by all sessions
+    """
+    global _registry
+    if _registry is None:
+        _registry = ModelRegistry()
+    return _registry
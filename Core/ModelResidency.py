@@ -0,0 +1,211 @@
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable
+
+from Core.ClientPool import ClientPool
+from Core.Logger import Logger
+from Core.Priority import Priority
+from Core.Scheduler import get_scheduler, JobPriority
+
+DEFAULT_MAX_LOADED = int(os.environ.get("OLLAMA_MAX_LOADED_MODELS", 1)) # Should match the servers setting
+RESIDENT_FOR = 5.0 # Seconds a listing of the loaded models (/api/ps) is trusted
+PRELOAD_COOLDOWN = 30.0 # Seconds a model is not preloaded again on the same host
+IN_USE_FOR = 60.0 # Seconds a model counts as in use after its last generation or preload
+
+
+def _same_model(a: str, b: str) -> bool:
+    return a == b or f"{a}:latest" == b or a == f"{b}:latest"
+
+
+class ModelResidency:
+    """
+    Knows which models are loaded on every host and preloads the model of a session before its first prompt.
+    A preload is an empty generate queued as a background job, so it never delays a prompt. A preload is skipped if
+    it would evict a model another session used recently from a host that has no room left, which keeps several tabs
+    sharing a small GPU from evicting each other's models on every tab switch.
+    """
+    _keep_alive: dict[str, str | float] # Keep alive per model, the server's OLLAMA_KEEP_ALIVE applies if missing
+    _max_loaded: dict[str | None, int]
+    _resident: dict[str | None, tuple[float, list[str]]] # Loaded models per host and when they were listed
+    _last_used: dict[tuple[str | None, str], float]
+    _preloaded_at: dict[tuple[str | None, str], float]
+    _pending: dict[tuple[str | None, str], Future]
+
+    def __init__(self, default_max_loaded: int = DEFAULT_MAX_LOADED):
+        assert default_max_loaded > 0, "At least one model has to fit on a host"
+        self._default_max_loaded = default_max_loaded
+        self._keep_alive = {}
+        self._max_loaded = {}
+        self._resident = {}
+        self._last_used = {}
+        self._preloaded_at = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def set_keep_alive(self, model: str, keep_alive: str | float | None) -> None:
+        """
+        Set how long the server keeps a model loaded after its last request
+        :param model: The name of the model
+        :param keep_alive: A duration like "10m", seconds, a negative value to keep it forever or None for the default
+        """
+        with self._lock:
+            if keep_alive is None:
+                self._keep_alive.pop(model, None)
+            else:
+                self._keep_alive[model] = keep_alive
+
+    def get_keep_alive(self, model: str) -> str | float | None:
+        """
+        :param model: The name of the model
+        :return: The keep alive to send with every request of the model or None to leave it to the server
+        """
+        return self._keep_alive.get(model)
+
+    def set_max_loaded(self, host: str | None, count: int) -> None:
+        """
+        Set how many models fit on a host at the same time
+        :param host: The host or None for the local server
+        :param count: The number of models
+        """
+        assert count > 0, "At least one model has to fit on a host"
+        self._max_loaded[host] = count
+
+    def get_max_loaded(self, host: str | None) -> int:
+        return self._max_loaded.get(host, self._default_max_loaded)
+
+    def resident(self, host: str = None, refresh: bool = False) -> list[str]:
+        """
+        Get the models loaded on a host, the listing is cached for a few seconds
+        :param host: The host or None for the local server
+        :param refresh: Ask the server even if the cached listing is recent
+        :return: The names of the loaded models
+        """
+        cached = self._resident.get(host)
+        if cached is not None and not refresh and time.monotonic() - cached[0] < RESIDENT_FOR:
+            return list(cached[1])
+        models = [m.model for m in ClientPool.get_client(host).ps().models]
+        self._resident[host] = (time.monotonic(), models)
+        return list(models)
+
+    def is_resident(self, model: str, host: str = None) -> bool:
+        return any(_same_model(model, loaded) for loaded in self.resident(host))
+
+    def touch(self, model: str, host: str = None) -> None:
+        """
+        Note that a model is being used, called for every generation
+        :param model: The name of the model
+        :param host: The host or None for the local server
+        """
+        with self._lock:
+            self._last_used[(host, model)] = time.monotonic()
+            cached = self._resident.get(host)
+            if cached is not None and not any(_same_model(model, loaded) for loaded in cached[1]):
+                cached[1].append(model) # The server loads the model for the generation
+
+    def in_use(self, model: str, host: str = None) -> bool:
+        """
+        :return: True if the model was used or preloaded on the host recently
+        """
+        with self._lock:
+            used = [t for (h, m), t in self._last_used.items() if h == host and _same_model(model, m)]
+        last_used = max(used, default=None)
+        return last_used is not None and time.monotonic() - last_used < IN_USE_FOR
+
+    def should_preload(self, model: str, host: str = None) -> bool:
+        """
+        Decide if preloading a model is worth it, asks the server for the loaded models
+        :param model: The name of the model
+        :param host: The host or None for the local server
+        :return: False if the model is loaded or loading it would evict a model that is in use
+        """
+        resident = self.resident(host)
+        if any(_same_model(model, loaded) for loaded in resident):
+            return False
+        if len(resident) < self.get_max_loaded(host):
+            return True
+        busy = [loaded for loaded in resident if self.in_use(loaded, host)]
+        if len(busy) >= self.get_max_loaded(host):
+            Logger.log(f"Not preloading {model} on {host or 'local'}, it would evict {busy} which are in use",
+                       Priority.LOW)
+            return False
+        return True
+
+    def preload(self, model: str, host: str = None, session: str = "preload",
+                select: Callable[[], str | None] = None) -> Future | None:
+        """
+        Queue loading a model on a host without blocking, calling it repeatedly is cheap
+        :param model: The name of the model
+        :param host: The host or None for the local server
+        :param session: The session the preload is queued for
+        :param select: Picks the host inside the background job instead, for sessions whose host lookup may probe
+        several hosts. The job is still queued and throttled on host, the cooldown applies to the selected host
+        :return: The future of the queued preload, its result is True if the model was loaded, or None if skipped
+        """
+        key = (host, model)
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is not None and not pending.done():
+                return pending
+            if select is None:
+                if not self._start_cooldown(key):
+                    return None
+            future = get_scheduler().submit(session, host, lambda: self._load(model, host, select), JobPriority.BACKGROUND)
+            self._pending[key] = future
+        return future
+
+    def _start_cooldown(self, key: tuple[str | None, str]) -> bool:
+        """
+        Must be called with the lock held
+        :param key: The host and the model
+        :return: False if the model was preloaded on the host recently, otherwise the cooldown starts now
+        """
+        if key in self._preloaded_at and time.monotonic() - self._preloaded_at[key] < PRELOAD_COOLDOWN:
+            return False
+        self._preloaded_at[key] = time.monotonic()
+        return True
+
+    def _load(self, model: str, host: str | None, select: Callable[[], str | None] = None) -> bool:
+        try:
+            if select is not None:
+                host = select()
+                with self._lock:
+                    if not self._start_cooldown((host, model)):
+                        return False
+            if not self.should_preload(model, host):
+                return False
+            started = time.monotonic()
+            ClientPool.get_client(host).generate(model=model, prompt="", keep_alive=self.get_keep_alive(model))
+        except Exception as e:
+            Logger.log(f"Preloading {model} on {host or 'local'} failed: {e}", Priority.HIGH)
+            return False
+        self.touch(model, host)
+        Logger.log(f"Preloaded {model} on {host or 'local'} in {time.monotonic() - started:.2f}s", Priority.LOW)
+        return True
+
+    def unload(self, model: str, host: str = None) -> None:
+        """
+        Ask a host to free the memory of a model right away
+        :param model: The name of the model
+        :param host: The host or None for the local server
+        """
+        ClientPool.get_client(host).generate(model=model, prompt="", keep_alive=0)
+        with self._lock:
+            self._last_used.pop((host, model), None)
+            self._preloaded_at.pop((host, model), None)
+            cached = self._resident.get(host)
+            if cached is not None:
+                cached[1][:] = [loaded for loaded in cached[1] if not _same_model(model, loaded)]
+
+
+_residency: ModelResidency | None = None
+
+def get_residency() -> ModelResidency:
+    """
+    :return: The model residency manager shared by all sessions
+    """
+    global _residency
+    if _residency is None:
+        _residency = ModelResidency()
+    return _residency
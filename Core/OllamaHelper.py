@@ -1,31 +1,18 @@
 from math import floor
 from random import random
 
-import ollama
-import requests
-from ollama import Client
-
-from Core.Logger import Logger
-from Core.Priority import Priority
+from Core.HealthMonitor import get_health_monitor
+from Core.ModelRegistry import get_model_registry
 
 
 def check_ollama_server(host: str = None) -> bool:
     """
-    Check if the ollama server is running on the given host or the default host if None is specified
+    Check if the ollama server is running on the given host or the default host if None is specified.
+    Uses the cached state of the health monitor, the host is only probed if its state is unknown or outdated
     :param host: The host to check
     :return: True if the server is running, False otherwise
     """
-    try:
-        if host is not None:
-            response = requests.get(f"http://{host}", timeout=5)
-            Logger.log(f"Response: {response}", Priority.NORMAL)
-            Logger.log(f"Response: {response.text}", Priority.NORMAL)
-        else:
-            response = requests.get("0.0.0.0:11434", timeout=5)
-    except Exception as e:
-        Logger.log(f"Exception: {e}", Priority.NORMAL)
-        return False
-    return response.text.strip().upper() == "OLLAMA IS RUNNING"
+    return get_health_monitor().is_up(host)
 
 def get_model_names_from_remote(host: str) -> list[str]:
     """
@@ -34,7 +21,7 @@ def get_model_names_from_remote(host: str) -> list[str]:
     :return: The models names that are available on the remote host
     """
     if not check_ollama_server(host): raise ValueError("The ollama server is not running on the host")
-    return [m["model"] for m in Client(host=host).list().models]
+    return get_model_registry().list_models(host)
 
 def get_all_models(host:str = None) -> list[str]:
     """
@@ -42,7 +29,7 @@ def get_all_models(host:str = None) -> list[str]:
     :param host: The host to get the models from or None to get only the local models
     :return: The models names that are available on the combination of the local and remote hosts
     """
-    local: list[str] = [m["model"] for m in ollama.list().models]
+    local: list[str] = get_model_registry().list_models()
     if host is None: return local
     remote: list[str] = get_model_names_from_remote(host)
     return local + remote
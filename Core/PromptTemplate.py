@@ -0,0 +1,46 @@
+import re
+from typing import Iterable
+
+RAG = "%RAG%"
+PREVIOUS_EXCHANGE = "%RPreviousExchange%"
+USER_PROMPT = "%UserPrompt%"
+PLACEHOLDERS = (RAG, PREVIOUS_EXCHANGE, USER_PROMPT)
+
+_PLACEHOLDER_PATTERN = re.compile("(" + "|".join(re.escape(p) for p in PLACEHOLDERS) + ")")
+
+
+class PromptTemplate:
+    """
+    A system prompt compiled once into a list of literal and placeholder segments.
+    Rendering joins the segments with the values in a single pass instead of scanning and replacing the whole prompt
+    for every placeholder.
+    """
+    _segments: list[tuple[bool, str]] # (is placeholder, literal text or placeholder name)
+    _placeholders: set[str]
+
+    def __init__(self, text: str):
+        self._segments = []
+        for i, part in enumerate(_PLACEHOLDER_PATTERN.split(text)):
+            if part: # Odd parts are the captured placeholders
+                self._segments.append((i % 2 == 1, part))
+        self._placeholders = {text for is_placeholder, text in self._segments if is_placeholder}
+
+    def __contains__(self, placeholder: str) -> bool:
+        return placeholder in self._placeholders
+
+    def render(self, values: dict[str, str | Iterable[str]]) -> str:
+        """
+        Render the template
+        :param values: The value for each placeholder, either a string or the parts of a string.
+        Placeholders without a value are kept as they are
+        :return: The rendered prompt
+        """
+        parts: list[str] = []
+        for is_placeholder, text in self._segments:
+            if not is_placeholder or text not in values:
+                parts.append(text)
+            elif isinstance(values[text], str):
+                parts.append(values[text])
+            else:
+                parts.extend(values[text])
+        return "".join(parts)
@@ -0,0 +1,177 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Iterator, List, AsyncIterator
+
+from ollama import GenerateResponse
+
+from Core.Logger import Logger
+from Core.Priority import Priority
+
+
+def is_deterministic(options: dict) -> bool:
+    """
+    Check if a generation with these options always gives the same output
+    :param options: The options of the generation
+    :return: True if the temperature is 0 or a fixed seed is set
+    """
+    return options.get("temperature") == 0 or "seed" in options
+
+def cache_key(model: str, options: dict, prompt: str, context: List[int] | None = None) -> str:
+    """
+    :param model: The model that generates
+    :param options: The options of the generation
+    :param prompt: The final prompt that is sent
+    :param context: The token context the prompt is sent with
+    :return: The key of the generation in the cache
+    """
+    data = json.dumps([model, sorted(options.items()), prompt, context or []], separators=(",", ":"))
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    An on-disk cache of deterministic generations, one JSON file per response.
+    The least recently used responses are evicted once the cache exceeds its size or entry limit.
+    """
+    _directory: str
+    _max_bytes: int
+    _max_entries: int
+    _entries: OrderedDict[str, int] # Key to file size, least recently used first
+    _size: int
+
+    def __init__(self, directory: str, max_bytes: int = 64_000_000, max_entries: int = 10_000):
+        self._directory = directory
+        self._max_bytes = max_bytes
+        self._max_entries = max_entries
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+        files = []
+        for name in os.listdir(directory):
+            if name.endswith(".json"):
+                stat = os.stat(self._path(name[:-5]))
+                files.append((stat.st_mtime, name[:-5], stat.st_size))
+        for _, key, size in sorted(files):
+            self._entries[key] = size
+            self._size += size
+        Logger.log(f"Response cache at {directory} holds {len(self._entries)} responses", Priority.LOW)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self._directory, f"{key}.json")
+
+    def get_directory(self) -> str:
+        return self._directory
+
+    def get(self, key: str) -> dict | None:
+        """
+        Look up a response and mark it as recently used
+        :param key: The key of the generation
+        :return: The cached response or None
+        """
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+        try:
+            with open(self._path(key)) as file:
+                entry = json.load(file)
+            os.utime(self._path(key))
+            return entry
+        except (OSError, ValueError) as e:
+            Logger.log(f"Dropping unreadable cached response {key}: {e}", Priority.HIGH)
+            self._remove(key)
+            return None
+
+    def put(self, key: str, model: str, chunks: List[str], context: List[int] | None) -> None:
+        """
+        Store a response and evict the least recently used ones if the cache is full
+        :param key: The key of the generation
+        :param model: The model that generated the response
+        :param chunks: The streamed parts of the response
+        :param context: The token context returned with the response
+        """
+        data = json.dumps({"model": model, "chunks": chunks, "context": context})
+        with open(self._path(key), "w") as file:
+            file.write(data)
+        with self._lock:
+            self._size += len(data) - self._entries.pop(key, 0)
+            self._entries[key] = len(data)
+            evicted = []
+            while self._entries and (self._size > self._max_bytes or len(self._entries) > self._max_entries):
+                old, size = self._entries.popitem(last=False)
+                self._size -= size
+                evicted.append(old)
+        for old in evicted:
+            self._delete_file(old)
+
+    def _remove(self, key: str) -> None:
+        with self._lock:
+            self._size -= self._entries.pop(key, 0)
+        self._delete_file(key)
+
+    def _delete_file(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def clear(self) -> None:
+        """
+        Remove all cached responses
+        """
+        with self._lock:
+            keys = list(self._entries)
+            self._entries.clear()
+            self._size = 0
+        for key in keys:
+            self._delete_file(key)
+
+    @staticmethod
+    def replay(entry: dict) -> Iterator[GenerateResponse]:
+        """
+        Replay a cached response as a token stream like the one the client returns
+        :param entry: The cached response
+        :return: The parts of the response
+        """
+        for chunk in entry["chunks"]:
+            yield GenerateResponse(model=entry["model"], response=chunk, done=False)
+        yield GenerateResponse(model=entry["model"], response="", done=True, done_reason="stop",
+                               context=entry["context"], eval_count=len(entry["chunks"]))
+
+    def record(self, key: str, iterator: Iterator[GenerateResponse]) -> Iterator[GenerateResponse]:
+        """
+        Pass through a streamed response and store it once it is complete
+        :param key: The key of the generation
+        :param iterator: The streamed response from the client
+        :return: The same parts as the iterator
+        """
+        chunks: List[str] = []
+        for part in iterator:
+            if part.response:
+                chunks.append(part.response)
+            if part.done:
+                self.put(key, part.model, chunks, part.context)
+            yield part
+
+    async def record_async(self, key: str, iterator: AsyncIterator[GenerateResponse]) -> AsyncIterator[GenerateResponse]:
+        """
+        Pass through an async streamed response and store it once it is complete
+        :param key: The key of the generation
+        :param iterator: The streamed response from the async client
+        :return: The same parts as the iterator
+        """
+        chunks: List[str] = []
+        async for part in iterator:
+            if part.response:
+                chunks.append(part.response)
+            if part.done:
+                self.put(key, part.model, chunks, part.context)
+            yield part
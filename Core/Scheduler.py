@@ -0,0 +1,194 @@
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import Future
+from enum import Enum
+from typing import Callable, Any
+
+from Core.Logger import Logger
+from Core.Priority import Priority
+
+DEFAULT_PARALLEL = int(os.environ.get("OLLAMA_NUM_PARALLEL", 1)) # Should match the servers OLLAMA_NUM_PARALLEL
+WAIT_SAMPLES = 256 # Number of wait times kept per host for the statistics
+
+
+class JobPriority(Enum):
+    """
+    Priority classes of generation jobs, lower values are started first
+    """
+    INTERACTIVE = 0 # A user is waiting for the response
+    BACKGROUND = 1  # Summaries, preloading and other work nobody is watching
+
+    def __str__(self):
+        return self.name
+
+
+class _Job:
+    session: str
+    host: str | None
+    function: Callable[[], Any]
+    priority: JobPriority
+    future: Future
+    submitted_at: float
+
+    def __init__(self, session: str, host: str | None, function: Callable[[], Any], priority: JobPriority):
+        self.session = session
+        self.host = host
+        self.function = function
+        self.priority = priority
+        self.future = Future()
+        self.submitted_at = time.monotonic()
+
+
+class GenerationScheduler:
+    """
+    Queues generation jobs of all sessions and runs them with a concurrency limit per host.
+    Interactive jobs are started before background jobs and sessions of the same priority take turns.
+    """
+    _default_limit: int
+    _limits: dict[str | None, int]
+    _running: dict[str | None, int]
+    _queues: dict[str | None, dict[JobPriority, OrderedDict[str, deque[_Job]]]]
+    _waits: dict[str | None, deque[float]]
+
+    def __init__(self, default_limit: int = DEFAULT_PARALLEL):
+        assert default_limit > 0, "At least one job per host has to be allowed"
+        self._default_limit = default_limit
+        self._limits = {}
+        self._running = defaultdict(int)
+        self._queues = defaultdict(lambda: {p: OrderedDict() for p in JobPriority})
+        self._waits = defaultdict(lambda: deque(maxlen=WAIT_SAMPLES))
+        self._lock = threading.Lock()
+
+    def set_limit(self, host: str | None, limit: int) -> None:
+        """
+        Set how many jobs may run on a host at the same time
+        :param host: The host or None for the local server
+        :param limit: The number of parallel jobs
+        """
+        assert limit > 0, "At least one job per host has to be allowed"
+        with self._lock:
+            self._limits[host] = limit
+            self._dispatch()
+
+    def get_limit(self, host: str | None) -> int:
+        """
+        :param host: The host or None for the local server
+        :return: How many jobs may run on the host at the same time
+        """
+        return self._limits.get(host, self._default_limit)
+
+    def submit(self, session: str, host: str | None, function: Callable[[], Any],
+               priority: JobPriority = JobPriority.INTERACTIVE) -> Future:
+        """
+        Queue a job, it is run in its own thread as soon as the host has a free slot
+        :param session: The session the job belongs to, sessions take turns
+        :param host: The host the job generates on or None for the local server
+        :param function: The job, typically consuming a streamed generation
+        :param priority: The priority class of the job
+        :return: A future of the job's result
+        """
+        job = _Job(session, host, function, priority)
+        with self._lock:
+            sessions = self._queues[host][priority]
+            if session not in sessions:
+                sessions[session] = deque()
+            sessions[session].append(job)
+            self._dispatch()
+        return job.future
+
+    def _next_job(self, host: str | None) -> _Job | None:
+        for priority in JobPriority:
+            sessions = self._queues[host][priority]
+            while sessions:
+                session, jobs = sessions.popitem(last=False)
+                job = jobs.popleft()
+                if jobs: # Put the session at the back so the other sessions go first
+                    sessions[session] = jobs
+                if not job.future.cancelled():
+                    return job
+        return None
+
+    def _dispatch(self) -> None:
+        """
+        Start queued jobs on every host with a free slot, the lock has to be held
+        """
+        for host in list(self._queues):
+            while self._running[host] < self.get_limit(host):
+                job = self._next_job(host)
+                if job is None:
+                    break
+                self._running[host] += 1
+                self._waits[host].append(time.monotonic() - job.submitted_at)
+                threading.Thread(target=self._run, args=(job,), daemon=True,
+                                 name=f"generation-{job.session}").start()
+
+    def _run(self, job: _Job) -> None:
+        try:
+            if job.future.set_running_or_notify_cancel():
+                try:
+                    job.future.set_result(job.function())
+                except BaseException as e:
+                    Logger.log(f"Job of {job.session} on {job.host or 'local'} failed: {e}", Priority.HIGH)
+                    job.future.set_exception(e)
+        finally:
+            with self._lock:
+                self._running[job.host] -= 1
+                self._dispatch()
+
+    def queue_depth(self, session: str = None) -> int:
+        """
+        Get the number of waiting jobs on all hosts
+        :param session: Only count jobs of this session
+        :return: The number of jobs that have not been started yet
+        """
+        with self._lock:
+            return sum(len(jobs) for queues in self._queues.values() for sessions in queues.values()
+                       for s, jobs in sessions.items() if session is None or s == session)
+
+    def queued(self, host: str | None) -> int:
+        """
+        :param host: The host or None for the local server
+        :return: The number of jobs waiting for the host
+        """
+        with self._lock:
+            if host not in self._queues:
+                return 0
+            return sum(len(jobs) for sessions in self._queues[host].values() for jobs in sessions.values())
+
+    def running(self, host: str | None) -> int:
+        """
+        :param host: The host or None for the local server
+        :return: The number of jobs currently running on the host
+        """
+        return self._running.get(host, 0)
+
+    def stats(self) -> dict[str, dict]:
+        """
+        :return: Running jobs, queue depth and wait times in seconds of the recent jobs per host
+        """
+        with self._lock:
+            result = {}
+            for host in list(self._queues):
+                waits = sorted(self._waits[host])
+                result[host or "local"] = {
+                    "limit": self.get_limit(host),
+                    "running": self._running[host],
+                    "queued": {str(p): sum(len(jobs) for jobs in self._queues[host][p].values()) for p in JobPriority},
+                    "wait_avg": sum(waits) / len(waits) if waits else 0.0,
+                    "wait_max": waits[-1] if waits else 0.0
+                }
+            return result
+
+
+_scheduler: GenerationScheduler | None = None
+
+def get_scheduler() -> GenerationScheduler:
+    """
+    :return: The scheduler shared by all sessions
+    """
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = GenerationScheduler()
+    return _scheduler
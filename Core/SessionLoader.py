@@ -0,0 +1,87 @@
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from enum import Enum
+
+from Core.Alpacca import Alpacca, read_alpacca_settings, alpacca_from_settings
+from Core.Logger import Logger
+from Core.Priority import Priority
+
+MAX_LOADERS = 8 # Sessions that connect and load their history at the same time
+
+
+class SessionState(Enum):
+    CONNECTING = 0 # The host is checked and the history is loaded
+    READY = 1
+    FAILED = 2
+
+    def __str__(self):
+        return self.name.lower()
+
+
+class PendingSession:
+    """
+    A saved session whose tab can be shown right away while its Alpacca is created in the background
+    """
+    location: str # The settings file of the session
+    identifier: str
+    model: str
+    state: SessionState
+    error: str | None # Why the session failed to load
+    future: Future
+
+    def __init__(self, location: str, settings: dict):
+        self.location = location
+        self.identifier = settings.get("identifier") or os.path.splitext(os.path.basename(location))[0]
+        self.model = settings["model"]
+        self.state = SessionState.CONNECTING
+        self.error = None
+        self.future = Future()
+
+    def label(self) -> str:
+        """
+        :return: The tab label, with the state while the session is not ready
+        """
+        return self.identifier if self.state == SessionState.READY else f"{self.identifier} ({self.state})"
+
+    def alpacca(self) -> Alpacca | None:
+        """
+        :return: The Alpacca of the session or None while it is connecting or if it failed
+        """
+        return self.future.result() if self.state == SessionState.READY else None
+
+
+class SessionLoader:
+    """
+    Creates the Alpaccas of saved sessions concurrently, so neither the number of sessions nor a slow host delays
+    the first frame of the console. Only the small settings file is read up front.
+    """
+    def __init__(self, max_workers: int = MAX_LOADERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="session-loader")
+
+    def load(self, location: str) -> PendingSession:
+        """
+        Read the settings of a session and start creating its Alpacca in the background
+        :param location: The location of the settings file
+        :return: The pending session, its future is done once the session is ready or failed
+        :raises ValueError: If the settings file can not be read
+        """
+        settings = read_alpacca_settings(location)
+        session = PendingSession(location, settings)
+        self._executor.submit(self._create, session, settings)
+        return session
+
+    @staticmethod
+    def _create(session: PendingSession, settings: dict) -> None:
+        try:
+            alpacca = alpacca_from_settings(settings)
+            session.state = SessionState.READY
+            session.future.set_result(alpacca)
+            Logger.log(f"Session {session.identifier} loaded", Priority.LOW)
+        except Exception as e:
+            session.error = str(e)
+            session.state = SessionState.FAILED
+            session.future.set_exception(e)
+            Logger.log(f"Session {session.identifier} failed to load: {e}", Priority.HIGH)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
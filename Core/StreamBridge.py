@@ -0,0 +1,119 @@
+import threading
+import time
+from typing import Callable
+
+from Core.Logger import Logger
+from Core.Priority import Priority
+
+FRAME_RATE = 30.0 # Deliveries per second at most
+MAX_PENDING = 64 * 1024 # Characters that may wait for delivery before the producer is blocked
+
+
+class StreamBridge:
+    """
+    Carries a streamed response from a generation thread to the UI.
+    The producer only appends to a buffer, a flusher thread hands everything that arrived since the last frame to
+    the UI in one delivery, at most frame_rate times per second. The UI work per second stays the same however
+    fast the model is. If the UI falls behind by more than max_pending characters, the producer waits.
+    """
+    parts: int # Streamed parts, usually one token each
+    words: int
+    characters: int
+    frames: int # Deliveries made
+
+    def __init__(self, deliver: Callable[[str], None], schedule: Callable[..., object] = None,
+                 frame_rate: float = FRAME_RATE, max_pending: int = MAX_PENDING):
+        """
+        :param deliver: Receives the text that arrived since the last delivery
+        :param schedule: Runs deliver on the UI thread and waits for it, like App.call_from_thread, directly if None
+        :param frame_rate: Deliveries per second at most
+        :param max_pending: Characters that may wait for delivery before put blocks
+        """
+        assert frame_rate > 0, "The frame rate has to be positive"
+        self._deliver = deliver
+        self._schedule = schedule
+        self._interval = 1 / frame_rate
+        self._max_pending = max_pending
+        self._pending: list[str] = []
+        self._pending_characters = 0
+        self._closed = False
+        self._failed = False
+        self._in_word = False
+        self._condition = threading.Condition()
+        self.parts = 0
+        self.words = 0
+        self.characters = 0
+        self.frames = 0
+        self._thread = threading.Thread(target=self._run, name="stream-bridge", daemon=True)
+        self._thread.start()
+
+    def put(self, text: str) -> None:
+        """
+        Queue a streamed part for the next delivery, blocks while the UI is too far behind
+        :param text: The streamed part
+        """
+        with self._condition:
+            while self._pending_characters >= self._max_pending and not self._closed:
+                self._condition.wait()
+            if self._closed:
+                return
+            self._pending.append(text)
+            self._pending_characters += len(text)
+            self._count(text)
+            self._condition.notify_all()
+
+    def _count(self, text: str) -> None:
+        # Counted per part, so the counters cost nothing extra as the response grows
+        self.parts += 1
+        self.characters += len(text)
+        for character in text:
+            space = character.isspace()
+            if not space and not self._in_word:
+                self.words += 1
+            self._in_word = not space
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if not self._pending and self._closed:
+                    return
+            time.sleep(self._interval) # Parts that arrive meanwhile are delivered in the same frame
+            with self._condition:
+                text = "".join(self._pending)
+                self._pending.clear()
+                self._pending_characters = 0
+                self._condition.notify_all()
+            if not self._failed:
+                self._flush(text)
+
+    def _flush(self, text: str) -> None:
+        try:
+            if self._schedule is not None:
+                self._schedule(self._deliver, text)
+            else:
+                self._deliver(text)
+            self.frames += 1
+        except Exception as e: # The UI is gone, the rest of the stream is dropped
+            Logger.log(f"Stream delivery failed: {e}", Priority.HIGH)
+            self._failed = True
+
+    def close(self) -> None:
+        """
+        Deliver what is still pending and stop the flusher
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if threading.current_thread() is not self._thread:
+            self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __str__(self):
+        return f"{self.parts} parts, {self.words} words in {self.frames} frames"
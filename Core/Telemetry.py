@@ -0,0 +1,106 @@
+import threading
+import time
+
+from Core.LazyImport import lazy_import
+from Core.Logger import Logger
+from Core.Priority import Priority
+from Core.TimeSeries import TimeSeries
+
+psutil = lazy_import("psutil")
+
+SAMPLE_INTERVAL = 1.0 # Seconds between two samples
+GIGABYTE = 1_000_000_000
+# The recorded series: used memory and swap in GB, CPU load in percent and generated tokens per second
+SERIES = ("memory", "swap", "cpu", "tokens")
+
+
+class Telemetry:
+    """
+    Samples the system and the token rate in a background thread into bounded time series, so the console only
+    has to read the window it shows
+    """
+    series: dict[str, TimeSeries]
+    memory_total: float # Installed memory in GB, the upper limit of the memory plot
+
+    def __init__(self):
+        self.series = {name: TimeSeries() for name in SERIES}
+        self.memory_total = 0.0
+        self._tokens = 0
+        self._tokens_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler: threading.Thread | None = None
+
+    def add_tokens(self, count: int = 1) -> None:
+        """
+        Count generated tokens for the token rate
+        :param count: The number of tokens that were generated
+        """
+        with self._lock:
+            self._tokens += count
+
+    def _token_rate(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            rate = self._tokens / max(now - self._tokens_at, 1e-9)
+            self._tokens, self._tokens_at = 0, now
+        return rate
+
+    def sample(self, now: float = None) -> None:
+        """
+        Take one sample of every series
+        :param now: The time of the sample, the current time if None
+        """
+        now = time.time() if now is None else now
+        memory = psutil.virtual_memory()
+        self.memory_total = memory.total / GIGABYTE
+        self.series["memory"].add(now, memory.used / GIGABYTE)
+        self.series["swap"].add(now, psutil.swap_memory().used / GIGABYTE)
+        self.series["cpu"].add(now, psutil.cpu_percent(interval=None)) # Load since the previous sample
+        self.series["tokens"].add(now, self._token_rate())
+
+    def start(self, interval: float = SAMPLE_INTERVAL) -> None:
+        """
+        Keep sampling in a background thread
+        :param interval: Seconds between two samples
+        """
+        if self._sampler is not None and self._sampler.is_alive():
+            return
+        self._stop.clear()
+        self._sampler = threading.Thread(target=self._run, args=(interval,), daemon=True, name="telemetry")
+        self._sampler.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self, interval: float) -> None:
+        while True:
+            try:
+                self.sample()
+            except Exception as e:
+                Logger.log(f"Telemetry sample failed: {e}", Priority.HIGH)
+            if self._stop.wait(interval):
+                return
+
+    def window(self, name: str, seconds: float, now: float = None) -> tuple[list[float], list[float]]:
+        """
+        :param name: The name of the series
+        :param seconds: The length of the window that ends now
+        :param now: The end of the window, the current time if None
+        :return: The times relative to now and the values of the window
+        """
+        now = time.time() if now is None else now
+        times, values = self.series[name].window(seconds, now)
+        return [t - now for t in times], values
+
+
+_telemetry: Telemetry | None = None
+
+def get_telemetry() -> Telemetry:
+    """
+    :return: The telemetry shared by the whole app
+    """
+    global _telemetry
+    if _telemetry is None:
+        _telemetry = Telemetry()
+    return _telemetry
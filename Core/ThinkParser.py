@@ -0,0 +1,143 @@
+from typing import Callable, List
+
+THINK_OPEN = "<think>"
+THINK_CLOSE = "</think>"
+OPENED_BY_TEMPLATE_WITHIN = 4096 # Characters of answer after which a lone closing tag is part of the answer
+
+
+def _partial_tag(text: str, tag: str) -> int:
+    """
+    :param text: The text that may end in the beginning of a tag
+    :param tag: The tag to look for
+    :return: The length of the longest suffix of the text that is a prefix of the tag
+    """
+    for length in range(min(len(tag) - 1, len(text)), 0, -1):
+        if text.endswith(tag[:length]):
+            return length
+    return 0
+
+
+class ThinkParser:
+    """
+    A streaming state machine that routes the tokens of a response into reasoning (<think>...</think>) and answer
+    as they arrive. Tags split across chunks are held back until they can be decided.
+    Models whose template opens the think block in the prompt only stream the closing tag. If it arrives near the
+    start of the response, the answer so far is moved to the thoughts and listeners get a MOVED piece with that text.
+    """
+    THOUGHT: bool = True
+    ANSWER: bool = False
+    MOVED: None = None # The text at the end of the answer so far that turned out to be reasoning
+
+    thoughts: str
+    answer: str
+    thinking: bool # If the tokens currently arriving are reasoning
+    _pending: str # The beginning of a possible tag
+    _seen_tag: bool
+    _listeners: List[Callable[[bool | None, str], None]]
+
+    def __init__(self):
+        self.thoughts = ""
+        self.answer = ""
+        self.thinking = False
+        self._pending = ""
+        self._seen_tag = False
+        self._listeners = []
+
+    def subscribe(self, listener: Callable[[bool | None, str], None]) -> None:
+        """
+        Get every routed piece of the response as soon as it is decided
+        :param listener: Called with ThinkParser.THOUGHT or ThinkParser.ANSWER and the text, or with
+        ThinkParser.MOVED and the answer so far, which has to be moved to the thoughts
+        """
+        self._listeners.append(listener)
+
+    def feed(self, chunk: str) -> List[tuple[bool | None, str]]:
+        """
+        Route the next chunk of the response
+        :param chunk: The next streamed chunk
+        :return: The routed pieces as (ThinkParser.THOUGHT, ThinkParser.ANSWER or ThinkParser.MOVED, text)
+        """
+        pieces: List[tuple[bool | None, str]] = []
+        text = self._pending + chunk
+        self._pending = ""
+        while text:
+            if self.thinking:
+                index = text.find(THINK_CLOSE)
+                if index != -1:
+                    self._emit(pieces, self.THOUGHT, text[:index])
+                    self.thinking = False
+                    text = text[index + len(THINK_CLOSE):]
+                    continue
+                held = _partial_tag(text, THINK_CLOSE)
+                self._emit(pieces, self.THOUGHT, text[:len(text) - held])
+                self._pending = text[len(text) - held:]
+                break
+
+            if self._may_close():
+                index = text.find(THINK_CLOSE)
+                if index != -1 and (text.find(THINK_OPEN) == -1 or index < text.find(THINK_OPEN)) \
+                        and len(self.answer) + index <= OPENED_BY_TEMPLATE_WITHIN:
+                    # The think block was opened by the prompt template
+                    self._seen_tag = True
+                    if self.answer:
+                        pieces.append((self.MOVED, self.answer))
+                        self.thoughts, self.answer = self.answer, ""
+                    self._emit(pieces, self.THOUGHT, text[:index])
+                    text = text[index + len(THINK_CLOSE):]
+                    continue
+            index = text.find(THINK_OPEN)
+            if index != -1:
+                self._emit(pieces, self.ANSWER, text[:index])
+                self._seen_tag = True
+                self.thinking = True
+                text = text[index + len(THINK_OPEN):]
+                continue
+            held = max(_partial_tag(text, THINK_OPEN), _partial_tag(text, THINK_CLOSE) if self._may_close() else 0)
+            self._emit(pieces, self.ANSWER, text[:len(text) - held])
+            self._pending = text[len(text) - held:]
+            break
+
+        for listener in self._listeners:
+            for kind, piece in pieces:
+                listener(kind, piece)
+        return pieces
+
+    def _may_close(self) -> bool:
+        """
+        :return: True if a closing tag may still end a think block that was opened by the prompt template
+        """
+        return not self._seen_tag and len(self.answer) <= OPENED_BY_TEMPLATE_WITHIN
+
+    def _emit(self, pieces: List[tuple[bool | None, str]], kind: bool, text: str) -> None:
+        if not text:
+            return
+        if kind == self.THOUGHT:
+            self.thoughts += text
+        else:
+            self.answer += text
+        pieces.append((kind, text))
+
+    def close(self) -> List[tuple[bool | None, str]]:
+        """
+        Flush a held back partial tag once the response is complete
+        :return: The routed pieces
+        """
+        pieces: List[tuple[bool | None, str]] = []
+        self._emit(pieces, self.thinking, self._pending)
+        self._pending = ""
+        for listener in self._listeners:
+            for kind, piece in pieces:
+                listener(kind, piece)
+        return pieces
+
+    def get_thoughts(self) -> str:
+        """
+        :return: The reasoning of the response without the tags
+        """
+        return self.thoughts.strip()
+
+    def get_answer(self) -> str:
+        """
+        :return: The answer of the response without the reasoning
+        """
+        return self.answer.strip()
@@ -0,0 +1,106 @@
+import threading
+from array import array
+from typing import List
+
+# Seconds per point and points kept of every tier: an hour of seconds, a day of minutes and a week of 10 minutes
+TIERS = ((1.0, 3600), (60.0, 1440), (600.0, 1008))
+
+
+class _Ring:
+    """
+    A fixed number of (time, value) points in preallocated arrays, the oldest point is overwritten when full
+    """
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.times = array("d", bytes(8 * capacity))
+        self.values = array("d", bytes(8 * capacity))
+        self.count = 0
+        self.next = 0 # Where the next point is written
+
+    def add(self, timestamp: float, value: float) -> None:
+        self.times[self.next] = timestamp
+        self.values[self.next] = value
+        self.next = (self.next + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def since(self, start: float) -> tuple[List[float], List[float]]:
+        """
+        :param start: The time of the oldest point to return
+        :return: The times and values of the points from start on, oldest first
+        """
+        oldest = (self.next - self.count) % self.capacity
+        # Binary search for the first point at or after start, the ring is sorted from the oldest point on
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.times[(oldest + middle) % self.capacity] < start:
+                low = middle + 1
+            else:
+                high = middle
+        indices = [(oldest + i) % self.capacity for i in range(low, self.count)]
+        return [self.times[i] for i in indices], [self.values[i] for i in indices]
+
+
+class _Tier:
+    def __init__(self, resolution: float, capacity: int):
+        self.resolution = resolution
+        self.ring = _Ring(capacity)
+        self.bucket: float | None = None # Start of the bucket that is being averaged
+        self.total = 0.0
+        self.samples = 0
+
+    def add(self, timestamp: float, value: float) -> None:
+        bucket = timestamp - timestamp % self.resolution
+        if self.bucket is not None and bucket != self.bucket and self.samples:
+            self.ring.add(self.bucket, self.total / self.samples)
+            self.total, self.samples = 0.0, 0
+        self.bucket = bucket
+        self.total += value
+        self.samples += 1
+
+    def span(self) -> float:
+        return self.resolution * self.ring.capacity
+
+
+class TimeSeries:
+    """
+    A time series with a fixed memory footprint however long it is recorded.
+    Every sample goes into each tier, coarser tiers store the average of their interval, so recent data is kept
+    at full resolution and older data at a lower one.
+    """
+    def __init__(self, tiers: tuple[tuple[float, int], ...] = TIERS):
+        assert tiers, "At least one tier is needed"
+        self._tiers = [_Tier(resolution, capacity) for resolution, capacity in tiers]
+        self._lock = threading.Lock()
+        self._last: tuple[float, float] | None = None
+
+    def add(self, timestamp: float, value: float) -> None:
+        """
+        :param timestamp: The time of the sample in seconds, samples have to be added in order
+        :param value: The sampled value
+        """
+        with self._lock:
+            for tier in self._tiers:
+                tier.add(timestamp, value)
+            self._last = (timestamp, value)
+
+    def last(self) -> tuple[float, float] | None:
+        """
+        :return: The time and value of the latest sample or None
+        """
+        return self._last
+
+    def window(self, seconds: float, now: float) -> tuple[List[float], List[float]]:
+        """
+        Get the points of a window from the finest tier that covers it
+        :param seconds: The length of the window
+        :param now: The end of the window
+        :return: The times and values of the window, oldest first
+        """
+        with self._lock:
+            tier = next((t for t in self._tiers if t.span() >= seconds), self._tiers[-1])
+            times, values = tier.ring.since(now - seconds)
+            if tier.samples and tier.bucket is not None and tier.bucket >= now - seconds:
+                times.append(tier.bucket) # The interval that is still being averaged
+                values.append(tier.total / tier.samples)
+            return times, values
@@ -0,0 +1,123 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from textual.app import App, ComposeResult
+from textual.containers import VerticalScroll
+from textual.widgets import Log, Markdown
+
+from Core.Alpacca import ChatExchange
+from Core.ChatPages import ChatPages
+from Core.Logger import Logger
+from Tests.MockOllama import MockOllama
+from TextualConsole import AiChat, AIResponse, MessageView, TextualConsole, UserMessage, chat_message_from_exchange
+
+
+class ChatApp(App):
+    CSS_PATH = "../Core/layout.tcss"
+
+    def __init__(self, chat: AiChat):
+        self.chat = chat
+        super().__init__()
+
+    def compose(self) -> ComposeResult:
+        with VerticalScroll(id="vertical-scroll-content"):
+            yield self.chat
+        yield self.chat.log
+
+
+def history(count: int) -> list[ChatExchange]:
+    return [ChatExchange(f"Question {i}", "", f"Answer {i}") for i in range(count)]
+
+
+class SimpleTests(unittest.TestCase):
+    def test_stream(self):
+        async def run():
+            chat = AiChat(Log(), identifier="test")
+            exchanges = history(5)
+            chat.pages = ChatPages(lambda start, stop: exchanges[start:stop], chat_message_from_exchange)
+            chat.first_loaded, lines = chat.pages.window(len(exchanges))
+            chat.lines.extend(lines)
+            app = ChatApp(chat)
+            async with app.run_test() as pilot:
+                finished = list(chat.query(MessageView))
+                self.assertEqual(len(finished), 5)
+                chat.post_message(UserMessage("Hello"))
+                await pilot.pause()
+                for part in ["<think>", "Let me", " think", "</think>", "Hi", " there", "!"]:
+                    chat.post_message(AIResponse(part, "TEST"))
+                await pilot.pause(0.2)
+                views = list(chat.query(MessageView))
+                self.assertEqual(views[:5], finished) # Finished exchanges are not rendered again
+                self.assertTrue(views[-1].live)
+                answer = views[-1].query_one(".message-answer", Markdown)
+                self.assertEqual(answer.source, "Alpacca: Hi there!")
+                thoughts = views[-1].query_one(".message-thoughts", Markdown)
+                self.assertIn("Thought... (12 characters)", thoughts.source)
+                chat.post_message(UserMessage("Again"))
+                await pilot.pause()
+                views = list(chat.query(MessageView))
+                self.assertEqual(len(views), 7)
+                self.assertFalse(views[5].live) # The finished exchange is frozen into a static
+                self.assertFalse(views[5].query(Markdown))
+                self.assertTrue(views[6].live)
+
+        asyncio.run(run())
+
+    def test_older_pages(self):
+        async def run():
+            chat = AiChat(Log(), identifier="test")
+            exchanges = history(120)
+            chat.pages = ChatPages(lambda start, stop: exchanges[start:stop], chat_message_from_exchange)
+            chat.first_loaded, lines = chat.pages.window(len(exchanges))
+            chat.lines.extend(lines)
+            app = ChatApp(chat)
+            async with app.run_test(size=(80, 24)) as pilot:
+                self.assertEqual(chat.first_loaded, 50)
+                self.assertEqual(len(chat.query(MessageView)), 70)
+                scroll = app.query_one(VerticalScroll)
+                scroll.scroll_end(animate=False)
+                await pilot.pause(0.1)
+                scroll.scroll_home(animate=False)
+                for _ in range(20): # The view is moved back once the loaded page is laid out
+                    await pilot.pause(0.1)
+                    if scroll.scroll_y > 0:
+                        break
+                self.assertEqual(chat.first_loaded, 0)
+                self.assertEqual(len(chat.query(MessageView)), 120)
+                self.assertGreater(scroll.scroll_y, 0) # Still showing the exchanges that were shown before
+                chat.post_message(UserMessage("Hello"))
+                await pilot.pause()
+                chat.post_message(UserMessage("Again")) # Closes the first exchange and trims the loaded pages
+                await pilot.pause()
+                self.assertEqual(chat.first_loaded, 50)
+                self.assertEqual(len(chat.query(MessageView)), 72)
+
+        asyncio.run(run())
+
+    def test_console_state(self):
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as directory, MockOllama() as server, \
+                mock.patch.dict(os.environ, {"OLLAMA_HOST": server.host}):
+            for folder in ("Chats", "Settings", "Metrics", "Logs"):
+                os.makedirs(os.path.join(directory, "Resources", folder))
+            os.chdir(directory) # The console reads its resources relative to the working directory
+            try:
+                first, second = TextualConsole(), TextualConsole()
+            finally:
+                os.chdir(cwd)
+            for console in (first, second):
+                Logger.remove_sink(console.log_sink)
+                console.log_sink.close()
+        first.running_sessions.add(first.session_identifier(0))
+        first.preloaded_sessions.add(first.session_identifier(0))
+        self.assertEqual(second.running_sessions, set()) # Every console tracks its own sessions
+        self.assertEqual(second.preloaded_sessions, set())
+        self.assertIsNot(first.loading, second.loading)
+        self.assertEqual(len(second.chats), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+import httpx
+
+from Core.Alpacca import Alpacca, HISTORY_TAIL, separate_thoughts
+from Core.ClientPool import ClientPool
+from Core.Embedding import Embedding
+from Core.HealthMonitor import get_health_monitor
+from Core.HistoryStore import HistoryStore
+from Core.HostPool import NoHostAvailable
+from Tests.MockOllama import MockOllama
+
+CHAT_MODEL = "mock-chat:latest"
+EMBED_MODEL = "mock-embed:latest"
+
+
+class MockServerTests(unittest.TestCase):
+    mock: MockOllama
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.mock = MockOllama(response_tokens=8, embedding_dimension=16).start()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.mock.stop()
+
+    def test_generate_iterable(self):
+        alpacca = Alpacca(CHAT_MODEL, host=self.mock.host)
+        parts = list(alpacca.generate_iterable("Hello there"))
+        self.assertEqual(len(parts), 9)
+        self.assertTrue(parts[-1].done)
+        self.assertEqual("".join(p.response for p in parts), "".join(self.mock.tokens("Hello there")))
+        self.assertEqual(alpacca.get_last_metrics().eval_count, 8)
+
+    def test_generate(self):
+        alpacca = Alpacca(CHAT_MODEL, host=self.mock.host)
+        self.assertEqual(alpacca.generate("Hi").response, "".join(self.mock.tokens("Hi")))
+
+    def test_history(self):
+        with tempfile.TemporaryDirectory() as directory:
+            location = os.path.join(directory, "chat.json")
+            alpacca = Alpacca(CHAT_MODEL, host=self.mock.host, history_location=location)
+            alpacca.generate("Hi")
+            alpacca.save_partial("Still there?", "<think>Hmm</think>Yes")
+            alpacca.save_history()
+            alpacca = Alpacca(CHAT_MODEL, host=self.mock.host, history_location=location)
+            self.assertEqual([h.user for h in alpacca.get_history()], ["Hi", "Still there?"])
+            self.assertEqual(alpacca.get_history()[1].thoughts, "Hmm")
+            self.assertEqual(alpacca.get_history()[1].answer, "Yes")
+
+    def test_generate_async(self):
+        async def run(alpacca: Alpacca, prompt: str):
+            parts = [part async for part in alpacca.generate_async(prompt)]
+            answer = separate_thoughts("".join(p.response for p in parts))
+            await alpacca.add_history_async(prompt, answer["think"], answer["response"], alpacca.get_last_metrics())
+            await alpacca.save_history_async()
+            client = ClientPool.get_async_client(self.mock.host)
+            await ClientPool.close_async_clients()
+            return parts, client
+
+        with tempfile.TemporaryDirectory() as directory:
+            location = os.path.join(directory, "chat.json")
+            alpacca = Alpacca(CHAT_MODEL, host=self.mock.host, history_location=location)
+            parts, first_client = asyncio.run(run(alpacca, "Hello there"))
+            self.assertEqual(len(parts), 9)
+            self.assertEqual("".join(p.response for p in parts), "".join(self.mock.tokens("Hello there")))
+            self.assertEqual(alpacca.get_last_metrics().eval_count, 8)
+            _, second_client = asyncio.run(run(alpacca, "Again")) # A new loop gets a new client
+            self.assertIsNot(first_client, second_client)
+            alpacca = Alpacca(CHAT_MODEL, host=self.mock.host, history_location=location)
+            self.assertEqual([h.user for h in alpacca.get_history()], ["Hello there", "Again"])
+
+    def test_health_reports(self):
+        with MockOllama(response_tokens=8, drop_after=3) as mock:
+            alpacca = Alpacca(CHAT_MODEL, host=mock.host)
+            alpacca.generate("Hi") # Not streamed, so nothing is dropped
+            self.assertTrue(get_health_monitor().states()[mock.host]["up"])
+            with self.assertRaises(httpx.TransportError): # The connection drops mid-stream
+                list(alpacca.generate_iterable("Hello there"))
+            self.assertFalse(get_health_monitor().states()[mock.host]["up"])
+            self.assertEqual(get_health_monitor().states()[mock.host]["failures"], 1)
+
+    def test_schedule(self):
+        alpacca = Alpacca(CHAT_MODEL, hosts=[self.mock.host], identifier="pool")
+        self.assertEqual(alpacca.schedule(lambda: alpacca._take_preferred_host()).result(timeout=5), self.mock.host)
+        get_health_monitor().report_failure(self.mock.host) # No host of the pool is healthy
+        try:
+            future = alpacca.schedule(lambda: "generated")
+            self.assertRaises(NoHostAvailable, future.result, timeout=5)
+        finally:
+            get_health_monitor().report_success(self.mock.host)
+
+    def test_history_tail(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = HistoryStore(os.path.join(directory, "chat.jsonl"))
+            for i in range(HISTORY_TAIL + 10):
+                store.append({"user": f"Question {i}", "thoughts": "", "answer": f"Answer {i}"})
+            store.close()
+            alpacca = Alpacca(CHAT_MODEL, host=self.mock.host, history_location=os.path.join(directory, "chat.json"))
+            self.assertEqual(len(alpacca._history), HISTORY_TAIL) # Only the tail is read when opened
+            self.assertEqual(alpacca.get_history_length(), HISTORY_TAIL + 10)
+            self.assertEqual([h.user for h in alpacca.get_history_page(8, 12)], [f"Question {i}" for i in range(8, 12)])
+            self.assertEqual(len(alpacca._history), HISTORY_TAIL) # Older pages are not kept
+            self.assertEqual(alpacca.get_history()[0].user, "Question 0")
+            self.assertEqual(len(alpacca._history), HISTORY_TAIL + 10)
+
+    def test_embedding(self):
+        embedding = Embedding(EMBED_MODEL, embedding_length=10, remote=self.mock.host, collection_name="mock-tests")
+        self.assertEqual(embedding.get_dimension(), 16)
+        embedding._embed_long(" ".join(f"word{i}" for i in range(35)), "test", token_count=10)
+        self.assertEqual(len(embedding), 7) # Every "wordN" is estimated as two tokens
+        result = embedding.query_document_by_embedding(embedding.embed("word0 word1"))
+        self.assertTrue(result.startswith("word"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,177 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import tempfile
+import time
+import uuid
+from typing import Callable, Iterator
+
+from Core.Alpacca import Alpacca, ChatExchange
+from Core.ClientPool import ClientPool
+from Core.Embedding import Embedding
+from Core.Logger import Logger
+from Core.Metrics import nearest_rank
+from Core.PromptTemplate import RAG, PREVIOUS_EXCHANGE, USER_PROMPT
+from Tests.MockOllama import MockOllama
+
+CHAT_MODEL = "mock-chat:latest"
+EMBED_MODEL = "mock-embed:latest"
+SYSTEM_PROMPT = f"You are a helpful assistant.\nContext: {RAG}\nPrevious messages:\n{PREVIOUS_EXCHANGE}\nUser: {USER_PROMPT}\n"
+HISTORY_SIZES = (10, 100, 1000)
+CORPUS_SIZES = (1_000, 10_000, 50_000) # Words of the embedded text
+WORDS = "the quick brown fox jumps over a lazy dog while ollama streams tokens to the terminal".split()
+
+
+def summarize(samples: list[float]) -> dict:
+    """
+    :param samples: The measured seconds
+    :return: The count, mean and percentiles of the samples in milliseconds
+    """
+    ordered = sorted(samples)
+    return {"count": len(ordered), "mean_ms": statistics.fmean(ordered) * 1000,
+            "p50_ms": nearest_rank(ordered, 0.5) * 1000, "p95_ms": nearest_rank(ordered, 0.95) * 1000,
+            "max_ms": ordered[-1] * 1000}
+
+
+@contextlib.contextmanager
+def silenced() -> Iterator[None]:
+    """
+    Discard what is printed inside the block, including the logs the background writer of the logger prints later
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+        Logger.flush() # Still inside the redirect, otherwise the pending logs are printed while the next timing runs
+
+
+def measure(fn: Callable[[], object], repeat: int) -> list[float]:
+    """
+    Time a function, the logger is silenced so printing does not distort the results
+    :param fn: The function to time
+    :param repeat: How often to call it
+    :return: The seconds of every call
+    """
+    samples = []
+    with silenced():
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - started)
+    return samples
+
+
+def corpus(words: int) -> str:
+    return " ".join(WORDS[i % len(WORDS)] + str(i % 97) for i in range(words))
+
+
+def bench_generate(mock: MockOllama, repeat: int) -> dict:
+    """
+    Compare streaming through Alpacca.generate_iterable with streaming through the raw client
+    """
+    with silenced():
+        alpacca = Alpacca(CHAT_MODEL, host=mock.host)
+    client = ClientPool.get_client(mock.host)
+
+    def raw():
+        for _ in client.generate(model=CHAT_MODEL, prompt="Hello there", stream=True):
+            pass
+
+    def wrapped():
+        for _ in alpacca.generate_iterable("Hello there"):
+            pass
+
+    raw_samples, wrapped_samples = measure(raw, repeat), measure(wrapped, repeat)
+    raw_summary, wrapped_summary = summarize(raw_samples), summarize(wrapped_samples)
+    return {"response_tokens": mock.response_tokens, "raw_client": raw_summary, "generate_iterable": wrapped_summary,
+            "overhead_ms": wrapped_summary["p50_ms"] - raw_summary["p50_ms"]}
+
+
+def bench_prompt(mock: MockOllama, system_location: str, repeat: int) -> dict:
+    """
+    Time the prompt assembly of the first and of a following turn at several history lengths
+    """
+    results = {}
+    for size in HISTORY_SIZES:
+        history = [ChatExchange(f"Question {i} {corpus(20)}", "", f"Answer {i} {corpus(60)}") for i in range(size)]
+        with silenced():
+            alpacca = Alpacca(CHAT_MODEL, previous_history=history, system=system_location, host=mock.host)
+        cold = measure(lambda: alpacca._make_prompt("Next question", rag_context=["some context"]), 1)
+        warm = measure(lambda: alpacca._make_prompt("Next question", rag_context=["some context"]), repeat)
+        with silenced():
+            chars = len(alpacca._make_prompt("Next question", rag_context=["some context"]))
+        results[str(size)] = {"first": summarize(cold), "repeated": summarize(warm), "prompt_chars": chars}
+    return results
+
+
+def bench_embedding(mock: MockOllama, repeat: int, chunk_words: int) -> dict:
+    """
+    Time the ingest of a corpus with Embedding._embed_long and the query latency over the resulting collection
+    """
+    results = {}
+    for words in CORPUS_SIZES:
+        with silenced():
+            embedding = Embedding(EMBED_MODEL, embedding_length=chunk_words, remote=mock.host,
+                                  collection_name=f"benchmark-{uuid.uuid4().hex[:8]}")
+        text = corpus(words)
+        ingest = measure(lambda: embedding._embed_long(text, "benchmark", token_count=chunk_words), 1)[0]
+        query = embedding.embed("quick fox")
+        latency = measure(lambda: embedding.query_by_embedding(query, number_of_results=3), repeat)
+        results[str(words)] = {"chunks": len(embedding), "ingest_seconds": ingest,
+                               "words_per_second": words / ingest, "chunks_per_second": len(embedding) / ingest,
+                               "query": summarize(latency)}
+    return results
+
+
+def run(output: str, repeat: int, ttft: float, token_latency: float, dimension: int, tokens: int,
+        chunk_words: int) -> dict:
+    """
+    Run every benchmark against a fresh mock server
+    :return: The results, also written as json to the output location
+    """
+    mock = MockOllama(ttft=ttft, token_latency=token_latency, embedding_dimension=dimension,
+                      response_tokens=tokens).start()
+    with tempfile.TemporaryDirectory() as directory:
+        system_location = os.path.join(directory, "SystemPrompt.md")
+        with open(system_location, "w") as file:
+            file.write(SYSTEM_PROMPT)
+        try:
+            results = {
+                "created_at": time.time(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "mock": {"ttft": ttft, "token_latency": token_latency, "embedding_dimension": dimension,
+                         "response_tokens": tokens},
+                "generate": bench_generate(mock, repeat),
+                "prompt_assembly": bench_prompt(mock, system_location, repeat),
+                "embedding": bench_embedding(mock, repeat, chunk_words),
+            }
+        finally:
+            mock.stop()
+
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(results, file, indent=4)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the client against a local mock ollama server")
+    parser.add_argument("--output", default=f"Resources/Benchmarks/{time.strftime('%Y%m%d-%H%M%S')}.json",
+                        help="The json file the results are written to")
+    parser.add_argument("--repeat", type=int, default=20, help="Repetitions of every timed operation")
+    parser.add_argument("--ttft", type=float, default=0.0, help="Seconds the mock waits before the first token")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Seconds the mock waits between tokens")
+    parser.add_argument("--dimension", type=int, default=768, help="Embedding dimension of the mock")
+    parser.add_argument("--tokens", type=int, default=64, help="Tokens of every mock response")
+    parser.add_argument("--chunk-words", type=int, default=256, help="Words per embedded chunk")
+    args = parser.parse_args()
+
+    results = run(args.output, args.repeat, args.ttft, args.token_latency, args.dimension, args.tokens, args.chunk_words)
+    print(json.dumps({"generate_overhead_ms": results["generate"]["overhead_ms"],
+                      "prompt_p50_ms": {k: v["repeated"]["p50_ms"] for k, v in results["prompt_assembly"].items()},
+                      "ingest_words_per_second": {k: v["words_per_second"] for k, v in results["embedding"].items()}},
+                     indent=4))
+    print(f"Results written to {args.output}")
@@ -0,0 +1,50 @@
+import unittest
+
+from Core.ChatPages import ChatPages
+
+
+class SimpleTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.history = list(range(23))
+        self.loads = []
+
+    def load(self, start: int, stop: int) -> list:
+        self.loads.append((start, stop))
+        return self.history[start:stop]
+
+    def test_window(self):
+        pages = ChatPages(self.load, str, page_size=5)
+        start, messages = pages.window(len(self.history))
+        self.assertEqual(start, 15)
+        self.assertEqual(messages, [str(i) for i in range(15, 23)])
+        del self.history[3:]
+        self.assertEqual(ChatPages(self.load, str, page_size=5).window(3), (0, ["0", "1", "2"]))
+        self.assertEqual(pages.window(0), (0, []))
+        self.assertEqual(pages.window_start(10), 5)
+
+    def test_older(self):
+        pages = ChatPages(self.load, str, page_size=5)
+        self.assertEqual(pages.older(15), [str(i) for i in range(10, 15)])
+        self.assertEqual(pages.older(5), [str(i) for i in range(5)])
+        self.assertEqual(pages.older(0), [])
+
+    def test_cache(self):
+        pages = ChatPages(self.load, str, page_size=5, cache_pages=2)
+        pages.page(0)
+        pages.page(1)
+        pages.page(0)
+        self.assertEqual(self.loads, [(0, 5), (5, 10)])
+        pages.page(2) # Evicts page 1, page 0 was used more recently
+        pages.page(0)
+        pages.page(1)
+        self.assertEqual(self.loads, [(0, 5), (5, 10), (10, 15), (5, 10)])
+        pages.page(4) # The last page is not complete and not cached
+        pages.page(4)
+        self.assertEqual(self.loads[-2:], [(20, 25), (20, 25)])
+        pages.clear()
+        pages.page(0)
+        self.assertEqual(self.loads[-1], (0, 5))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import os
+import tempfile
+import time
+import unittest
+
+from Core.Chunker import chunk_words, estimate_tokens, read_blocks, split_words, NONE, SENTENCE, PARAGRAPH
+
+TEXT = "The first sentence. A second one!\n\nA new paragraph starts here and goes on"
+
+
+def words(text: str, size: int = 7) -> list:
+    return list(split_words(text[i:i + size] for i in range(0, len(text), size)))
+
+
+class SimpleTests(unittest.TestCase):
+    def test_estimate(self):
+        self.assertEqual(estimate_tokens("the"), 1)
+        self.assertEqual(estimate_tokens("internationalization"), 4)
+        self.assertEqual(estimate_tokens("2024"), 2)
+        self.assertEqual(estimate_tokens("end."), 2)
+        self.assertGreaterEqual(estimate_tokens("x"), 1)
+
+    def test_split_words(self):
+        for size in (1, 3, 7, 1000): # Words and paragraph breaks split across blocks
+            self.assertEqual([text for text, _, _ in words(TEXT, size)], TEXT.split())
+        endings = {text: ending for text, _, ending in words(TEXT)}
+        self.assertEqual(endings["sentence."], SENTENCE)
+        self.assertEqual(endings["one!"], PARAGRAPH)
+        self.assertEqual(endings["new"], NONE)
+        self.assertEqual(endings["on"], PARAGRAPH)
+
+    def test_chunk_sizes(self):
+        text = " ".join(f"word{i}" for i in range(100))
+        chunks = list(chunk_words(split_words([text]), size=10))
+        self.assertEqual(" ".join(chunks), text)
+        self.assertTrue(all(sum(estimate_tokens(w) for w in chunk.split()) <= 10 for chunk in chunks))
+
+    def test_overlap(self):
+        text = " ".join(str(i) for i in range(20))
+        chunks = [chunk.split() for chunk in chunk_words(split_words([text]), size=5, overlap=2)]
+        self.assertEqual(chunks[0], ["0", "1", "2", "3", "4"])
+        self.assertEqual(chunks[1], ["3", "4", "5", "6", "7"])
+        self.assertEqual(chunks[-1][-1], "19")
+        self.assertEqual(len(chunks), 6)
+
+    def test_long_word(self):
+        chunks = list(chunk_words(split_words(["a " + "b" * 100 + " c"]), size=5, overlap=1))
+        self.assertEqual(chunks, ["a", "b" * 100, "c"])
+
+    def test_boundaries(self):
+        chunks = list(chunk_words(split_words([TEXT]), size=12, boundaries=True))
+        self.assertEqual(chunks[0], "The first sentence. A second one!")
+        chunks = list(chunk_words(split_words([TEXT]), size=8, boundaries=True))
+        self.assertEqual(chunks[0], "The first sentence.")
+
+    def test_read_blocks(self):
+        with tempfile.TemporaryDirectory() as directory:
+            location = os.path.join(directory, "text.txt")
+            with open(location, "w", encoding="utf-8") as file:
+                file.write("Grüße " * 1000)
+            blocks = list(read_blocks(location, block_size=10))
+            self.assertEqual(max(len(block) for block in blocks), 10)
+            self.assertEqual([text for text, _, _ in split_words(blocks)], ["Grüße"] * 1000)
+
+    def test_linear(self):
+        def duration(count: int) -> float:
+            blocks = ("lorem ipsum dolor sit amet. " * 1000 for _ in range(count // 5000))
+            started = time.perf_counter()
+            for _ in chunk_words(split_words(blocks), size=512, overlap=32, boundaries=True):
+                pass
+            return time.perf_counter() - started
+        duration(50_000) # Warm up
+        self.assertLess(duration(500_000), 20 * duration(50_000))
+
+
+if __name__ == '__main__':
+    unittest.main()
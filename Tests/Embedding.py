@@ -1,8 +1,10 @@
 import unittest
+import uuid
 
 from Core.Embedding import Embedding
 from Core.Logger import Logger
 from Core.Priority import Priority
+from Tests.MockOllama import MockOllama
 
 MODEL = "nomic-embed-text:latest"
 
@@ -54,7 +56,50 @@ class PdfEmbeddingTests(unittest.TestCase):
         print(embedding.query_by_embedding(embedding=query, number_of_results=2))
         print(embedding.query_document_by_embedding(embedding=query, number_of_results=2))
 
+class BatchTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.mock = MockOllama(embedding_dimension=8).start()
 
+    def tearDown(self) -> None:
+        self.mock.stop()
+
+    def embedding(self, **batching) -> Embedding:
+        return Embedding("mock-embed:latest", collection_name=f"batch-{uuid.uuid4().hex}", remote=self.mock.host, **batching)
+
+    def embed_requests(self) -> list[dict]:
+        return [body for path, body in self.mock.requests if path == "/api/embed"]
+
+    def test_batches(self):
+        embedding = self.embedding(batch_size=10)
+        chunks = [f"chunk {i}" for i in range(25)]
+        self.assertEqual(embedding.add_chunks(chunks, source="test"), 25)
+        self.assertEqual([len(body["input"]) for body in self.embed_requests()], [10, 10, 5])
+        self.assertEqual(len(embedding), 25)
+        self.assertEqual(embedding.query_document_by_embedding(self.mock.embed("chunk 17")), "chunk 17")
+
+    def test_batch_characters(self):
+        embedding = self.embedding(batch_size=100, batch_characters=20)
+        embedding.add_chunks(["a" * 8, "b" * 8, "c" * 8, "d" * 30])
+        self.assertEqual([len(body["input"]) for body in self.embed_requests()], [2, 1, 1])
+
+    def test_unique_ids(self):
+        embedding = self.embedding(batch_size=4)
+        embedding._embed_long("one two three four five six", "first", token_count=2)
+        embedding._embed_long("seven eight nine", "second", token_count=2)
+        self.assertEqual(len(embedding), 5) # The second file used to overwrite the ids of the first
+
+    def test_split_retry(self):
+        embedding = self.embedding(batch_size=8)
+        embed_batch = embedding.embed_batch
+        def failing(texts: list[str]) -> list[list[float]]:
+            if "bad" in texts or len(texts) > 2:
+                raise ConnectionError("Too large")
+            return embed_batch(texts)
+        embedding.embed_batch = failing
+        chunks = [f"chunk {i}" for i in range(7)] + ["bad"]
+        self.assertEqual(embedding.add_chunks(chunks), 7)
+        self.assertEqual(len(embedding), 7)
+        self.assertEqual(embedding.query_document_by_embedding(self.mock.embed("chunk 6")), "chunk 6")
 
 
 if __name__ == '__main__':
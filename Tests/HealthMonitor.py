@@ -0,0 +1,61 @@
+import os
+import threading
+import time
+import unittest
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from Core.HealthMonitor import HealthMonitor, host_url
+
+
+class OllamaRootHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        self.end_headers()
+        self.wfile.write(b"Ollama is running")
+
+    def log_message(self, format, *args):
+        pass
+
+
+class SimpleTests(unittest.TestCase):
+    server: HTTPServer
+    host: str
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.server = HTTPServer(("127.0.0.1", 0), OllamaRootHandler)
+        cls.host = f"127.0.0.1:{cls.server.server_port}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.server.shutdown()
+
+    def test_host_url(self):
+        self.assertEqual(host_url("192.168.178.47:11434"), "http://192.168.178.47:11434")
+        self.assertEqual(host_url("https://example.com"), "https://example.com")
+        self.assertEqual(host_url(None), "http://127.0.0.1:11434")
+        with mock.patch.dict(os.environ, {"OLLAMA_HOST": "0.0.0.0:8080"}): # Read like the ollama client does
+            self.assertEqual(host_url(None), "http://0.0.0.0:8080")
+
+    def test_up(self):
+        monitor = HealthMonitor()
+        self.assertTrue(monitor.is_up(self.host))
+        self.assertIsNotNone(monitor.states()[self.host]["latency"])
+
+    def test_circuit_breaker(self):
+        monitor = HealthMonitor()
+        self.assertFalse(monitor.is_up("127.0.0.1:1"))
+        started = time.monotonic()
+        self.assertFalse(monitor.is_up("127.0.0.1:1"))  # Answered from the open circuit
+        self.assertLess(time.monotonic() - started, 0.05)
+        self.assertEqual(monitor.states()["127.0.0.1:1"]["failures"], 1)
+
+    def test_probe_all(self):
+        states = HealthMonitor().probe_all([self.host, "127.0.0.1:1"])
+        self.assertEqual(states, {self.host: True, "127.0.0.1:1": False})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+
+from Core.Alpacca import ChatExchange, history_string
+from Core.HistoryPolicy import HistoryPolicy, estimate_tokens
+
+
+def make_history(length: int) -> list[ChatExchange]:
+    return [ChatExchange(f"Question {i}? " * 10, f"Thinking {i} " * 50, f"Answer {i}. " * 20) for i in range(length)]
+
+class SimpleTests(unittest.TestCase):
+    def test_short_history_is_unchanged(self):
+        history = make_history(2)
+        policy = HistoryPolicy(token_budget=10_000, recent_turns=8, full_thoughts_turns=2)
+        self.assertEqual(policy.render(history), history_string(history))
+
+    def test_empty_thoughts_are_rendered(self):
+        history = [ChatExchange("Hi", "", "Hello")]
+        rendered = HistoryPolicy(token_budget=10_000).render(history)
+        self.assertEqual(rendered, "Chat history:\nuser prompted: 'Hi'\nyou thought: ''\nyou answered: 'Hello'\n")
+
+    def test_recent_turns_window(self):
+        policy = HistoryPolicy(token_budget=100_000, recent_turns=3)
+        self.assertEqual(policy.window_start(make_history(10)), 7)
+
+    def test_prompt_stays_within_budget(self):
+        policy = HistoryPolicy(token_budget=500, recent_turns=50)
+        for length in [10, 100, 1000]:
+            self.assertLessEqual(estimate_tokens(policy.render(make_history(length))), 520)
+
+    def test_older_thoughts_are_dropped(self):
+        history = make_history(3)
+        rendered = HistoryPolicy(token_budget=10_000, full_thoughts_turns=1).render(history)
+        self.assertNotIn("Thinking 0", rendered)
+        self.assertIn("Thinking 2", rendered)
+
+    def test_latest_exchange_is_always_kept(self):
+        rendered = HistoryPolicy(token_budget=1).render(make_history(4))
+        self.assertIn("Answer 3", rendered)
+        self.assertNotIn("Answer 2", rendered)
+
+
+if __name__ == '__main__':
+    unittest.main()
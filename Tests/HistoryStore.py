@@ -0,0 +1,126 @@
+import json
+import os
+import tempfile
+import unittest
+
+from Core import HistoryStore as history_store
+from Core.HistoryStore import HistoryStore, history_store_location, migrate_json_history, load_history_file
+
+
+def exchange(i: int) -> dict:
+    return {"user": f"Question {i}", "thoughts": "", "answer": f"Answer {i}"}
+
+
+class SimpleTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.location = os.path.join(self.directory.name, "chat.jsonl")
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_location(self):
+        self.assertEqual(history_store_location("Resources/Chats/chat.json"), "Resources/Chats/chat.jsonl")
+        self.assertEqual(history_store_location("chat.jsonl"), "chat.jsonl")
+
+    def test_append_and_load(self):
+        store = HistoryStore(self.location)
+        for i in range(10):
+            store.append(exchange(i))
+        store.close()
+        store = HistoryStore(self.location)
+        records, partial = store.load()
+        self.assertEqual(records, [exchange(i) for i in range(10)])
+        self.assertIsNone(partial)
+        self.assertEqual(len(store), 10)
+        self.assertEqual(store.load(last=3)[0], [exchange(i) for i in range(7, 10)])
+        self.assertEqual(store.load(last=20)[0], records)
+        self.assertEqual(store.load_range(2, 5), [exchange(i) for i in range(2, 5)])
+        self.assertEqual(store.load_range(8, 20), [exchange(8), exchange(9)])
+        store.close()
+
+    def test_torn_line(self):
+        store = HistoryStore(self.location)
+        store.append(exchange(0))
+        store.append(exchange(1))
+        store.close()
+        with open(self.location, "ab") as file:
+            file.write(b'{"user": "Quest') # The app died in the middle of a write
+        store = HistoryStore(self.location)
+        self.assertEqual(store.load()[0], [exchange(0), exchange(1)])
+        store.append(exchange(2))
+        self.assertEqual(store.load(last=1)[0], [exchange(2)])
+        store.close()
+
+    def test_index_repair(self):
+        store = HistoryStore(self.location)
+        for i in range(5):
+            store.append(exchange(i))
+        store.close()
+        with open(self.location + ".idx", "r+b") as index:
+            index.truncate(16) # The index lost the last three entries
+        store = HistoryStore(self.location)
+        self.assertEqual(len(store), 5)
+        self.assertEqual(store.load(last=2)[0], [exchange(3), exchange(4)])
+        store.close()
+        with open(self.location + ".idx", "wb") as index:
+            index.write((10 ** 6).to_bytes(8, "little")) # Points past the end of the file
+        store = HistoryStore(self.location)
+        self.assertEqual(store.load_range(0, 5), [exchange(i) for i in range(5)])
+        store.close()
+
+    def test_partial(self):
+        store = HistoryStore(self.location)
+        store.append(exchange(0))
+        store.write_partial({"user": "Question 1", "thoughts": "", "answer": "Ans"})
+        store.write_partial({"user": "Question 1", "thoughts": "", "answer": "Answer"})
+        store.close()
+        store = HistoryStore(self.location)
+        records, partial = store.load()
+        self.assertEqual(records, [exchange(0)])
+        self.assertEqual(partial, {"user": "Question 1", "thoughts": "", "answer": "Answer"})
+        self.assertEqual(len(store), 1)
+        store.append(exchange(1))
+        self.assertEqual(store.load(), ([exchange(0), exchange(1)], None))
+        self.assertEqual(load_history_file(self.location), [exchange(0), exchange(1)])
+        store.close()
+
+    def test_compaction(self):
+        store = HistoryStore(self.location)
+        store.append(exchange(0))
+        for i in range(history_store.COMPACT_MIN):
+            store.write_partial({"user": "Question 1", "thoughts": "", "answer": "x" * i})
+        size = os.path.getsize(self.location)
+        store.append(exchange(1))
+        self.assertLess(os.path.getsize(self.location), size)
+        self.assertEqual(store.load(), ([exchange(0), exchange(1)], None))
+        store.append(exchange(2))
+        store.close()
+        store = HistoryStore(self.location)
+        self.assertEqual(store.load(last=2)[0], [exchange(1), exchange(2)])
+        store.close()
+
+    def test_sync_batching(self):
+        store = HistoryStore(self.location, sync_interval=60, sync_every=4)
+        for i in range(3):
+            store.append(exchange(i))
+        self.assertEqual(store._unsynced, 3)
+        store.append(exchange(3))
+        self.assertEqual(store._unsynced, 0)
+        store.close()
+
+    def test_migration(self):
+        legacy = os.path.join(self.directory.name, "chat.json")
+        with open(legacy, "w") as file:
+            json.dump([exchange(0), exchange(1)], file)
+        store = HistoryStore(history_store_location(legacy))
+        self.assertTrue(migrate_json_history(legacy, store))
+        self.assertEqual(store.load()[0], [exchange(0), exchange(1)])
+        self.assertFalse(os.path.exists(legacy))
+        self.assertTrue(os.path.exists(legacy + ".bak"))
+        self.assertFalse(migrate_json_history(legacy, store))
+        store.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import time
+import unittest
+from types import SimpleNamespace
+
+from ollama import GenerateResponse
+
+from Core.ClientPool import ClientPool
+from Core.HealthMonitor import get_health_monitor
+from Core.HostPool import HostPool, NoHostAvailable
+from Core.ModelRegistry import get_model_registry
+
+MODEL = "llama3:latest"
+
+
+class FakeClient:
+    def __init__(self, name: str, fail: bool = False):
+        self.name = name
+        self.fail = fail
+
+    def list(self):
+        return SimpleNamespace(models=[{"model": MODEL}])
+
+    def generate(self, model, stream=False, **kwargs):
+        def stream_parts():
+            if self.fail:
+                raise ConnectionError("Failed to connect to Ollama")
+            yield GenerateResponse(model=model, response=self.name, done=False)
+            yield GenerateResponse(model=model, response="", done=True, eval_count=10, eval_duration=1_000_000_000)
+        return stream_parts()
+
+
+class SimpleTests(unittest.TestCase):
+    hosts = ["pool-a:11434", "pool-b:11434"]
+
+    def setUp(self) -> None:
+        for host in self.hosts:
+            get_health_monitor().report_success(host)
+            get_model_registry().invalidate(host)
+
+    def tearDown(self) -> None:
+        for host in self.hosts:
+            ClientPool._clients.pop(host, None)
+
+    def test_failover_before_first_token(self):
+        ClientPool._clients[self.hosts[0]] = FakeClient("a", fail=True)
+        ClientPool._clients[self.hosts[1]] = FakeClient("b")
+        pool = HostPool(self.hosts)
+        parts = list(pool.generate(MODEL, preferred=self.hosts[0], prompt="Hi"))
+        self.assertEqual(parts[0].response, "b")
+        self.assertEqual(pool.stats()[self.hosts[1]]["tokens_per_second"], 10.0)
+        self.assertNotIn(self.hosts[0], pool.candidates(MODEL))  # The circuit of the failed host is open
+
+    def test_least_loaded_first(self):
+        ClientPool._clients[self.hosts[0]] = FakeClient("a")
+        ClientPool._clients[self.hosts[1]] = FakeClient("b")
+        pool = HostPool(self.hosts)
+        streaming = pool.generate(MODEL, prompt="Hi")
+        next(streaming)  # Keeps one generation in flight on the first host
+        self.assertEqual(pool.select(MODEL), self.hosts[1])
+        list(streaming)
+        self.assertEqual(pool.stats()[self.hosts[0]]["in_flight"], 0)
+
+    def test_parallel_refresh(self):
+        ClientPool._clients[self.hosts[0]] = FakeClient("a")
+        ClientPool._clients[self.hosts[1]] = FakeClient("b")
+        monitor = get_health_monitor()
+        for host in self.hosts:
+            monitor._state(host).checked_at = 0.0 # Outdated
+        def slow_probe(host):
+            time.sleep(0.3)
+            monitor.report_success(host)
+            return True
+        monitor.probe = slow_probe
+        try:
+            started = time.monotonic()
+            self.assertEqual(sorted(HostPool(self.hosts).candidates(MODEL)), sorted(self.hosts))
+            self.assertLess(time.monotonic() - started, 0.55) # Both hosts were probed at the same time
+        finally:
+            del monitor.probe
+
+    def test_no_host(self):
+        ClientPool._clients[self.hosts[0]] = FakeClient("a", fail=True)
+        pool = HostPool(self.hosts[:1])
+        self.assertRaises(NoHostAvailable, lambda: list(pool.generate(MODEL, prompt="Hi")))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import os
+import subprocess
+import sys
+import unittest
+
+from Core.LazyImport import lazy_import, is_imported, LazyModule
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Modules that must only be imported on first use, by the module whose import should stay free of them
+HEAVY = ("chromadb", "pypdf", "textual_plot", "numpy", "tkinter", "psutil")
+
+
+def import_times(module: str) -> dict[str, tuple[int, int]]:
+    """
+    Import a module in a fresh interpreter with -X importtime
+    :param module: The module to import
+    :return: The self and cumulative import time in microseconds of every module that was imported
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=ROOT,
+                            capture_output=True, text=True, stdin=subprocess.DEVNULL)
+    if result.returncode != 0:
+        raise ImportError(result.stderr.strip().splitlines()[-1])
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = (int(own), int(cumulative))
+    return times
+
+
+def heavy_imports(times: dict[str, tuple[int, int]]) -> list[str]:
+    return sorted(name for name in times if name.split(".")[0] in HEAVY)
+
+
+class SimpleTests(unittest.TestCase):
+    def test_lazy_module(self):
+        # A module nothing else imports, so the test also holds when the console tests ran in the same process
+        self.assertFalse(is_imported("tabnanny"))
+        tabnanny = lazy_import("tabnanny")
+        self.assertIsInstance(tabnanny, LazyModule)
+        self.assertFalse(is_imported("tabnanny"))
+        self.assertTrue(issubclass(tabnanny.NannyNag, Exception))
+        self.assertTrue(is_imported("tabnanny"))
+        self.assertIs(lazy_import("tabnanny"), sys.modules["tabnanny"])
+
+    def test_headless_generation(self):
+        self.assertEqual(heavy_imports(import_times("Core.Alpacca")), [])
+
+    def test_embedding(self):
+        self.assertEqual(heavy_imports(import_times("Core.Embedding")), [])
+
+    def test_load_tester(self):
+        self.assertEqual(heavy_imports(import_times("Utils.LoadTester")), [])
+
+    def test_console(self):
+        self.assertEqual(heavy_imports(import_times("TextualConsole")), [])
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and not sys.argv[1].startswith("-"):
+        # python -m Tests.ImportTime <module> [count] prints the slowest imports of the module
+        times = import_times(sys.argv[1])
+        count = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+        print(f"{'self [ms]':>10} {'cumulative [ms]':>16}  module")
+        for name, (own, cumulative) in sorted(times.items(), key=lambda t: -t[1][1])[:count]:
+            print(f"{own / 1000:>10.1f} {cumulative / 1000:>16.1f}  {name}")
+        print(f"Heavy modules imported: {heavy_imports(times) or 'none'}")
+    else:
+        unittest.main()
@@ -0,0 +1,78 @@
+import json
+import os
+import tempfile
+import unittest
+
+from Core.ModelRegistry import get_model_registry
+from Core.PromptTemplate import PREVIOUS_EXCHANGE, USER_PROMPT
+from Tests.MockOllama import MockOllama
+from Utils.LoadTester import load_session, load_trace, replay
+
+CHAT_MODEL = "mock-chat:latest"
+
+
+def exchange(user: str, started_at: float = None, total: float = 1.0) -> dict:
+    d = {"user": user, "thoughts": "", "answer": "Answer"}
+    if started_at is not None:
+        d["metrics"] = {"model": CHAT_MODEL, "host": None, "started_at": started_at, "first_token": 0.1,
+                        "total": total}
+    return d
+
+
+class SimpleTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.write("a.json", [exchange("Hi", 100.0, 2.0), exchange("How are you?", 110.0), exchange("Bye")])
+        self.write("b.json", [exchange("Hello")])
+        self.write("empty.json", [])
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def write(self, name: str, history: list) -> None:
+        with open(os.path.join(self.directory.name, name), "w") as file:
+            json.dump(history, file)
+
+    def test_think_times(self):
+        session = load_session(os.path.join(self.directory.name, "a.json"), default_think_time=3.0)
+        self.assertEqual([t.prompt for t in session], ["Hi", "How are you?", "Bye"])
+        self.assertEqual([t.think_time for t in session], [0.0, 8.0, 3.0])
+        self.assertEqual(len(load_trace(os.path.join(self.directory.name, "*.json"))), 2)
+
+    def test_replay(self):
+        trace = load_trace(os.path.join(self.directory.name, "*.json"), default_think_time=0.0)
+        with MockOllama(ttft=0.01, response_tokens=4) as mock:
+            report = replay(trace, CHAT_MODEL, host=mock.host, users=3, speedup=100.0)
+            # The third user has no session of its own and replays the first one again
+            self.assertEqual(len([r for r in mock.requests if r[0] == "/api/generate"]), 7)
+        self.assertEqual(report["requests"], 7)
+        self.assertEqual(report["error_rate"], 0.0)
+        self.assertGreater(report["first_token"]["p50"], 0.0)
+        self.assertGreater(report["tokens_per_second"], 0.0)
+
+    def test_sessions_start_without_history(self):
+        trace = load_trace(os.path.join(self.directory.name, "*.json"), default_think_time=0.0)
+        system = os.path.join(self.directory.name, "SystemPrompt.md")
+        with open(system, "w") as file:
+            file.write(f"History: {PREVIOUS_EXCHANGE}\nUser: {USER_PROMPT}")
+        with MockOllama(ttft=0.01, response_tokens=4) as mock:
+            replay(trace, CHAT_MODEL, host=mock.host, users=1, system=system, speedup=100.0)
+            prompts = [r[1]["prompt"] for r in mock.requests if r[0] == "/api/generate"]
+        # The second session is replayed by the same user but must not see the exchanges of the first one
+        self.assertIn("How are you?", prompts[2])
+        self.assertTrue(prompts[3].endswith("User: Hello"))
+        self.assertNotIn("How are you?", prompts[3])
+
+    def test_errors_are_counted(self):
+        trace = load_trace(os.path.join(self.directory.name, "*.json"), default_think_time=0.0)
+        with MockOllama() as mock:
+            get_model_registry().list_models(mock.host)
+            mock.models.remove(CHAT_MODEL) # The model disappears after the listing was cached
+            report = replay(trace, CHAT_MODEL, host=mock.host, users=1, speedup=100.0)
+        self.assertEqual(report["requests"], 4)
+        self.assertEqual(report["error_rate"], 1.0)
+        self.assertEqual(report["errors"], {"ResponseError": 4})
+
+
+if __name__ == '__main__':
+    unittest.main()
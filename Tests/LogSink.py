@@ -0,0 +1,143 @@
+import gzip
+import json
+import os
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta
+
+from Core.LogSink import LogSink, query_logs, rotated_logs
+from Core.Logger import Log, Logger
+from Core.Priority import Priority
+
+
+def wait_for(condition, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+class SimpleTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.location = self.directory.name
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_jsonable(self):
+        log = Log("Hello %s", Priority.HIGH, sender="test", args=("world",))
+        record = json.loads(json.dumps(log.jsonable()))
+        self.assertEqual(record["message"], "Hello world")
+        self.assertEqual(record["priority"], "HIGH")
+        self.assertEqual(datetime.fromisoformat(record["timestamp"]), log.timestamp)
+
+    def test_save_logs(self):
+        level = Logger.level
+        Logger.set_level(Priority.DEBUG)
+        try:
+            Logger.log("Saved", Priority.NORMAL)
+            location = os.path.join(self.location, "logs.jsonl")
+            self.assertTrue(Logger.save_logs(location))
+            with open(location) as file:
+                records = [json.loads(line) for line in file]
+            self.assertIn("Saved", [record["message"] for record in records])
+        finally:
+            Logger.set_level(level)
+            Logger.flush()
+
+    def test_rotation(self):
+        sink = LogSink(self.location, max_bytes=1000, backups=100, compress=False)
+        for i in range(100):
+            sink.write(Log(f"Message {i}", Priority.NORMAL, sender="test"))
+        sink.close()
+        self.assertGreater(len(rotated_logs(self.location)), 1)
+        self.assertLessEqual(os.path.getsize(sink.location), 1000)
+        messages = [record["message"] for record in query_logs(self.location)]
+        self.assertEqual(messages, [f"Message {i}" for i in range(100)])
+
+    def test_rotation_bytes(self):
+        sink = LogSink(self.location, max_bytes=1000, backups=100, compress=False)
+        for i in range(50):
+            sink.write(Log(f"Nachricht {i}: äöü€", Priority.NORMAL, sender="test"))
+        sink.close()
+        self.assertLessEqual(os.path.getsize(sink.location), 1000) # Bytes, not characters
+
+    def test_reopen_keeps_age(self):
+        sink = LogSink(self.location, compress=False)
+        log = Log("Old", Priority.NORMAL)
+        log.timestamp = datetime.now() - timedelta(hours=2)
+        sink.write(log)
+        sink.close()
+        sink = LogSink(self.location, max_age=60 * 60, compress=False) # The file was started two hours ago
+        sink.write(Log("New", Priority.NORMAL))
+        sink.close()
+        self.assertEqual(len(rotated_logs(self.location)), 1)
+
+    def test_torn_line(self):
+        sink = LogSink(self.location, compress=False)
+        sink.write(Log("Before", Priority.NORMAL))
+        sink.close()
+        with open(sink.location, "a", encoding="utf-8") as file:
+            file.write('{"message": "Torn') # The app died while writing
+        sink = LogSink(self.location, compress=False)
+        sink.write(Log("After", Priority.NORMAL))
+        sink.close()
+        self.assertEqual([record["message"] for record in query_logs(self.location)], ["Before", "After"])
+        with open(sink.location, "a", encoding="utf-8") as file:
+            file.write('{"message": "Torn\n')
+        self.assertEqual([record["message"] for record in query_logs(self.location)], ["Before", "After"])
+
+    def test_backups(self):
+        sink = LogSink(self.location, max_bytes=100, backups=2, compress=False)
+        for i in range(50):
+            sink.write(Log(f"Message {i}", Priority.NORMAL))
+        sink.close()
+        self.assertEqual(len(rotated_logs(self.location)), 2)
+
+    def test_compress(self):
+        sink = LogSink(self.location, max_bytes=1000, compress=True)
+        for i in range(30):
+            sink.write(Log(f"Message {i}", Priority.NORMAL))
+        sink.close()
+        self.assertTrue(wait_for(lambda: all(location.endswith(".gz") for location in rotated_logs(self.location))))
+        with gzip.open(rotated_logs(self.location)[0], "rt") as file:
+            self.assertEqual(json.loads(file.readline())["message"], "Message 0")
+        self.assertEqual(len(list(query_logs(self.location))), 30)
+
+    def test_query(self):
+        sink = LogSink(self.location, compress=False)
+        now = datetime.now()
+        logs = [Log("a", Priority.DEBUG, sender="load"), Log("b", Priority.HIGH, sender="load"),
+                Log("c", Priority.CRITICAL, sender="generate")]
+        for i, log in enumerate(logs):
+            log.timestamp = now + timedelta(seconds=i)
+            sink.write(log)
+        sink.close()
+        messages = lambda **filters: [record["message"] for record in query_logs(self.location, **filters)]
+        self.assertEqual(messages(sender="load"), ["a", "b"])
+        self.assertEqual(messages(priority=Priority.HIGH), ["b", "c"])
+        self.assertEqual(messages(start=now + timedelta(seconds=1)), ["b", "c"])
+        self.assertEqual(messages(end=now + timedelta(seconds=1)), ["a"])
+        self.assertEqual(messages(sender="load", priority=Priority.HIGH), ["b"])
+
+    def test_logger_sink(self):
+        level = Logger.level
+        Logger.set_level(Priority.DEBUG)
+        sink = LogSink(self.location, compress=False)
+        Logger.add_sink(sink)
+        try:
+            Logger.log("Streamed %d", Priority.LOW, 1)
+            Logger.flush()
+            self.assertEqual([record["message"] for record in query_logs(self.location)], ["Streamed 1"])
+        finally:
+            Logger.remove_sink(sink)
+            sink.close()
+            Logger.set_level(level)
+
+
+if __name__ == '__main__':
+    unittest.main()
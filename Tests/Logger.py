@@ -1,5 +1,12 @@
+import contextlib
+import io
+import threading
+import time
 import unittest
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
 
+from Core import Logger as logger_module
 from Core.Logger import Logger, get_logger
 from Core.Priority import Priority
 
@@ -30,6 +37,95 @@ class MyTestCase(unittest.TestCase):
         logger.log("Test message", priority=Priority.CRITICAL)
 
 
+class Expensive:
+    formatted = 0
+
+    def __str__(self):
+        Expensive.formatted += 1
+        return "expensive"
+
+
+class FastPathTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.level = Logger.level
+        Logger.clear_logs()
+
+    def tearDown(self) -> None:
+        Logger.set_level(self.level)
+        Logger.flush()
+
+    def test_level_filter(self):
+        Logger.set_level(Priority.NORMAL)
+        Expensive.formatted = 0
+        Logger.log("Prompt: %s", Priority.DEBUG, Expensive())
+        self.assertEqual(Logger.get_logs(), [])
+        self.assertFalse(Logger.is_enabled(Priority.LOW))
+        self.assertTrue(Logger.is_enabled(Priority.HIGH))
+        Logger.log("Prompt: %s", Priority.HIGH, Expensive())
+        Logger.flush()
+        self.assertEqual(Logger.get_logs()[0].message, "Prompt: expensive")
+        self.assertEqual(Expensive.formatted, 1)
+
+    def test_sender(self):
+        Logger.set_level(Priority.DEBUG)
+        Logger.log("Hello", Priority.LOW)
+        self.assertEqual(Logger.get_logs()[-1].sender, "test_sender")
+
+    def test_bounded(self):
+        Logger.set_level(Priority.DEBUG)
+        logs = Logger.logs
+        Logger.logs = deque(maxlen=5)
+        try:
+            for i in range(20):
+                Logger.log("Message %d", Priority.DEBUG, i)
+            self.assertEqual([log.message for log in Logger.get_logs()], [f"Message {i}" for i in range(15, 20)])
+        finally:
+            Logger.flush()
+            Logger.logs = logs
+
+    def test_pending_bounded(self):
+        Logger.set_level(Priority.DEBUG)
+        Logger.flush()
+        received, release = threading.Event(), threading.Event()
+
+        class BlockingSink:
+            def write(self, log):
+                received.set()
+                release.wait(5)
+
+            def flush(self):
+                pass
+
+        sink, dropped = BlockingSink(), Logger.dropped
+        Logger.add_sink(sink)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+                Logger.log("Blocks the writer", Priority.DEBUG)
+                self.assertTrue(received.wait(5))
+                for i in range(logger_module.MAX_PENDING + 3):
+                    Logger.log("Message %d", Priority.DEBUG, i)
+                self.assertEqual(Logger.dropped - dropped, 3) # Logging did not wait for the writer
+                release.set()
+                Logger.flush()
+        finally:
+            release.set()
+            Logger.remove_sink(sink)
+
+    def test_concurrent_format(self):
+        for _ in range(100):
+            log = logger_module.Log("100%% of %s", Priority.HIGH, args=("the tokens",))
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                messages = set(executor.map(lambda _: log.message, range(8)))
+            self.assertEqual(messages, {"100% of the tokens"}) # Formatted exactly once
+
+    def test_filtered_cost(self):
+        Logger.set_level(Priority.CRITICAL)
+        started = time.perf_counter()
+        for i in range(10_000):
+            Logger.log("Token %d", Priority.DEBUG, i)
+        self.assertLess((time.perf_counter() - started) / 10_000, 20e-6)
+        self.assertLessEqual(len(Logger.get_logs()), logger_module.MAX_LOGS)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+
+from ollama import GenerateResponse
+
+from Core.Alpacca import ChatExchange, chat_exchange_from_dict
+from Core.Metrics import MetricsRegistry, MetricsTracker, RollingHistogram, GenerationMetrics
+
+
+class SimpleTests(unittest.TestCase):
+    def test_quantiles(self):
+        histogram = RollingHistogram(size=100)
+        for value in range(1, 201):
+            histogram.add(value)
+        self.assertEqual(histogram.count, 200)
+        self.assertEqual(histogram.quantiles(), {0.5: 150, 0.95: 195, 0.99: 199}) # Nearest rank of 101 to 200
+
+    def test_tracker(self):
+        parts = [GenerateResponse(model="m", response="Hi", done=False),
+                 GenerateResponse(model="m", response="", done=True, load_duration=500_000_000,
+                                  prompt_eval_count=100, prompt_eval_duration=250_000_000,
+                                  eval_count=20, eval_duration=1_000_000_000)]
+        tracker = MetricsTracker("m", "host:11434")
+        self.assertEqual([p.response for p in tracker.track(iter(parts))], ["Hi", ""])
+        metrics = tracker.metrics
+        self.assertEqual(metrics.prefill_speed(), 400.0)
+        self.assertEqual(metrics.decode_speed(), 20.0)
+        self.assertEqual(metrics.load_duration, 0.5)
+        self.assertIsNotNone(metrics.first_token)
+
+    def test_export_formats(self):
+        registry = MetricsRegistry()
+        registry.record(GenerationMetrics("m", None, 0.0, 0.1, 1.0, eval_count=10, eval_duration=0.5))
+        series = registry.snapshot()[0]
+        self.assertEqual(series["host"], "local")
+        self.assertEqual(series["metrics"]["decode_tokens_per_second"]["p50"], 20.0)
+        self.assertIn('alpacca_decode_tokens_per_second{model="m",host="local",quantile="0.5"} 20.0',
+                      registry.prometheus())
+
+    def test_exchange_round_trip(self):
+        exchange = ChatExchange("u", "t", "a", GenerationMetrics("m", None, 1.0, 0.1, 1.0))
+        loaded = chat_exchange_from_dict(exchange.dict())
+        self.assertEqual(loaded.metrics.dict(), exchange.metrics.dict())
+        self.assertIsNone(chat_exchange_from_dict({"user": "u", "thoughts": "t", "answer": "a"}).metrics)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,231 @@
+import hashlib
+import json
+import math
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_MODELS = ["mock-chat:latest", "mock-embed:latest"]
+
+
+class MockOllama:
+    """
+    A local stand-in for an ollama server implementing the root health endpoint, /api/tags, /api/ps, /api/show,
+    /api/generate (streamed or not) and /api/embed with configurable latencies.
+    Models are loaded on their first request, taking load_time, and the least recently used one is evicted once more
+    than max_loaded models are loaded.
+    Responses are deterministic, so the same prompt always streams the same tokens.
+    """
+    ttft: float # Seconds before the first token is sent
+    token_latency: float # Seconds between two tokens
+    embedding_dimension: int
+    response_tokens: int # Number of tokens of every generated response
+    load_time: float # Seconds it takes to load a model
+    max_loaded: int
+    models: list[str]
+    loaded: list[str] # Loaded models, least recently used first
+    requests: list[tuple[str, dict]] # Every request as (path, body), for assertions
+    drop_after: int | None # Streamed tokens after which the connection is dropped mid-stream, None never drops
+
+    def __init__(self, ttft: float = 0.0, token_latency: float = 0.0, embedding_dimension: int = 768,
+                 response_tokens: int = 32, models: list[str] = None, context_length: int = 4096,
+                 load_time: float = 0.0, max_loaded: int = 3, drop_after: int = None):
+        self.ttft = ttft
+        self.token_latency = token_latency
+        self.embedding_dimension = embedding_dimension
+        self.response_tokens = response_tokens
+        self.models = list(models or DEFAULT_MODELS)
+        self.context_length = context_length
+        self.load_time = load_time
+        self.max_loaded = max_loaded
+        self.drop_after = drop_after
+        self.loaded = []
+        self.requests = []
+        self._load_lock = threading.Lock()
+        self._server: ThreadingHTTPServer | None = None
+
+    @property
+    def host(self) -> str:
+        return f"127.0.0.1:{self._server.server_port}"
+
+    def start(self) -> "MockOllama":
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_HEAD(self):
+                self._send(200, b"Ollama is running", "text/plain")
+
+            def do_GET(self):
+                mock.requests.append((self.path, {}))
+                if self.path == "/":
+                    self._send(200, b"Ollama is running", "text/plain")
+                elif self.path == "/api/tags":
+                    self._json({"models": [mock.model_entry(m) for m in mock.models]})
+                elif self.path == "/api/ps":
+                    self._json({"models": [mock.model_entry(m) for m in list(mock.loaded)]})
+                else:
+                    self._send(404, b"404 page not found", "text/plain")
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                mock.requests.append((self.path, body))
+                if self.path == "/api/generate":
+                    self._generate(body)
+                elif self.path == "/api/embed":
+                    mock.load(body.get("model"))
+                    inputs = body.get("input", "")
+                    inputs = [inputs] if isinstance(inputs, str) else inputs
+                    self._json({"model": body.get("model"), "embeddings": [mock.embed(i) for i in inputs]})
+                elif self.path == "/api/show":
+                    self._json({"modelfile": "", "details": {"family": "mock"}, "model_info": {
+                        "mock.context_length": mock.context_length,
+                        "mock.embedding_length": mock.embedding_dimension
+                    }})
+                else:
+                    self._send(404, b"404 page not found", "text/plain")
+
+            def _send(self, status: int, data: bytes, content_type: str):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _json(self, data: dict, status: int = 200):
+                self._send(status, json.dumps(data).encode(), "application/json")
+
+            def _generate(self, body: dict):
+                if body.get("model") not in mock.models:
+                    self._json({"error": f"model '{body.get('model')}' not found"}, status=404)
+                    return
+                started = time.monotonic()
+                if body.get("keep_alive") == 0:
+                    mock.unload(body["model"])
+                    self._json({"model": body["model"], "response": "", "done": True, "done_reason": "unload"})
+                    return
+                load_duration = mock.load(body["model"])
+                if not body.get("prompt"):
+                    self._json({"model": body["model"], "response": "", "done": True, "done_reason": "load",
+                                "load_duration": int(load_duration * 1e9)})
+                    return
+                tokens = mock.tokens(body.get("prompt", ""))
+                prompt_tokens = len(body.get("prompt", "").split()) + len(body.get("context") or [])
+                time.sleep(mock.ttft)
+                if not body.get("stream", True):
+                    time.sleep(mock.token_latency * len(tokens))
+                    self._json(mock.part(body, "".join(tokens), True, started, prompt_tokens, len(tokens), load_duration))
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for i, token in enumerate(tokens):
+                    if i == mock.drop_after:
+                        self.close_connection = True # Closed without the final chunk
+                        return
+                    if i:
+                        time.sleep(mock.token_latency)
+                    self._chunk(mock.part(body, token, False, started, prompt_tokens, len(tokens)))
+                self._chunk(mock.part(body, "", True, started, prompt_tokens, len(tokens), load_duration))
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _chunk(self, data: dict):
+                line = json.dumps(data).encode() + b"\n"
+                self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+                self.wfile.flush()
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True, name="mock-ollama").start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "MockOllama":
+        return self.start()
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    @staticmethod
+    def model_entry(model: str) -> dict:
+        return {"name": model, "model": model, "size": 1, "digest": hashlib.sha256(model.encode()).hexdigest(),
+                "details": {"family": "mock"}}
+
+    def load(self, model: str) -> float:
+        """
+        Load a model if it is not loaded yet, evicting the least recently used model if needed
+        :param model: The name of the model
+        :return: The seconds loading took
+        """
+        with self._load_lock:
+            if model in self.loaded:
+                self.loaded.remove(model)
+                self.loaded.append(model)
+                return 0.0
+            time.sleep(self.load_time)
+            self.loaded.append(model)
+            del self.loaded[:-self.max_loaded]
+            return self.load_time
+
+    def unload(self, model: str) -> None:
+        with self._load_lock:
+            if model in self.loaded:
+                self.loaded.remove(model)
+
+    def tokens(self, prompt: str) -> list[str]:
+        """
+        :param prompt: The prompt of the generation
+        :return: The deterministic tokens of the response to the prompt
+        """
+        seed = int(hashlib.sha256(prompt.encode()).hexdigest(), 16)
+        return [f" tok{(seed >> (i % 64)) % 1000}" for i in range(self.response_tokens)]
+
+    def part(self, body: dict, token: str, done: bool, started: float, prompt_tokens: int, tokens: int,
+             load_duration: float = 0.0) -> dict:
+        part = {"model": body.get("model"), "created_at": datetime.now(timezone.utc).isoformat(),
+                "response": token, "done": done}
+        if done:
+            total = int((time.monotonic() - started) * 1e9)
+            part.update({
+                "done_reason": "stop",
+                "context": list(body.get("context") or []) + list(range(prompt_tokens + tokens)),
+                "total_duration": total,
+                "load_duration": int(load_duration * 1e9),
+                "prompt_eval_count": prompt_tokens,
+                "prompt_eval_duration": int(self.ttft * 1e9),
+                "eval_count": tokens,
+                "eval_duration": max(total - int((self.ttft + load_duration) * 1e9), 1)
+            })
+        return part
+
+    def embed(self, text: str) -> list[float]:
+        """
+        :param text: The text to embed
+        :return: A deterministic unit vector for the text
+        """
+        digest = hashlib.sha256(text.encode()).digest()
+        vector = [digest[i % len(digest)] - 127.5 + i % 7 for i in range(self.embedding_dimension)]
+        norm = math.sqrt(sum(v * v for v in vector))
+        return [v / norm for v in vector]
+
+
+if __name__ == "__main__":
+    server = MockOllama(ttft=0.2, token_latency=0.02).start()
+    print(f"Mock ollama running on {server.host}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,64 @@
+import time
+import unittest
+from types import SimpleNamespace
+
+from Core.ClientPool import ClientPool
+from Core.ModelRegistry import ModelRegistry
+
+HOST = "registry-test:11434"
+
+
+class FakeClient:
+    def __init__(self):
+        self.models = ["llama3:latest"]
+        self.list_calls = 0
+
+    def list(self):
+        self.list_calls += 1
+        return SimpleNamespace(models=[{"model": m} for m in self.models])
+
+    def show(self, model):
+        return SimpleNamespace(details=SimpleNamespace(family="bert"),
+                               modelinfo={"bert.context_length": 2048, "bert.embedding_length": 768})
+
+
+class SimpleTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.client = FakeClient()
+        ClientPool._clients[HOST] = self.client
+
+    def tearDown(self) -> None:
+        ClientPool._clients.pop(HOST, None)
+
+    def test_single_listing(self):
+        registry = ModelRegistry()
+        for _ in range(10):
+            self.assertTrue(registry.has_model("llama3", HOST))
+        self.assertEqual(self.client.list_calls, 1)
+
+    def test_stale_while_revalidate(self):
+        registry = ModelRegistry(ttl=0.01)
+        registry.list_models(HOST)
+        self.client.models.append("phi4:latest")
+        time.sleep(0.02)
+        self.assertNotIn("phi4:latest", registry.list_models(HOST))  # Served stale, refreshed in the background
+        deadline = time.monotonic() + 5
+        while "phi4:latest" not in registry.list_models(HOST) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertIn("phi4:latest", registry.list_models(HOST))
+
+    def test_invalidate(self):
+        registry = ModelRegistry()
+        registry.list_models(HOST)
+        registry.invalidate(HOST)
+        registry.list_models(HOST)
+        self.assertEqual(self.client.list_calls, 2)
+
+    def test_show(self):
+        details = ModelRegistry().show("nomic-embed-text", HOST)
+        self.assertEqual(details["context_length"], 2048)
+        self.assertEqual(details["embedding_length"], 768)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+
+from Core.Alpacca import Alpacca
+from Core.ModelResidency import ModelResidency, get_residency
+from Tests.MockOllama import MockOllama
+
+CHAT_MODEL = "mock-chat:latest"
+OTHER_MODEL = "mock-other:latest"
+
+
+class SimpleTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.mock = MockOllama(load_time=0.05, max_loaded=1, models=[CHAT_MODEL, OTHER_MODEL]).start()
+
+    def tearDown(self) -> None:
+        self.mock.stop()
+
+    def test_preload(self):
+        residency = ModelResidency(default_max_loaded=1)
+        self.assertEqual(residency.resident(self.mock.host), [])
+        future = residency.preload(CHAT_MODEL, self.mock.host)
+        self.assertTrue(future.result(timeout=5))
+        self.assertEqual(self.mock.loaded, [CHAT_MODEL])
+        self.assertTrue(residency.is_resident("mock-chat", self.mock.host))
+        self.assertIsNone(residency.preload(CHAT_MODEL, self.mock.host)) # Cooling down
+        self.assertNotIn("keep_alive", self.mock.requests[-1][1]) # The server's default applies
+
+    def test_no_thrashing(self):
+        residency = ModelResidency(default_max_loaded=1)
+        self.assertTrue(residency.preload(CHAT_MODEL, self.mock.host).result(timeout=5))
+        # The other model would evict a model that was just used
+        self.assertFalse(residency.preload(OTHER_MODEL, self.mock.host).result(timeout=5))
+        self.assertEqual(self.mock.loaded, [CHAT_MODEL])
+        residency.set_max_loaded(self.mock.host, 2)
+        self.assertTrue(residency.should_preload(OTHER_MODEL, self.mock.host))
+
+    def test_preload_select(self):
+        residency = ModelResidency(default_max_loaded=1)
+        future = residency.preload(CHAT_MODEL, session="pool", select=lambda: self.mock.host)
+        self.assertTrue(future.result(timeout=5)) # The host is picked by the background job
+        self.assertEqual(self.mock.loaded, [CHAT_MODEL])
+        self.assertIsNone(residency.preload(CHAT_MODEL, self.mock.host)) # Cooling down on the selected host
+        queued = residency.preload(CHAT_MODEL, "pool-first:11434", session="pool", select=lambda: self.mock.host)
+        self.assertFalse(queued.result(timeout=5)) # Queued on the first host of the pool, but cooling down on the selected one
+        self.assertNotIn(("pool-first:11434", CHAT_MODEL), residency._preloaded_at)
+
+    def test_unload(self):
+        residency = ModelResidency()
+        residency.preload(CHAT_MODEL, self.mock.host).result(timeout=5)
+        residency.unload(CHAT_MODEL, self.mock.host)
+        self.assertEqual(self.mock.loaded, [])
+        self.assertFalse(residency.is_resident(CHAT_MODEL, self.mock.host))
+
+    def test_alpacca_keep_alive(self):
+        alpacca = Alpacca(CHAT_MODEL, host=self.mock.host, keep_alive="30m")
+        self.assertEqual(get_residency().get_keep_alive(CHAT_MODEL), "30m")
+        self.assertTrue(alpacca.preload().result(timeout=5))
+        list(alpacca.generate_iterable("Hello"))
+        self.assertEqual(self.mock.requests[-1][1]["keep_alive"], "30m")
+        self.assertEqual(alpacca.get_last_metrics().load_duration, 0.0) # Loaded before the prompt
+        self.assertTrue(get_residency().in_use(CHAT_MODEL, self.mock.host))
+        self.assertEqual(alpacca.settings_to_dict()["keep_alive"], "30m")
+        alpacca.set_keep_alive(None)
+
+
+if __name__ == '__main__':
+    unittest.main()
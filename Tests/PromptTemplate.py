@@ -0,0 +1,33 @@
+import unittest
+
+from Core.PromptTemplate import PromptTemplate, RAG, PREVIOUS_EXCHANGE, USER_PROMPT
+
+
+class SimpleTests(unittest.TestCase):
+    def test_render_matches_replace(self):
+        text = "System\n%RAG%\nHistory: %RPreviousExchange%\nUser: %UserPrompt%\nEnd %UserPrompt%"
+        values = {RAG: "rag", PREVIOUS_EXCHANGE: "history", USER_PROMPT: "prompt"}
+        expected = text
+        for placeholder, value in values.items():
+            expected = expected.replace(placeholder, value)
+        self.assertEqual(PromptTemplate(text).render(values), expected)
+
+    def test_contains(self):
+        template = PromptTemplate("Only %UserPrompt%")
+        self.assertIn(USER_PROMPT, template)
+        self.assertNotIn(RAG, template)
+
+    def test_missing_values_are_kept(self):
+        self.assertEqual(PromptTemplate("A %RAG% B").render({}), "A %RAG% B")
+
+    def test_parts_are_joined(self):
+        template = PromptTemplate("[%RPreviousExchange%]")
+        self.assertEqual(template.render({PREVIOUS_EXCHANGE: ["a", "b", "c"]}), "[abc]")
+
+    def test_values_are_not_rendered_again(self):
+        template = PromptTemplate("%RAG% %UserPrompt%")
+        self.assertEqual(template.render({RAG: "%UserPrompt%", USER_PROMPT: "x"}), "%UserPrompt% x")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import os
+import tempfile
+import unittest
+
+from ollama import GenerateResponse
+
+from Core.ResponseCache import ResponseCache, cache_key, is_deterministic
+
+
+class SimpleTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_deterministic(self):
+        self.assertTrue(is_deterministic({"temperature": 0.0}))
+        self.assertTrue(is_deterministic({"temperature": 0.8, "seed": 3}))
+        self.assertFalse(is_deterministic({"temperature": 0.8}))
+
+    def test_key_depends_on_everything(self):
+        key = cache_key("model", {"temperature": 0.0}, "prompt")
+        self.assertEqual(key, cache_key("model", {"temperature": 0.0}, "prompt"))
+        self.assertNotEqual(key, cache_key("other", {"temperature": 0.0}, "prompt"))
+        self.assertNotEqual(key, cache_key("model", {"temperature": 0.0, "top_k": 1}, "prompt"))
+        self.assertNotEqual(key, cache_key("model", {"temperature": 0.0}, "prompt", [1, 2]))
+
+    def test_record_and_replay(self):
+        cache = ResponseCache(self.directory.name)
+        stream = [GenerateResponse(model="m", response=t, done=False) for t in ["Hel", "lo"]]
+        stream.append(GenerateResponse(model="m", response="", done=True, context=[1, 2, 3]))
+        recorded = [part.response for part in cache.record("key", iter(stream))]
+        self.assertEqual(recorded, ["Hel", "lo", ""])
+
+        replayed = list(ResponseCache.replay(ResponseCache(self.directory.name).get("key")))
+        self.assertEqual([part.response for part in replayed], ["Hel", "lo", ""])
+        self.assertTrue(replayed[-1].done)
+        self.assertEqual(replayed[-1].context, [1, 2, 3])
+
+    def test_incomplete_stream_is_not_stored(self):
+        cache = ResponseCache(self.directory.name)
+        list(cache.record("key", iter([GenerateResponse(model="m", response="Hel", done=False)])))
+        self.assertIsNone(cache.get("key"))
+
+    def test_lru_eviction(self):
+        cache = ResponseCache(self.directory.name, max_entries=2)
+        cache.put("a", "m", ["a"], None)
+        cache.put("b", "m", ["b"], None)
+        cache.get("a")
+        cache.put("c", "m", ["c"], None)
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("a"))
+        self.assertEqual(len(os.listdir(self.directory.name)), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
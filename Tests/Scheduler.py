@@ -0,0 +1,61 @@
+import threading
+import time
+import unittest
+
+from Core.Scheduler import GenerationScheduler, JobPriority
+
+
+class SimpleTests(unittest.TestCase):
+    def test_result(self):
+        scheduler = GenerationScheduler()
+        self.assertEqual(scheduler.submit("a", None, lambda: 42).result(timeout=5), 42)
+
+    def test_host_limit(self):
+        scheduler = GenerationScheduler(default_limit=2)
+        lock = threading.Lock()
+        running = [0, 0]  # current, highest
+
+        def job():
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            time.sleep(0.02)
+            with lock:
+                running[0] -= 1
+
+        futures = [scheduler.submit(f"s{i}", "host", job) for i in range(8)]
+        for future in futures:
+            future.result(timeout=5)
+        self.assertEqual(running[1], 2)
+
+    def test_priority_and_round_robin(self):
+        scheduler = GenerationScheduler(default_limit=1)
+        gate = threading.Event()
+        order = []
+        blocker = scheduler.submit("blocker", None, gate.wait)
+        futures = [
+            scheduler.submit("a", None, lambda: order.append("a-background"), JobPriority.BACKGROUND),
+            scheduler.submit("a", None, lambda: order.append("a1")),
+            scheduler.submit("a", None, lambda: order.append("a2")),
+            scheduler.submit("b", None, lambda: order.append("b1")),
+        ]
+        self.assertEqual(scheduler.queue_depth(), 4)
+        self.assertEqual(scheduler.queue_depth(session="a"), 3)
+        gate.set()
+        blocker.result(timeout=5)
+        for future in futures:
+            future.result(timeout=5)
+        self.assertEqual(order, ["a1", "b1", "a2", "a-background"])
+
+    def test_exception_is_reported(self):
+        scheduler = GenerationScheduler()
+        future = scheduler.submit("a", None, lambda: 1 / 0)
+        self.assertRaises(ZeroDivisionError, future.result, 5)
+        deadline = time.monotonic() + 5
+        while scheduler.running(None) and time.monotonic() < deadline:  # The slot is freed right after the result
+            time.sleep(0.01)
+        self.assertEqual(scheduler.stats()["local"]["running"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import json
+import os
+import tempfile
+import unittest
+
+from Core.SessionLoader import SessionLoader, SessionState
+from Tests.MockOllama import MockOllama
+
+CHAT_MODEL = "mock-chat:latest"
+
+
+class SimpleTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.mock = MockOllama().start()
+
+    def tearDown(self) -> None:
+        self.mock.stop()
+        self.directory.cleanup()
+
+    def settings(self, identifier: str, remote: str, history: list = None) -> str:
+        history_location = os.path.join(self.directory.name, f"{identifier}-history.json")
+        if history is not None:
+            with open(history_location, "w") as file:
+                json.dump(history, file)
+        location = os.path.join(self.directory.name, f"{identifier}.json")
+        with open(location, "w") as file:
+            json.dump({"version": 0.2, "model": CHAT_MODEL, "options": {}, "system": "Disabled",
+                       "history": history_location, "identifier": identifier, "remote": remote}, file)
+        return location
+
+    def test_load(self):
+        loader = SessionLoader()
+        session = loader.load(self.settings("chat", self.mock.host, [{"user": "Hi", "thoughts": "", "answer": "Hey"}]))
+        self.assertEqual(session.identifier, "chat")
+        self.assertEqual(session.model, CHAT_MODEL)
+        alpacca = session.future.result(timeout=5)
+        self.assertEqual(session.state, SessionState.READY)
+        self.assertIs(session.alpacca(), alpacca)
+        self.assertEqual(session.label(), "chat")
+        self.assertEqual(alpacca.get_history()[0].answer, "Hey")
+        loader.shutdown()
+
+    def test_failed_host(self):
+        loader = SessionLoader()
+        session = loader.load(self.settings("offline", "127.0.0.1:9"))
+        self.assertIn(session.label(), ("offline (connecting)", "offline (failed)"))
+        with self.assertRaises(Exception):
+            session.future.result(timeout=10)
+        self.assertEqual(session.state, SessionState.FAILED)
+        self.assertIsNone(session.alpacca())
+        self.assertEqual(session.label(), "offline (failed)")
+        loader.shutdown()
+
+    def test_version_mismatch(self):
+        location = self.settings("old", self.mock.host)
+        with open(location, "w") as file:
+            json.dump({"version": 0.1, "model": CHAT_MODEL}, file)
+        with self.assertRaises(ValueError):
+            SessionLoader().load(location)
+
+
+if __name__ == '__main__':
+    unittest.main()
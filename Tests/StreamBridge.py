@@ -0,0 +1,70 @@
+import threading
+import time
+import unittest
+
+from Core.StreamBridge import StreamBridge
+
+
+class SimpleTests(unittest.TestCase):
+    def test_coalescing(self):
+        delivered = []
+        bridge = StreamBridge(delivered.append, frame_rate=20)
+        started = time.monotonic()
+        for i in range(1000):
+            bridge.put(f" tok{i}")
+            if i % 100 == 0:
+                time.sleep(0.01)
+        bridge.close()
+        elapsed = time.monotonic() - started
+        self.assertEqual("".join(delivered), "".join(f" tok{i}" for i in range(1000)))
+        self.assertLessEqual(len(delivered), elapsed * 20 + 2)
+        self.assertEqual(bridge.frames, len(delivered))
+        self.assertEqual(bridge.parts, 1000)
+        self.assertEqual(bridge.words, 1000)
+
+    def test_counters(self):
+        bridge = StreamBridge(lambda text: None, frame_rate=100)
+        for part in ["Hel", "lo wor", "ld", "  ", "\nagain"]:
+            bridge.put(part)
+        bridge.close()
+        self.assertEqual(bridge.words, 3)
+        self.assertEqual(bridge.characters, 19)
+        self.assertEqual(bridge.parts, 5)
+
+    def test_schedule(self):
+        threads = []
+        bridge = StreamBridge(lambda text: threads.append(threading.current_thread()),
+                              schedule=lambda function, *args: function(*args), frame_rate=100)
+        bridge.put("a")
+        bridge.close()
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], threading.current_thread())
+
+    def test_backpressure(self):
+        release = threading.Event()
+        bridge = StreamBridge(lambda text: release.wait(5), frame_rate=1000, max_pending=10)
+        bridge.put("x" * 10) # Delivered once the frame starts, the delivery then blocks
+        time.sleep(0.05)
+        bridge.put("y" * 10)
+        blocked = threading.Thread(target=bridge.put, args=("z",))
+        blocked.start()
+        blocked.join(0.1)
+        self.assertTrue(blocked.is_alive())
+        release.set()
+        blocked.join(5)
+        self.assertFalse(blocked.is_alive())
+        bridge.close()
+
+    def test_failed_delivery(self):
+        def deliver(text):
+            raise RuntimeError("App is not running")
+        bridge = StreamBridge(deliver, frame_rate=100)
+        bridge.put("a")
+        time.sleep(0.05)
+        bridge.put("b")
+        bridge.close()
+        self.assertEqual(bridge.frames, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
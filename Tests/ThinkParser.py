@@ -0,0 +1,83 @@
+import unittest
+
+from Core.ThinkParser import ThinkParser, OPENED_BY_TEMPLATE_WITHIN
+
+
+def parse(chunks: list[str]) -> ThinkParser:
+    parser = ThinkParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+    parser.close()
+    return parser
+
+class SimpleTests(unittest.TestCase):
+    def test_no_thoughts(self):
+        parser = parse(["Hello", " world"])
+        self.assertEqual(parser.get_answer(), "Hello world")
+        self.assertEqual(parser.get_thoughts(), "")
+
+    def test_whole_tags(self):
+        parser = parse(["<think>", "Let me", " think", "</think>", "\n\nThe answer"])
+        self.assertEqual(parser.get_thoughts(), "Let me think")
+        self.assertEqual(parser.get_answer(), "The answer")
+
+    def test_split_tags(self):
+        text = "<think>I should say hi</think>Hi there <b>friend</b>"
+        for size in range(1, 9):
+            parser = parse([text[i:i + size] for i in range(0, len(text), size)])
+            self.assertEqual(parser.get_thoughts(), "I should say hi")
+            self.assertEqual(parser.get_answer(), "Hi there <b>friend</b>")
+
+    def test_thinking_state(self):
+        parser = ThinkParser()
+        parser.feed("<think>Hmm")
+        self.assertTrue(parser.thinking)
+        parser.feed("</thi")
+        self.assertTrue(parser.thinking)
+        parser.feed("nk>Done")
+        self.assertFalse(parser.thinking)
+
+    def test_opened_by_template(self):
+        parser = parse(["Reasoning ", "here</th", "ink>Answer"])
+        self.assertEqual(parser.get_thoughts(), "Reasoning here")
+        self.assertEqual(parser.get_answer(), "Answer")
+
+    def test_listener(self):
+        routed = []
+        parser = ThinkParser()
+        parser.subscribe(lambda kind, text: routed.append((kind, text)))
+        parser.feed("<think>a</think>b")
+        self.assertEqual(routed, [(ThinkParser.THOUGHT, "a"), (ThinkParser.ANSWER, "b")])
+
+    def test_listener_opened_by_template(self):
+        routed, state = [], {ThinkParser.THOUGHT: "", ThinkParser.ANSWER: ""}
+        def listener(kind, text):
+            routed.append((kind, text))
+            if kind is ThinkParser.MOVED:
+                self.assertTrue(state[ThinkParser.ANSWER].endswith(text))
+                state[ThinkParser.ANSWER] = state[ThinkParser.ANSWER][:-len(text)]
+                state[ThinkParser.THOUGHT] += text
+            else:
+                state[kind] += text
+        parser = ThinkParser()
+        parser.subscribe(listener)
+        for chunk in ["Hello ", "world", "</think>", "Answer"]:
+            parser.feed(chunk)
+        parser.close()
+        self.assertEqual(routed, [(ThinkParser.ANSWER, "Hello "), (ThinkParser.ANSWER, "world"),
+                                  (ThinkParser.MOVED, "Hello world"), (ThinkParser.ANSWER, "Answer")])
+        self.assertEqual(state, {ThinkParser.THOUGHT: parser.thoughts, ThinkParser.ANSWER: parser.answer})
+        self.assertEqual(parser.get_thoughts(), "Hello world")
+
+    def test_closing_tag_late_in_answer(self):
+        answer = "x" * OPENED_BY_TEMPLATE_WITHIN + " Use </think> to end a block"
+        parser = parse([answer[i:i + 7] for i in range(0, len(answer), 7)])
+        self.assertEqual(parser.get_answer(), answer.strip())
+        self.assertEqual(parser.get_thoughts(), "")
+
+    def test_unfinished_tag_is_flushed(self):
+        self.assertEqual(parse(["Less than <thi"]).get_answer(), "Less than <thi")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+
+from Core.Telemetry import Telemetry
+from Core.TimeSeries import TimeSeries
+
+
+class SimpleTests(unittest.TestCase):
+    def test_window(self):
+        series = TimeSeries(tiers=((1.0, 10),))
+        for t in range(5):
+            series.add(1000.0 + t, float(t))
+        times, values = series.window(3, 1004.0)
+        self.assertEqual(times, [1001.0, 1002.0, 1003.0, 1004.0])
+        self.assertEqual(values, [1.0, 2.0, 3.0, 4.0])
+        self.assertEqual(series.last(), (1004.0, 4.0))
+
+    def test_bounded(self):
+        series = TimeSeries(tiers=((1.0, 10),))
+        for t in range(1000):
+            series.add(float(t), float(t))
+        times, values = series.window(10_000, 999.0)
+        self.assertEqual(len(times), 11) # The ring and the second that is still averaged
+        self.assertEqual(values[0], 989.0)
+        self.assertEqual(values[-1], 999.0)
+
+    def test_downsampling(self):
+        series = TimeSeries(tiers=((1.0, 60), (60.0, 10)))
+        for t in range(300):
+            series.add(float(t), float(t // 60)) # 0 for the first minute, 1 for the second...
+        times, values = series.window(60, 299.0)
+        self.assertEqual(len(times), 61)
+        times, values = series.window(600, 299.0) # Longer than the seconds tier keeps
+        self.assertEqual(times, [0.0, 60.0, 120.0, 180.0, 240.0])
+        self.assertEqual(values, [0.0, 1.0, 2.0, 3.0, 4.0])
+
+    def test_average(self):
+        series = TimeSeries(tiers=((10.0, 10),))
+        for t, value in [(0, 1.0), (5, 3.0), (10, 10.0)]:
+            series.add(float(t), value)
+        self.assertEqual(series.window(100, 10.0), ([0.0, 10.0], [2.0, 10.0]))
+
+    def test_telemetry(self):
+        telemetry = Telemetry()
+        telemetry.add_tokens(50)
+        telemetry.sample(now=100.0)
+        telemetry.sample(now=101.0)
+        self.assertGreater(telemetry.memory_total, 0)
+        times, values = telemetry.window("memory", 10, now=101.0)
+        self.assertEqual(times, [-1.0, 0.0])
+        self.assertTrue(all(0 < v <= telemetry.memory_total for v in values))
+        tokens = telemetry.window("tokens", 10, now=101.0)[1]
+        self.assertGreater(tokens[0], 0)
+        self.assertEqual(tokens[1], 0)
+        self.assertEqual(len(telemetry.window("cpu", 10, now=101.0)[1]), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
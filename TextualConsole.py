@@ -1,21 +1,42 @@
+import os
 import time
+from concurrent.futures import Future
 import typing
 from typing import Iterator, List, Any, AsyncGenerator
 
-import ollama
-import psutil
 from ollama import GenerateResponse
-from textual import work
-from textual.containers import VerticalScroll, HorizontalGroup
+from rich.markdown import Markdown as RichMarkdown
+from textual import on
+from textual.app import ComposeResult, App
+from textual.containers import VerticalScroll, HorizontalGroup, Container, Vertical
+from textual.message import Message
 from textual.reactive import reactive, Reactive
+from textual.screen import Screen
 from textual.validation import Validator, ValidationResult
-from textual.widgets import Static, Input, Log, Tabs, Select, Tab, Button
+from textual.widgets import Static, Input, Log, Tabs, Select, Tab, Button, Markdown
 
-from Core.Alpacca import Alpacca, separate_thoughts, load_alpacca_from_json, RemoteException, VALID_PARAMETERS
-from Core.FileTree import *
+from Core.Alpacca import Alpacca, VALID_PARAMETERS, ChatExchange
+from Core.ChatPages import ChatPages
+from Core.HealthMonitor import get_health_monitor
+from Core.LazyImport import lazy_import
+from Core.LogSink import LogSink
 from Core.Logger import Logger
-from Core.MemGraph import Memgraph
+from Core.Metrics import get_metrics
+from Core.ModelRegistry import get_model_registry
 from Core.OllamaHelper import make_to_model_str
+from Core.Priority import Priority
+from Core.Scheduler import get_scheduler, JobPriority
+from Core.SessionLoader import SessionLoader, PendingSession, SessionState
+from Core.StreamBridge import StreamBridge, FRAME_RATE
+from Core.Telemetry import get_telemetry
+from Core.ThinkParser import ThinkParser, THINK_OPEN, THINK_CLOSE
+
+# Only needed after the first frame is drawn, plotting alone takes longer to import than the rest of the console
+FileTree = lazy_import("Core.FileTree")
+MemGraph = lazy_import("Core.MemGraph")
+
+PARTIAL_SAVE_INTERVAL = 1.0 # Seconds between snapshots of a streamed response saved for crash recovery
+STREAM_FRAME_RATE = float(os.environ.get("ALPACCA_FRAME_RATE", FRAME_RATE)) # Chat updates per second while streaming
 
 
 class UserMessage(Message):
@@ -36,20 +57,95 @@ class AIResponse(Message):
         super().__init__()
 
 
+class SessionLoaded(Message):
+    index: int
+
+    def __init__(self, index: int):
+        self.index = index
+        super().__init__()
+
+
 class ChatMessage(Message):
     user: str
     response: str
+    parser: ThinkParser # Routes the streamed response into thoughts and answer
 
     def __init__(self, user: str):
         self.user = user
         self.response = ""
+        self.parser = ThinkParser()
         super().__init__()
 
     def add_part(self, part: str):
         self.response += part
+        self.parser.feed(part)
+
+    def thoughts_status(self) -> str:
+        """
+        :return: A short note on the thoughts of the model instead of the thoughts themselves, empty without thoughts
+        """
+        if not self.parser.thoughts:
+            return ""
+        state = "Thinking" if self.parser.thinking else "Thought"
+        return f"> *{state}... ({len(self.parser.thoughts)} characters)*"
 
     def __str__(self):
-        return f"You: {self.user}\n\nAlpacca: {self.response}\n"
+        thoughts = self.thoughts_status()
+        thoughts = f"{thoughts}\n\n" if thoughts else ""
+        return f"You: {self.user}\n\n{thoughts}Alpacca: {self.parser.answer}\n"
+
+
+def chat_message_from_exchange(exchange: ChatExchange) -> ChatMessage:
+    message = ChatMessage(exchange.user)
+    if exchange.thoughts:
+        message.add_part(f"{THINK_OPEN}{exchange.thoughts}{THINK_CLOSE}")
+    message.add_part(exchange.answer)
+    message.parser.close()
+    return message
+
+
+class MessageView(Vertical):
+    """
+    Shows one chat exchange. A finished exchange is rendered once as a single static, the exchange that is streamed
+    only appends the new part of the answer to its markdown, so the cost of a token does not grow with the conversation.
+    """
+    message: ChatMessage
+    live: bool # The exchange is still streamed
+    _rendered: int # Characters of the answer that are in the markdown
+
+    def __init__(self, message: ChatMessage, live: bool = False):
+        self.message = message
+        self.live = live
+        self._rendered = 0
+        super().__init__(classes="message")
+
+    def compose(self) -> ComposeResult:
+        if not self.live:
+            yield Static(RichMarkdown(str(self.message)), classes="message-static")
+            return
+        self._rendered = len(self.message.parser.answer)
+        status = self.message.thoughts_status()
+        yield Markdown(f"You: {self.message.user}", classes="message-user")
+        yield Markdown(status, classes="message-thoughts").set_class(not status, "-hidden")
+        yield Markdown(f"Alpacca: {self.message.parser.answer}", classes="message-answer")
+
+    def sync(self) -> None:
+        """
+        Show the parts of the message that were added since the last sync
+        """
+        if not self.live or not self.is_mounted: # Composed with the whole message once it is mounted
+            return
+        status = self.message.thoughts_status()
+        thoughts = self.query_one(".message-thoughts", Markdown)
+        if status != thoughts.source:
+            thoughts.update(status)
+            thoughts.set_class(not status, "-hidden")
+        answer = self.message.parser.answer
+        if len(answer) < self._rendered: # The parser moved text that looked like an answer into the thoughts
+            self.query_one(".message-answer", Markdown).update(f"Alpacca: {answer}")
+        elif len(answer) > self._rendered:
+            self.query_one(".message-answer", Markdown).append(answer[self._rendered:])
+        self._rendered = len(answer)
 
 
 class AiChat(Static):
@@ -59,27 +155,59 @@ class AiChat(Static):
     log: Log = None
     generation: GenerateResponse | Iterator[GenerateResponse] = None
     identifier: str = ""
+    pages: ChatPages[ChatMessage] | None = None # Older exchanges of the history, loaded when scrolled to
+    first_loaded: int = 0 # The index in the history of the first exchange in lines
 
     def __init__(self, log, identifier: str = "Def", load_from: Alpacca = None):
         self.update_timer = None
         self.log = log
         self.identifier = identifier
         self._load_from = load_from
+        self._loading_older = False
         super().__init__()
+        if load_from is not None:
+            self.load_from_alpacca(load_from)
 
     def compose(self) -> ComposeResult:
+        yield Markdown(self.earlier_note(), id="earlier-exchanges").set_class(self.first_loaded == 0, "-hidden")
         if self.current_line is None and len(self.lines) == 0:
-            yield Markdown(f"Chat with AI: {self.identifier}")
-        else:
-            # self.log.write_line(str(self.current_line))
-            content = "\n".join(str(m) for m in self.lines)
-            # self.log.write_line(content)
-            content += "\n" + str(self.current_line)
-            yield Markdown(f"{content}")
+            yield Markdown(f"Chat with AI: {self.identifier}", id="chat-placeholder")
+        for line in self.lines:
+            yield MessageView(line)
+        if self.current_line is not None:
+            yield MessageView(self.current_line, live=True)
+
+    def earlier_note(self) -> str:
+        return f"*{self.first_loaded} earlier exchanges, scroll up to load them*"
+
+    def update_earlier_note(self):
+        note = self.query_one("#earlier-exchanges", Markdown)
+        note.update(self.earlier_note())
+        note.set_class(self.first_loaded == 0, "-hidden")
 
     def on_mount(self):
-        if self._load_from is not None:
-            self.load_from_alpacca(self._load_from)
+        self.watch(self.parent, "scroll_y", self.on_scrolled, init=False)
+
+    async def on_scrolled(self, scroll_y: float):
+        if scroll_y > 0 or self.first_loaded == 0 or self.pages is None or self._loading_older:
+            return
+        scroll = self.parent
+        if scroll is None or not scroll.is_mounted: # Left over from a tab that is no longer shown
+            return
+        self._loading_older = True
+        try:
+            older = self.pages.older(self.first_loaded)
+            self.lines[:0] = older
+            self.first_loaded -= self.pages.page_size
+            self.log.write_line(f"Loaded older exchanges of {self.identifier} from {self.first_loaded}")
+            views = self.query(MessageView)
+            shown = views.first() if views else None
+            await self.mount_all([MessageView(line) for line in older], before=shown)
+            self.update_earlier_note()
+            if shown is not None: # Keep the exchanges that were shown in place instead of jumping to the loaded page
+                self.call_after_refresh(scroll.scroll_to_widget, shown, top=True, animate=False)
+        finally:
+            self._loading_older = False
 
     def new_line(self, user: str):
         """
@@ -91,15 +219,55 @@ class AiChat(Static):
         if self.current_line is not None:
             self.log.write_line(f"Saving old line and adding it to the alpaca's history!")
             self.log.write_line(f"Old Response: {self.current_line.response}")
+            self.current_line.parser.close() # Releases what the parser still held back
             self.lines.append(self.current_line)
             self.log.write_line(f"Added old line to the chat history!")
+            self.freeze_last()
+            self.trim_to_latest()
 
         self.current_line = ChatMessage(user)
+        if self.is_mounted:
+            self.query("#chat-placeholder").remove()
+            self.mount(MessageView(self.current_line, live=True))
         self.log.write_line(f"current_line now reset!")
 
+    def freeze_last(self):
+        """
+        Replace the live view of the exchange that just finished with a single static, so live markdown widgets do
+        not pile up over a long session
+        """
+        if not self.is_mounted:
+            return
+        views = self.query(MessageView)
+        if views and views.last().live:
+            live = views.last()
+            self.mount(MessageView(live.message), after=live)
+            live.remove()
+
+    def trim_to_latest(self):
+        """
+        Drop the older pages that were loaded by scrolling up once the chat continues, they stay in the page cache
+        """
+        if self.pages is None:
+            return
+        start = self.pages.window_start(self.first_loaded + len(self.lines))
+        if start > self.first_loaded:
+            dropped = start - self.first_loaded
+            del self.lines[:dropped]
+            self.first_loaded = start
+            if self.is_mounted:
+                for view in list(self.query(MessageView))[:dropped]:
+                    view.remove()
+                self.update_earlier_note()
+
     def change_happened(self):
-        #self.mutate_reactive(AiChat.lines)
-        self.query_one(Markdown).update(f"{'\n'.join(str(m) for m in self.lines)}\n{self.current_line}")
+        """
+        Show the new parts of the current exchange, the other exchanges are not rendered again
+        """
+        if self.is_mounted and self.current_line is not None:
+            views = self.query(MessageView)
+            if views:
+                views.last().sync()
         #self.scroll_end(force=True)
 
     @on(AIResponse)
@@ -126,13 +294,13 @@ class AiChat(Static):
 
     def load_from_alpacca(self, alpacca: Alpacca):
         """
-        Load the chat history from an alpacca
+        Load the chat history from an alpacca, only the latest page is converted and older ones when scrolled to
         :param alpacca: The alpacca to load the history from
         """
-        for exchange in alpacca.get_history():
-            message = ChatMessage(exchange.user)
-            message.add_part(f"{exchange.thoughts}\n{exchange.answer}")
-            self.lines.append(message)
+        self.pages = ChatPages(alpacca.get_history_page, chat_message_from_exchange)
+        self.first_loaded, lines = self.pages.window(alpacca.get_history_length())
+        self.lines.clear()
+        self.lines.extend(lines)
 
 
 class CreateModelMessage(Message):
@@ -149,9 +317,9 @@ class ModelSelectScreen(Screen):
     available: List[str] = []
 
     def __init__(self, logger: Log):
-        for model in ollama.list().models:
-            self.available.append(model.model)
-            logger.write_line(model.model)
+        for model in get_model_registry().list_models():
+            self.available.append(model)
+            logger.write_line(model)
 
         super().__init__()
 
@@ -246,20 +414,20 @@ class NumberRangeValidator(Validator):
 class ChatTabs(Tabs):
     log: Log = None
     files: List[str] = []
-    alpacas: List[Alpacca] = []
+    labels: List[str] = []
 
-    def __init__(self, logger: Log, alpacas: List[Alpacca], files: List[str], id: str = ""):
+    def __init__(self, logger: Log, labels: List[str], files: List[str], id: str = ""):
         self.log = logger
         self.files = files
-        self.alpacas = alpacas
+        self.labels = labels
         super().__init__(id=id)
 
     def compose(self) -> ComposeResult:
-        yield Tabs(Tab(self.alpacas[0].identifier, id=f"tab-0"))
+        yield Tabs(Tab(self.labels[0], id=f"tab-0"))
 
     def on_mount(self):
-        for i in range(1, len(self.alpacas)):
-            self.query_one(Tabs).add_tab(Tab(self.alpacas[i].identifier, id=f"tab-{i}"))
+        for i in range(1, len(self.labels)):
+            self.query_one(Tabs).add_tab(Tab(self.labels[i], id=f"tab-{i}"))
         self.query_one(Tabs).add_tab(Tab("+", id="add-tab"))
 
 
@@ -315,7 +483,8 @@ class SettingsWindow(Static):
 
     async def on_mount(self): # async because of race condition
         added = []
-        for setting in self.alpacas[self.selected_alpaca_id].get_options():
+        alpaca = self.alpacas[self.selected_alpaca_id]
+        for setting in alpaca.get_options() if alpaca is not None else []: # None while the session is connecting
             if setting not in added:
                 added.append(setting)
             container = Container(classes="settings-row")
@@ -411,15 +580,15 @@ class SettingsWindow(Static):
 class MainWindow(Static):
     logger: Log
 
-    def __init__(self, logger: Log, alpacas: List[Alpacca], files: List[str], chats: List[AiChat]):
+    def __init__(self, logger: Log, labels: List[str], files: List[str], chats: List[AiChat]):
         self.logger = logger
-        self.alpacas = alpacas
+        self.labels = labels
         self.files = files
         self.chats = chats
         super().__init__(id="main-window", classes="Main-Windows")
 
     def compose(self) -> ComposeResult:
-        yield ChatTabs(self.logger, self.alpacas, self.files, id="chat-tabs")
+        yield ChatTabs(self.logger, self.labels, self.files, id="chat-tabs")
         # yield Tabs("Hello")
         with VerticalScroll(id="vertical-scroll-content"):
             yield self.chats[0]
@@ -435,38 +604,53 @@ class TextualConsole(App):
     chat = AiChat(style_logger)
     std_loc: str = "/Resources/Chats"
     std_settings: str = "/Resources/Settings"
-    alpacas: List[Alpacca] = []
-    chats: List[AiChat] = []
-    files: List[str] = []
+    std_metrics: str = "/Resources/Metrics"
+    std_logs: str = "/Resources/Logs"
+    alpacas: List[Alpacca | None] # None while the session is connecting or if it failed to load
+    loading: dict[int, PendingSession] # Sessions that are not ready yet by their index
+    labels: List[str] # The chat tab labels
+    chats: List[AiChat]
+    files: List[str]
     selected_alpaca_id: int = 0
     file_tree_open: bool = False
-    generate_running: reactive[bool] = reactive(False)
+    running_sessions: set[str] # Identifiers of the sessions with a queued or running generation
+    preloaded_sessions: set[str] # Identifiers of the sessions preloaded since their last prompt
     main_window: MainWindow
     settings_window: SettingsWindow
 
 
     def __init__(self):
         print("Initializing Textual Console")
-        self.alpacas, self.files = self.load_alpacca_models()
+        self.log_sink = LogSink(os.getcwd() + self.std_logs)
+        Logger.add_sink(self.log_sink)
+        self.session_loader = SessionLoader()
+        self.labels = []
+        self.chats = []
+        self.running_sessions = set()
+        self.preloaded_sessions = set()
+        sessions, self.files = self.load_alpacca_models()
+        self.alpacas = [None] * len(sessions)
+        self.loading = dict(enumerate(sessions))
 
         if len(self.alpacas) == 0:
             print("No alpacas found: Creating default alpacca")
             self.alpacas.append(self.create_default_alpacca())
 
-        for alpaca in self.alpacas:
-            self.chats.append(AiChat(log=self.style_logger, identifier=alpaca.identifier, load_from=alpaca))
+        for i, alpaca in enumerate(self.alpacas):
+            self.chats.append(AiChat(log=self.style_logger, identifier=self.session_identifier(i), load_from=alpaca))
+            self.labels.append(self.tab_label(i))
 
         super().__init__()
 
     def compose(self) -> ComposeResult:
-        main_window = MainWindow(self.style_logger, self.alpacas, self.files, self.chats)
+        main_window = MainWindow(self.style_logger, self.labels, self.files, self.chats)
         settings_window = SettingsWindow(self.style_logger, self.alpacas, self.selected_alpaca_id)
         yield MainTabs(logger=self.style_logger, chats=main_window, settings=settings_window)
         with Container(id="app-grid"):
             with Container(id="main-container"):
                 yield main_window
             with Container(id="side-window"):
-                yield Memgraph()
+                # The memory graph is mounted after the first frame
                 #yield Static("Second", classes="debug")
                 yield self.style_logger
                 #yield Static("Third", classes="debug")
@@ -476,13 +660,47 @@ class TextualConsole(App):
         for name in os.listdir(os.getcwd() + self.std_settings):
             if os.path.isfile(os.getcwd() + self.std_settings + "/" + name):
                 self.style_logger.write_line(f"default/{self.std_settings}/{name}")
+        self.call_after_refresh(self.mount_memgraph)
+        get_health_monitor().start()
+        for i, session in self.loading.items():
+            # Runs right away if the session is already loaded, post_message is thread safe otherwise
+            session.future.add_done_callback(lambda _, index=i: self.post_message(SessionLoaded(index)))
+
+    def session_identifier(self, index: int) -> str:
+        return self.loading[index].identifier if index in self.loading else self.alpacas[index].identifier
+
+    def tab_label(self, index: int) -> str:
+        return self.loading[index].label() if index in self.loading else self.alpacas[index].identifier
+
+    @on(SessionLoaded)
+    def on_session_loaded(self, event: SessionLoaded):
+        session = self.loading[event.index]
+        if session.state == SessionState.READY:
+            del self.loading[event.index]
+            alpaca = session.alpacca()
+            self.alpacas[event.index] = alpaca
+            self.chats[event.index].load_from_alpacca(alpaca)
+            self.chats[event.index].refresh(recompose=True)
+            self.style_logger.write_line(f"Session {alpaca.identifier} ready")
+            if event.index == self.selected_alpaca_id:
+                alpaca.preload()
+        else:
+            self.style_logger.write_line(f"Session {session.identifier} failed to load: {session.error}")
+        self.labels[event.index] = self.tab_label(event.index)
+        for tab in self.query(f"ChatTabs #tab-{event.index}"): # Not mounted while the settings are shown
+            tab.label = self.labels[event.index]
+        self.update_send_button()
+
+    def mount_memgraph(self):
+        self.get_widget_by_id("side-window").mount(MemGraph.Memgraph(), before=0)
+        get_telemetry().start()
         self.set_interval(1, self.update_sys_info)
 
     def update_sys_info(self):
-        mem = psutil.virtual_memory()[3] / 1_000_000_000  # in GB
-        swap = psutil.swap_memory()[1] / 1_000_000_000
+        # Sampled by the telemetry thread, only the shown window is plotted here
         if self.screen.id == "_default":
-            self.app.query_one(Memgraph).append_data_point(time.time(), mem, swap)
+            for graph in self.app.query("Memgraph"):
+                graph.redraw()
 
     @on(Tabs.TabMessage)
     def on_tab_activated(self, event: Tabs.TabActivated):
@@ -493,6 +711,8 @@ class TextualConsole(App):
         else:
             self.selected_alpaca_id = int(event.tab.id.split("-")[1])
             self.style_logger.write_line(f"Selected alpaca ID: {self.selected_alpaca_id}")
+            if self.alpacas[self.selected_alpaca_id] is not None:
+                self.alpacas[self.selected_alpaca_id].preload()
             try:
                 self.query_one(AiChat).remove()
             except Exception as e:
@@ -504,6 +724,7 @@ class TextualConsole(App):
                 self.recompose()
             except Exception as e:
                 self.style_logger.write_line(f"Error: {e}")
+            self.update_send_button()
 
     @on(CreateModelCanceled)
     def on_model_canceled(self):
@@ -516,21 +737,23 @@ class TextualConsole(App):
         model_str = make_to_model_str(event.model)
         self.alpacas.append(Alpacca(event.model, history_location=f"{os.getcwd() + self.std_loc}/{model_str}.json",
                                     identifier=f"{model_str}"))
+        self.alpacas[-1].preload()
         self.chats.append(AiChat(log=self.style_logger, identifier=f"{model_str}"))
+        self.labels.append(model_str)
         self.query_one(ChatTabs).add_tab(Tab(f"{model_str}", id=f"tab-{len(self.chats) - 1}"), before="add-tab")
         self.recompose()
         self.query_one(ChatTabs).action_previous_tab()
 
     def create_default_alpacca(self):
-        available = ollama.list()
-        identifier = make_to_model_str(available.models[0].model)
-        return Alpacca(available.models[0].model, identifier=identifier,
+        available = get_model_registry().list_models()
+        identifier = make_to_model_str(available[0])
+        return Alpacca(available[0], identifier=identifier,
                        history_location=f"{os.getcwd() + self.std_loc}/{identifier}.json")
 
-    def load_alpacca_models(self) -> [List[Alpacca], List[str]]:
+    def load_alpacca_models(self) -> [List[PendingSession], List[str]]:
         """
-        Load the alpacca models from the resources folder
-        :return: A list of alpacca models and a list of the files that were loaded
+        Start loading the alpacca models from the resources folder in the background, only their settings are read now
+        :return: A list of the pending sessions and a list of the files that were loaded
         """
         history_files = []
         for name in os.listdir(os.getcwd() + self.std_loc):
@@ -548,98 +771,155 @@ class TextualConsole(App):
         for file in setting_files:
             print(f"Found setting: {file}")
 
-        alpacas = []
+        sessions = []
         # only return models that have a setting file, history files are auto generated by the Alpacca class
         for file in setting_files:
             if file.split(".")[1] == "json":
-                Logger.log(f"Loading Alpacca: {file}")
+                Logger.log(f"Loading Alpacca: {file}", Priority.NORMAL)
                 try:
-                    alp = load_alpacca_from_json(f"{os.getcwd() + self.std_settings}/{file}")
-                    alpacas.append(alp)
-                except RemoteException as e:
-                    Logger.log(f"Error: {e}")
-                    print(f"Error: {e}")
-                except ValueError as e:
-                    Logger.log(f"Error: {e}")
+                    sessions.append(self.session_loader.load(f"{os.getcwd() + self.std_settings}/{file}"))
+                except (ValueError, KeyError) as e:
+                    Logger.log(f"Error: {e}", Priority.HIGH)
                     print(f"Error: {e}")
                     continue
 
-        for alp in alpacas:
-            print(f"Loaded Alpacca: {alp}")
-
-        return alpacas, setting_files
+        for session in sessions:
+            print(f"Loading Alpacca: {session.identifier}")
 
-    def save_chat(self, chat: AiChat):
-        if chat.current_line is not None:
-            separated = separate_thoughts(chat.current_line.response)
-            self.alpacas[self.selected_alpaca_id].add_history(chat.current_line.user, separated["think"],
-                                                              separated["response"])
-            self.style_logger.write_line(
-                f"In generate_ai: {chat.current_line.user} {separated['think']} {separated['response']}")
-            self.style_logger.write_line(f"Saved history for {self.alpacas[self.selected_alpaca_id].identifier}")
-        else:
-            self.style_logger.write_line(f"Skipping save history because current_line is not yet set!")
+        return sessions, setting_files
 
     def _on_exit_app(self) -> None:
-        for i in range(len(self.chats)):
-            chat = self.chats[i]
-            self.save_chat(chat)
-
+        # Finished exchanges were appended as they completed, a streamed response is recovered from its last snapshot
+        self.session_loader.shutdown()
+        get_telemetry().stop()
         for alpaca in self.alpacas:
+            if alpaca is None: # Never loaded, its files are unchanged
+                continue
             alpaca.save_history()
             alpaca.save_alpacca_settings(f"{os.getcwd()}/{self.std_settings}/{alpaca.identifier}.json")
         print(f"Saved history!")
+        get_metrics().export(f"{os.getcwd()}{self.std_metrics}/metrics")
+        Logger.remove_sink(self.log_sink)
+        self.log_sink.close()
 
     def on_button_pressed(self, event: Button.Pressed):
         if event.button.id == "send-button":
-            if not self.query_one(Input).value == "":
+            if not (self.query_one(Input).value == "" or self.is_generating(self.selected_alpaca_id)):
                 self.generate_ai(self.query_one(Input).value)
                 #self.chats[self.selected_alpaca_id].post_message(UserMessage(self.query_one(Input).value))
                 self.query_one(Input).clear()
 
         if event.button.id == "button-add":
             if not self.file_tree_open:
-                self.app.get_widget_by_id("main-container").mount(FileTee(os.getcwd()))
+                self.app.get_widget_by_id("main-container").mount(FileTree.FileTee(os.getcwd()))
             else:
-                self.app.get_widget_by_id("main-container").query_one(FileTee).remove()
+                self.app.get_widget_by_id("main-container").query_one("FileTee").remove()
             self.file_tree_open = not self.file_tree_open
             self.app.recompose()
 
     def on_input_submitted(self, event: Input.Submitted):
         # self.style_logger.write_line("Input Submitted: " + event.value)
-        if not (event.value == "" or self.generate_running):
+        if not (event.value == "" or self.is_generating(self.selected_alpaca_id)):
             self.generate_ai(event.value)
             #self.chats[self.selected_alpaca_id].post_message(UserMessage(event.value))
             self.query_one(Input).clear()
             # self.recompose()
 
-    @work(thread=True)
+    def on_input_changed(self, event: Input.Changed):
+        alpaca = self.alpacas[self.selected_alpaca_id]
+        if event.input.id == "chat-input" and event.value and alpaca is not None \
+                and alpaca.identifier not in self.preloaded_sessions:
+            self.preloaded_sessions.add(alpaca.identifier) # The user is typing a prompt, preloaded once per prompt
+            alpaca.preload()
+
+    def is_generating(self, alpaca_id: int) -> bool:
+        """
+        :param alpaca_id: The index of the session
+        :return: True if the session has a queued or running generation or is not loaded
+        """
+        alpaca = self.alpacas[alpaca_id]
+        return alpaca is None or alpaca.identifier in self.running_sessions
+
+    def update_send_button(self):
+        for button in self.query("#send-button"): # Not mounted before the chats are shown
+            button.disabled = self.is_generating(self.selected_alpaca_id)
+
     def generate_ai(self, prompt):
+        """
+        Queue a generation of the selected session on the generation scheduler
+        :param prompt: The user prompt
+        """
         self.style_logger.write_line(f"Generating Prompt: {prompt}")
-        self.generate_running = True
-        self.get_widget_by_id("send-button").disabled = True
+        alpaca = self.alpacas[self.selected_alpaca_id]
         chat = self.chats[self.selected_alpaca_id]
-        self.save_chat(chat)
+        self.running_sessions.add(alpaca.identifier)
+        self.preloaded_sessions.discard(alpaca.identifier)
+        self.update_send_button()
 
-        self.chats[self.selected_alpaca_id].post_message(UserMessage(prompt))
+        chat.post_message(UserMessage(prompt))
         self.style_logger.write_line(f"Message posted!")
 
-        time_start_at = time.time()
-        first_token_after = None
-        token_count = 0
-        for part in self.alpacas[self.selected_alpaca_id].generate_iterable(prompt=prompt):
-            token_count += 1
-            if first_token_after is None:
-                first_token_after = time.time()
-                self.style_logger.write_line(f"first token after: {time.time() - first_token_after}s")
-            chat.post_message(AIResponse(part["response"], self.alpacas[self.selected_alpaca_id].identifier.upper()))
-            self.app.query_one(VerticalScroll).scroll_end(force=True)
-            word_count = len(chat.current_line.response.split()) + 1
-            time_elapsed = time.time() - first_token_after
-            #self.style_logger.write_line(f"Token count: {word_count}, first token after: {round(first_token_after - time_start_at, 2)}s, words per second: {word_count / time_elapsed}, tokens per second: {token_count / time_elapsed}, tokens per minute: {token_count / time_elapsed * 60}")
-            # TODO: Fix the scrolling issue
-        self.generate_running = False
-        self.get_widget_by_id("send-button").disabled = False
+        future = alpaca.schedule(lambda: self.stream_generation(alpaca, chat, prompt), JobPriority.INTERACTIVE)
+        future.add_done_callback(lambda done: self.call_later(self.generation_failed, alpaca.identifier, done))
+        self.style_logger.write_line(f"Generation queued, waiting jobs: {get_scheduler().queue_depth()}")
+
+    def stream_generation(self, alpaca: Alpacca, chat: AiChat, prompt: str):
+        """
+        Stream a generation into its chat, runs in a thread of the generation scheduler
+        :param alpaca: The session to generate with
+        :param chat: The chat of the session
+        :param prompt: The user prompt
+        """
+        response = []
+        parser = ThinkParser()
+        saved_at = time.monotonic()
+        identifier = alpaca.identifier.upper()
+        bridge = StreamBridge(lambda text: self.deliver_stream(chat, identifier, text), self.call_from_thread,
+                              frame_rate=STREAM_FRAME_RATE)
+        try:
+            with bridge:
+                for part in alpaca.generate_iterable(prompt=prompt):
+                    bridge.put(part["response"])
+                    response.append(part["response"])
+                    parser.feed(part["response"])
+                    if time.monotonic() - saved_at >= PARTIAL_SAVE_INTERVAL:
+                        alpaca.save_partial(prompt, "".join(response))
+                        saved_at = time.monotonic()
+            parser.close()
+            metrics = alpaca.get_last_metrics()
+            alpaca.add_history(prompt, parser.get_thoughts(), parser.get_answer(), metrics) # Appended as it completes
+            self.style_logger.write_line(f"{alpaca.identifier}: streamed {bridge}")
+            if metrics is not None:
+                self.style_logger.write_line(f"{alpaca.identifier}: {metrics}")
+        finally:
+            self.call_from_thread(self.generation_finished, alpaca.identifier)
+
+    def deliver_stream(self, chat: AiChat, identifier: str, text: str):
+        """
+        Show the parts of a response that arrived since the last frame, runs on the UI thread
+        :param chat: The chat of the session
+        :param identifier: The upper case identifier of the session
+        :param text: The new text of the response
+        """
+        chat.post_message(AIResponse(text, identifier))
+        if chat.is_mounted:
+            chat.parent.scroll_end(animate=False, force=True)
+
+    def generation_failed(self, identifier: str, future: Future):
+        """
+        Release a session whose generation failed, also if it never started because no host of its pool was healthy
+        :param identifier: The identifier of the session
+        :param future: The finished future of the generation
+        """
+        if future.exception() is not None:
+            self.style_logger.write_line(f"Generation of {identifier} failed: {future.exception()}")
+            self.generation_finished(identifier)
+
+    def generation_finished(self, identifier: str):
+        self.running_sessions.discard(identifier)
+        self.update_send_button()
+        stats = get_scheduler().stats()
+        self.style_logger.write_line(f"Generation of {identifier} finished, scheduler: {stats}")
 
 if __name__ == "__main__":
     app = TextualConsole()
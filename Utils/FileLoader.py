@@ -1,14 +1,13 @@
 import json
 import os
-from logging import *
-from tkinter.constants import NORMAL
 
 from Core.Logger import Logger
+from Core.Priority import Priority
 
 
 def load_from_file(path: str) -> str:
     if not os.path.isfile(path):
-        Logger.log(f"File {path} not found.", priority=CRITICAL)
+        Logger.log(f"File {path} not found.", priority=Priority.CRITICAL)
         return ""
 
     with open(path) as f:
@@ -16,22 +15,22 @@ def load_from_file(path: str) -> str:
 
 def load_json(path: str, create: bool = False) -> dict:
     if not os.path.isfile(path):
-        Logger.log(f"No json File at {path}!", priority=WARNING)
+        Logger.log(f"No json File at {path}!", priority=Priority.HIGH)
         if create:
-            Logger.log(f"Creating file {path}", priority=NORMAL)
+            Logger.log(f"Creating file {path}", priority=Priority.NORMAL)
             save_json({}, path)
-            Logger.log("Created file!", priority=NORMAL)
+            Logger.log("Created file!", priority=Priority.NORMAL)
             return {}
 
     with open(path) as f:
-        Logger.log(f"Loading file {path}", priority=NORMAL)
+        Logger.log(f"Loading file {path}", priority=Priority.NORMAL)
         return json.load(f)
 
 def save_json(data: any, path: str):
-    Logger.log(f"Saving file {path}", priority=NORMAL)
+    Logger.log(f"Saving file {path}", priority=Priority.NORMAL)
     # Logger.log(f"Data: {data}", priority=DEBUG)
     if not os.path.exists(os.path.dirname(path)):
-        Logger.log(f"Creating directory {os.path.dirname(path)}", priority=NORMAL)
+        Logger.log(f"Creating directory {os.path.dirname(path)}", priority=Priority.NORMAL)
         os.makedirs(os.path.dirname(path))
     with open(path, "w") as f:
         json.dump(data, f, indent=4)
\ No newline at end of file
@@ -0,0 +1,204 @@
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from Core.Alpacca import Alpacca, separate_thoughts
+from Core.HistoryStore import load_history_file
+from Core.Logger import Logger
+from Core.Metrics import RollingHistogram
+
+DEFAULT_THINK_TIME = 5.0 # Seconds between two turns if the history has no recorded timings
+
+
+class Turn:
+    prompt: str
+    think_time: float # Seconds the user waited after the previous answer before sending the prompt
+
+    def __init__(self, prompt: str, think_time: float):
+        self.prompt = prompt
+        self.think_time = think_time
+
+
+def load_session(location: str, default_think_time: float = DEFAULT_THINK_TIME) -> List[Turn]:
+    """
+    Read a saved chat history as a trace of turns.
+    The think time of a turn is the gap between the end of the previous generation and the start of this one,
+    taken from the recorded metrics where both exchanges have them.
+    :param location: The location of the history, a .jsonl store or an older .json file
+    :param default_think_time: The think time of turns without recorded timings
+    :return: The turns of the session
+    """
+    turns = []
+    previous_end: float | None = None
+    for exchange in load_history_file(location):
+        metrics = exchange.get("metrics")
+        started_at = metrics.get("started_at") if metrics else None
+        if started_at is not None and previous_end is not None:
+            think_time = max(started_at - previous_end, 0.0)
+        else:
+            think_time = default_think_time if turns else 0.0
+        turns.append(Turn(exchange["user"], think_time))
+        previous_end = started_at + metrics["total"] if started_at is not None else None
+    return turns
+
+
+def load_trace(pattern: str, default_think_time: float = DEFAULT_THINK_TIME) -> List[List[Turn]]:
+    """
+    :param pattern: A glob of history files, for example Resources/Chats/*.jsonl
+    :param default_think_time: The think time of turns without recorded timings
+    :return: The non-empty sessions of all matching histories
+    """
+    sessions = [load_session(location, default_think_time) for location in sorted(glob.glob(pattern))]
+    return [session for session in sessions if session]
+
+
+class LoadReport:
+    """
+    Collects the results of all virtual users
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.first_token = RollingHistogram(size=1 << 20)
+        self.latency = RollingHistogram(size=1 << 20)
+        self.tokens = 0
+        self.requests = 0
+        self.errors: dict[str, int] = {}
+        self.started = time.monotonic()
+        self.finished = self.started
+
+    def success(self, first_token: float | None, latency: float, tokens: int) -> None:
+        with self._lock:
+            self.requests += 1
+            if first_token is not None:
+                self.first_token.add(first_token)
+            self.latency.add(latency)
+            self.tokens += tokens
+
+    def error(self, error: Exception) -> None:
+        with self._lock:
+            self.requests += 1
+            name = type(error).__name__
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+    def dict(self) -> dict:
+        duration = max(self.finished - self.started, 1e-9)
+        failed = sum(self.errors.values())
+        return {
+            "duration": duration,
+            "requests": self.requests,
+            "requests_per_second": (self.requests - failed) / duration,
+            "tokens_per_second": self.tokens / duration,
+            "error_rate": failed / self.requests if self.requests else 0.0,
+            "errors": dict(self.errors),
+            "first_token": {f"p{int(q * 100)}": v for q, v in self.first_token.quantiles().items()},
+            "latency": {f"p{int(q * 100)}": v for q, v in self.latency.quantiles().items()},
+        }
+
+
+def run_user(session: List[Turn], alpacca: Alpacca, report: LoadReport, speedup: float, deadline: float | None) -> None:
+    """
+    Replay one session as a virtual user, waiting the recorded think time before every turn
+    """
+    for turn in session:
+        time.sleep(turn.think_time / speedup)
+        if deadline is not None and time.monotonic() > deadline:
+            return
+        started = time.monotonic()
+        first_token = None
+        tokens = 0
+        response = ""
+        try:
+            for part in alpacca.generate_iterable(turn.prompt):
+                if first_token is None and part.response:
+                    first_token = time.monotonic() - started
+                response += part.response
+                if part.done:
+                    tokens = part.eval_count or 0
+        except Exception as e:
+            report.error(e)
+            continue
+        report.success(first_token, time.monotonic() - started, tokens)
+        answer = separate_thoughts(response)
+        alpacca.add_history(turn.prompt, answer["think"], answer["response"], alpacca.get_last_metrics())
+
+
+def replay(sessions: List[List[Turn]], model: str, host: str = None, users: int = 1, system: str = None,
+           speedup: float = 1.0, ramp_up: float = 0.0, duration: float = None, options: dict = None) -> dict:
+    """
+    Replay recorded sessions with concurrent virtual users, each one a headless Alpacca with its own history
+    :param sessions: The sessions to replay, assigned to the users round robin
+    :param model: The model to generate with
+    :param host: The ollama host or None for the local server
+    :param users: The number of concurrent virtual users
+    :param system: The location of the system prompt
+    :param speedup: Think times are divided by this factor
+    :param ramp_up: Seconds until the last user starts, the users start evenly spread
+    :param duration: Seconds after which no new turn is sent
+    :param options: The generation options, for example num_ctx
+    :return: The throughput, time to first token and latency percentiles in seconds and the error rate
+    """
+    assert sessions, "There are no sessions to replay"
+    assert users > 0 and speedup > 0, "There must be at least one user and the speedup must be positive"
+    report = LoadReport()
+    deadline = time.monotonic() + duration if duration is not None else None
+    with tempfile.TemporaryDirectory() as directory, contextlib.redirect_stdout(io.StringIO()):
+        def virtual_user(i: int) -> None:
+            time.sleep(ramp_up * i / users)
+            for j, session in enumerate(sessions[i::users] or [sessions[i % len(sessions)]]):
+                # Every replayed session starts from an empty history file of its own
+                alpacca = Alpacca(model, system=system, host=host, options=options, identifier=f"user-{i}",
+                                  history_location=os.path.join(directory, f"user-{i}-{j}.json"))
+                run_user(session, alpacca, report, speedup, deadline)
+
+        report.started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=users) as executor:
+            list(executor.map(virtual_user, range(users)))
+        report.finished = time.monotonic()
+        Logger.flush() # The pending logs are printed while stdout is still redirected
+    return report.dict()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay saved chat sessions against an ollama host")
+    parser.add_argument("model", help="The model to generate with")
+    parser.add_argument("--trace", default="Resources/Chats/*.jsonl", help="A glob of the histories to replay")
+    parser.add_argument("--host", default=None, help="The ollama host, the local server if omitted")
+    parser.add_argument("--mock", action="store_true", help="Replay against a local mock server instead")
+    parser.add_argument("--users", type=int, default=4, help="Concurrent virtual users")
+    parser.add_argument("--system", default=None, help="The system prompt file")
+    parser.add_argument("--speedup", type=float, default=1.0, help="Divide the recorded think times by this")
+    parser.add_argument("--think-time", type=float, default=DEFAULT_THINK_TIME,
+                        help="Think time of turns without recorded timings")
+    parser.add_argument("--ramp-up", type=float, default=0.0, help="Seconds until all users are running")
+    parser.add_argument("--duration", type=float, default=None, help="Stop sending new turns after this many seconds")
+    parser.add_argument("--num-ctx", type=int, default=None, help="The num_ctx option of the generations")
+    parser.add_argument("--output", default=None, help="Write the report as json to this file")
+    args = parser.parse_args()
+
+    trace = load_trace(args.trace, args.think_time)
+    mock = None
+    if args.mock:
+        from Tests.MockOllama import MockOllama
+        mock = MockOllama(ttft=0.2, token_latency=0.02, models=[args.model]).start()
+        args.host = mock.host
+    try:
+        result = replay(trace, args.model, host=args.host, users=args.users, system=args.system, speedup=args.speedup,
+                        ramp_up=args.ramp_up, duration=args.duration,
+                        options={"num_ctx": args.num_ctx} if args.num_ctx is not None else None)
+    finally:
+        if mock is not None:
+            mock.stop()
+
+    print(json.dumps(result, indent=4))
+    if args.output is not None:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as file:
+            json.dump(result, file, indent=4)